@@ -0,0 +1,171 @@
+"""
+Indexed store of generated test files.
+
+Every published test file is kept as a content-addressed blob
+(<root>/blobs/<sha[:2]>/<sha>) plus one row in a SQLite index holding the
+module, symbol, code hash, spec, model, creation time and the result of the
+last run. "The latest tests for X" and "artifact #n" are index lookups rather
+than directory scans. Retention keeps the newest keep_last artifacts per
+(module, symbol); a blob is deleted once no remaining row points at it.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from workspace import atomic_write
+
+_COLUMNS = ("id", "module_path", "symbol", "file_name", "blob", "code_hash", "spec", "model", "created",
+            "last_run_at", "last_exit_code", "last_outcomes")
+
+
+class ArtifactStore:
+    """
+    Blobs and index under root (index.sqlite3 next to blobs/). Safe to share
+    between threads. keep_last <= 0 keeps every artifact.
+    """
+
+    def __init__(self, root: str, keep_last: int = 5):
+        self.root = root
+        self.keep_last = keep_last
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # connect lazily so the root is resolved against the cwd at first use
+        if self._conn is None:
+            Path(self.root).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(Path(self.root) / "index.sqlite3"), check_same_thread=False, timeout=5)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, module_path TEXT NOT NULL, symbol TEXT NOT NULL, "
+                "file_name TEXT NOT NULL, blob TEXT NOT NULL, code_hash TEXT NOT NULL, spec TEXT NOT NULL, "
+                "model TEXT NOT NULL, created REAL NOT NULL, "
+                "last_run_at REAL, last_exit_code INTEGER, last_outcomes TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_target ON artifacts(module_path, symbol, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_module ON artifacts(module_path, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_code ON artifacts(code_hash, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_blob ON artifacts(blob)")
+            self._conn.commit()
+        return self._conn
+
+    def _row(self, row) -> dict:
+        artifact = dict(zip(_COLUMNS, row))
+        outcomes = artifact.pop("last_outcomes")
+        artifact["last_run"] = None if artifact["last_run_at"] is None else {
+            "at": artifact["last_run_at"], "exit_code": artifact["last_exit_code"],
+            "outcomes": json.loads(outcomes) if outcomes else {},
+        }
+        del artifact["last_run_at"], artifact["last_exit_code"]
+        return artifact
+
+    def _blob_path(self, sha: str) -> Path:
+        return Path(self.root) / "blobs" / sha[:2] / sha
+
+    # -- writes ----------------------------------------------------------------
+    def put(self, text: str, *, module_path: str, symbol: str, file_name: str, code_hash: str,
+            spec: str, model: str) -> dict:
+        """Store one test file and index it; returns the new artifact (retention applied)."""
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        blob = self._blob_path(sha)
+        with self._lock:
+            db = self._db()
+            if not blob.exists():
+                atomic_write(blob, text)
+            cur = db.execute(
+                "INSERT INTO artifacts (module_path, symbol, file_name, blob, code_hash, spec, model, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (module_path, symbol, file_name, sha, code_hash, spec, model, time.time()),
+            )
+            artifact_id = cur.lastrowid
+            self._apply_retention(db, module_path, symbol)
+            db.commit()
+            row = db.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return self._row(row)
+
+    def _apply_retention(self, db: sqlite3.Connection, module_path: str, symbol: str) -> None:
+        if self.keep_last <= 0:
+            return
+        stale = db.execute(
+            "SELECT id, blob FROM artifacts WHERE module_path = ? AND symbol = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (module_path, symbol, self.keep_last),
+        ).fetchall()
+        for artifact_id, _ in stale:
+            db.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+        for sha in {sha for _, sha in stale}:
+            if db.execute("SELECT 1 FROM artifacts WHERE blob = ? LIMIT 1", (sha,)).fetchone() is None:
+                try:
+                    self._blob_path(sha).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def record_run(self, artifact_id: int, exit_code: Optional[int], outcomes: dict) -> None:
+        """Remember the result of the artifact's latest run (its own test outcomes only)."""
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "UPDATE artifacts SET last_run_at = ?, last_exit_code = ?, last_outcomes = ? WHERE id = ?",
+                (time.time(), exit_code, json.dumps(outcomes), artifact_id),
+            )
+            db.commit()
+
+    # -- reads -----------------------------------------------------------------
+    def get(self, artifact_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def read(self, artifact: dict) -> str:
+        return self._blob_path(artifact["blob"]).read_text(encoding="utf-8")
+
+    def latest(self, module_path: Optional[str] = None, symbol: Optional[str] = None) -> Optional[dict]:
+        """Newest artifact overall, for a module, or for one (module, symbol)."""
+        found = self.query(module_path=module_path, symbol=symbol, limit=1)
+        return found[0] if found else None
+
+    def query(self, module_path: Optional[str] = None, symbol: Optional[str] = None,
+              code_hash: Optional[str] = None, model: Optional[str] = None,
+              before: Optional[int] = None, limit: int = 50) -> List[dict]:
+        """Newest first; `before` (an id) pages through older results."""
+        where, args = [], []
+        for column, value in (("module_path", module_path), ("symbol", symbol),
+                              ("code_hash", code_hash), ("model", model)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if before is not None:
+            where.append("id < ?")
+            args.append(before)
+        sql = "SELECT * FROM artifacts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db().execute(sql, (*args, limit)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def published_files(self, module_path: Optional[str] = None) -> List[str]:
+        """File names still indexed for module_path (for any module when None)."""
+        with self._lock:
+            if module_path is None:
+                rows = self._db().execute("SELECT DISTINCT file_name FROM artifacts").fetchall()
+            else:
+                rows = self._db().execute(
+                    "SELECT DISTINCT file_name FROM artifacts WHERE module_path = ?", (module_path,)
+                ).fetchall()
+        return [name for (name,) in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._db().execute("SELECT COUNT(*) FROM artifacts").fetchone()
+        return {"root": self.root, "artifacts": count, "keep_last": self.keep_last}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
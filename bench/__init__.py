@@ -0,0 +1,39 @@
+"""
+Benchmarks and load tests.
+
+    python -m bench micro                 # hot helpers + the pytest run path
+    python -m bench load --requests 300   # concurrent HTTP load against a fake upstream
+    python -m bench all --baseline bench/baseline.json
+
+The load test drives the FastAPI app in-process (httpx ASGITransport) with
+core.client replaced by bench.fake_upstream.FakeMistral, so the real _chat /
+_call_with_retries / fallback / parse code runs without network access.
+"""
+import os
+
+from ratelimit import RateLimiter
+
+
+def load_main():
+    """Import the app for benchmarking: real model path (not STUB_GEN), no API key needed."""
+    os.environ.pop("STUB_GEN", None)
+    os.environ.setdefault("MISTRAL_API_KEY", "bench-not-a-real-key")
+    import main
+    return main
+
+
+def configure(retry_base_delay: float = 0.02, retry_max_delay: float = 0.2,
+              breaker_cooldown: float = 1.0) -> None:
+    """
+    Make the app measure itself rather than its guards: no generation cache,
+    no client-side rate limit, and retry backoff / breaker cooldown scaled down
+    to the fake upstream's latencies.
+    """
+    import core
+
+    core.GEN_CACHE_ENABLED = False
+    core._limiter = RateLimiter(rps=0, tpm=0)
+    core.RETRY_BASE_DELAY = retry_base_delay
+    core.RETRY_MAX_DELAY = retry_max_delay
+    core.BREAKER_COOLDOWN = breaker_cooldown
+    core._breakers.clear()
@@ -0,0 +1,108 @@
+"""
+python -m bench [micro|load|all] [options]
+
+Exits 1 when --baseline is given and any metric regressed beyond --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from bench import baseline, configure, load_main
+from bench.fake_upstream import UpstreamProfile
+
+DEFAULT_BASELINE = str(Path(__file__).with_name("baseline.json"))
+
+
+def _print_micro(results: dict) -> None:
+    print("micro-benchmarks")
+    for name, value in results.items():
+        print(f"  {name:<28} {value:>12}")
+
+
+def _print_load(results: dict) -> None:
+    print("load")
+    print(f"  {'endpoint':<20} {'ok':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in results["endpoints"].items():
+        print(f"  {name:<20} {s['ok']:>6} {s['errors']:>5} {s['throughput_rps']:>9} "
+              f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+    print(f"  upstream calls: {results['upstream']['calls']}  errors: {results['upstream']['errors']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Spec→Test benchmarks")
+    parser.add_argument("suite", nargs="?", choices=["micro", "load", "all"], default="all")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", "-c", type=int, default=20)
+    parser.add_argument("--endpoints", default="generate.txt,generate.stream,generate-and-save",
+                        help="Comma-separated subset of: generate.txt, generate.stream, generate-and-save, "
+                             "generate-run")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA (seconds)")
+    parser.add_argument("--fallback-latency", default=None, help="Latency distribution for the fallback model")
+    parser.add_argument("--error-429", type=float, default=0.05, help="Share of upstream calls answered with 429")
+    parser.add_argument("--error-capacity", type=float, default=0.0, help="Share answered with capacity errors")
+    parser.add_argument("--cases", type=int, default=8, help="Parametrize rows per fake response (response size)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--pytest-runs", type=int, default=5, help="Runs per pytest path in micro (0 skips)")
+    parser.add_argument("--json", dest="json_out", default=None, help="Write raw results to this file")
+    parser.add_argument("--baseline", default=None, help=f"Compare against a baseline (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results into --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed slowdown as a fraction")
+    args = parser.parse_args(argv)
+
+    # environment first: core reads its configuration when first imported
+    app = load_main()
+    configure()
+    import core
+    from bench.load import run_load
+    from bench.micro import run_micro
+
+    results = {}
+    try:
+        if args.suite in ("micro", "all"):
+            results["micro"] = run_micro(pytest_runs=args.pytest_runs)
+            _print_micro(results["micro"])
+        if args.suite in ("load", "all"):
+            profile = UpstreamProfile(latency=args.latency, error_429=args.error_429,
+                                      error_capacity=args.error_capacity, cases=args.cases, seed=args.seed)
+            if args.fallback_latency:
+                profile.per_model[core.FALLBACK_MODEL] = UpstreamProfile(
+                    latency=args.fallback_latency, error_429=args.error_429,
+                    error_capacity=args.error_capacity, cases=args.cases)
+            endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+            results["load"] = asyncio.run(run_load(app.app, profile, endpoints, args.requests, args.concurrency))
+            results["load"]["scenario"] = {
+                "requests": args.requests, "concurrency": args.concurrency, "latency": args.latency,
+                "fallback_latency": args.fallback_latency, "error_429": args.error_429,
+                "error_capacity": args.error_capacity, "cases": args.cases,
+            }
+            _print_load(results["load"])
+    finally:
+        if core._pytest_pool is not None:
+            core._pytest_pool.shutdown()
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline and args.update_baseline:
+        baseline.save(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+    elif args.baseline:
+        base = baseline.load(args.baseline)
+        if "load" in results and base.get("load_scenario") != results["load"]["scenario"]:
+            # throughput and tail latency only compare under the same load shape
+            print("load scenario differs from the baseline's; comparing micro-benchmarks only")
+            base.pop("load", None)
+        regressions = baseline.compare(results, base, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
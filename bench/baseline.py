@@ -0,0 +1,75 @@
+"""
+Baseline comparison.
+
+The baseline file stores the metrics of a known-good run:
+
+    {"micro": {"extract_between_us": 4.1, ...},
+     "load": {"generate.txt": {"p95_ms": 120.0, "throughput_rps": 150.0}, ...},
+     "load_scenario": {"requests": 200, "concurrency": 20, ...}}
+
+A metric regresses when it is worse than the baseline by more than
+`tolerance` (a fraction): timings higher, throughput lower. Metrics missing
+from either side are ignored, so baselines can be partial.
+"""
+import json
+from pathlib import Path
+from typing import List
+
+LOAD_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _worse(name: str, value: float, base: float, tolerance: float) -> bool:
+    if name == "throughput_rps":
+        return value < base * (1 - tolerance)
+    return value > base * (1 + tolerance)
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.3) -> List[str]:
+    """Return one human-readable line per regressed metric."""
+    regressions = []
+    for name, base in baseline.get("micro", {}).items():
+        value = results.get("micro", {}).get(name)
+        if value is not None and _worse(name, value, base, tolerance):
+            regressions.append(f"micro.{name}: {value} vs baseline {base}")
+    for endpoint, base_stats in baseline.get("load", {}).items():
+        stats = results.get("load", {}).get("endpoints", {}).get(endpoint)
+        if stats is None:
+            continue
+        for name in LOAD_METRICS:
+            if name in base_stats and _worse(name, stats[name], base_stats[name], tolerance):
+                regressions.append(f"load.{endpoint}.{name}: {stats[name]} vs baseline {base_stats[name]}")
+    return regressions
+
+
+def to_baseline(results: dict) -> dict:
+    baseline = {}
+    if "micro" in results:
+        baseline["micro"] = dict(results["micro"])
+    if "load" in results:
+        baseline["load"] = {
+            endpoint: {k: stats[k] for k in LOAD_METRICS}
+            for endpoint, stats in results["load"]["endpoints"].items()
+        }
+        if "scenario" in results["load"]:
+            baseline["load_scenario"] = results["load"]["scenario"]
+    return baseline
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def save(path: str, results: dict) -> None:
+    """Merge results into the baseline at path (sections not re-run are kept)."""
+    try:
+        baseline = load(path)
+    except FileNotFoundError:
+        baseline = {}
+    fresh = to_baseline(results)
+    baseline.setdefault("micro", {}).update(fresh.get("micro", {}))
+    if fresh.get("load_scenario") not in (None, baseline.get("load_scenario")):
+        baseline["load"] = {}  # a new load shape invalidates the old numbers
+    baseline.setdefault("load", {}).update(fresh.get("load", {}))
+    if "load_scenario" in fresh:
+        baseline["load_scenario"] = fresh["load_scenario"]
+    Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
@@ -0,0 +1,140 @@
+"""
+In-process stand-in for the Mistral SDK client.
+
+FakeMistral exposes the two calls main.py makes, `chat.complete_async` and
+`chat.stream_async`, and answers with marker-wrapped pytest files shaped
+like real model output. Latency, 429/capacity error rates and response size
+are configurable per model, so the retry, fallback and parse paths can be
+benchmarked without network access or an API key:
+
+    main.client = FakeMistral(UpstreamProfile(latency="lognormal:0.2:0.5", error_429=0.05))
+"""
+import asyncio
+import random
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+
+@dataclass
+class UpstreamProfile:
+    # "fixed:S", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA" (seconds)
+    latency: str = "fixed:0.05"
+    error_429: float = 0.0        # share of calls failing with a 429
+    error_capacity: float = 0.0   # share of calls failing with "capacity exceeded"
+    cases: int = 8                # parametrize rows per generated test file
+    chatter: int = 200            # bytes of prose around the markers
+    chunk_size: int = 40          # characters per streamed delta
+    seed: Optional[int] = None
+    per_model: Dict[str, "UpstreamProfile"] = field(default_factory=dict)
+
+    def for_model(self, model: str) -> "UpstreamProfile":
+        return self.per_model.get(model, self)
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def _symbol_from_messages(messages) -> str:
+    # RAW_USER starts with "... tests the callable <symbol> imported as:"
+    marker = "tests the callable "
+    for msg in messages or []:
+        content = msg.get("content", "") if isinstance(msg, dict) else getattr(msg, "content", "")
+        if marker in content:
+            return content.split(marker, 1)[1].split()[0] or "target"
+    return "target"
+
+
+def fake_completion_text(symbol: str, profile: UpstreamProfile) -> str:
+    import_name = symbol.split(".")[0]
+    rows = ",\n".join(f"    ({i}, {i + 1}, {i * (i + 1)})" for i in range(profile.cases))
+    body = (
+        f"import pytest\nfrom under_test import {import_name}\n\n"
+        f"@pytest.mark.parametrize('a,b,expected', [\n{rows},\n])\n"
+        f"def test_{symbol.replace('.', '_')}(a, b, expected):\n"
+        f"    assert {import_name}(a, b) == expected\n"
+    )
+    prose = ("Here are the tests. " * (profile.chatter // 20 + 1))[:profile.chatter]
+    return f"{prose}\n<<<PYTEST_START>>>\n{body}<<<PYTEST_END>>>\n{prose}"
+
+
+def _usage(messages, text: str):
+    prompt = sum(len(str(m.get("content", "") if isinstance(m, dict) else m)) for m in messages or []) // 4
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=len(text) // 4,
+                           total_tokens=prompt + len(text) // 4)
+
+
+class _EventStream:
+    def __init__(self, text: str, usage, chunk_size: int, gap: float):
+        self._chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self._usage = usage
+        self._gap = gap
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._gap)
+            delta = SimpleNamespace(content=chunk)
+            yield SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None))
+        yield SimpleNamespace(data=SimpleNamespace(choices=[], usage=self._usage))
+
+
+class FakeChat:
+    def __init__(self, profile: UpstreamProfile):
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _maybe_fail(self, model: str, profile: UpstreamProfile) -> None:
+        roll = self.rng.random()
+        if roll < profile.error_429:
+            self.errors[model] = self.errors.get(model, 0) + 1
+            raise Exception("API error occurred: Status 429. Rate limit exceeded")
+        if roll < profile.error_429 + profile.error_capacity:
+            self.errors[model] = self.errors.get(model, 0) + 1
+            raise Exception("API error occurred: Status 503. Service tier capacity exceeded")
+
+    async def complete_async(self, model: str, messages=None, **kwargs):
+        profile = self.profile.for_model(model)
+        self.calls[model] = self.calls.get(model, 0) + 1
+        await asyncio.sleep(sample_latency(profile.latency, self.rng))
+        self._maybe_fail(model, profile)
+        text = fake_completion_text(_symbol_from_messages(messages), profile)
+        message = SimpleNamespace(content=text, role="assistant")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=_usage(messages, text), model=model)
+
+    async def stream_async(self, model: str, messages=None, **kwargs):
+        profile = self.profile.for_model(model)
+        self.calls[model] = self.calls.get(model, 0) + 1
+        latency = sample_latency(profile.latency, self.rng)
+        # time to first byte is a fraction of the total; the rest is spread over the chunks
+        await asyncio.sleep(latency * 0.3)
+        self._maybe_fail(model, profile)
+        text = fake_completion_text(_symbol_from_messages(messages), profile)
+        chunks = max(1, len(text) // profile.chunk_size)
+        return _EventStream(text, _usage(messages, text), profile.chunk_size, latency * 0.7 / chunks)
+
+
+class FakeMistral:
+    def __init__(self, profile: Optional[UpstreamProfile] = None):
+        self.chat = FakeChat(profile or UpstreamProfile())
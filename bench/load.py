@@ -0,0 +1,108 @@
+"""
+Concurrent load against the FastAPI app with a simulated upstream.
+
+Each endpoint gets `requests` calls with at most `concurrency` in flight;
+every request uses a distinct symbol so nothing is served from a cache.
+Reports throughput, p50/p95/p99 latency and status codes per endpoint, plus
+how many calls the fake upstream saw (retries and fallbacks show up there).
+"""
+import asyncio
+import math
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+import core
+from bench.fake_upstream import FakeMistral, UpstreamProfile
+
+
+def _code(i: int) -> str:
+    return f"def mult_{i}(a, b):\n    return a * b\n"
+
+
+ENDPOINTS: Dict[str, tuple] = {
+    "generate.txt": ("/tests/generate.txt", lambda i: {"code": _code(i), "spec": "ints"}),
+    "generate.stream": ("/tests/generate.stream", lambda i: {"code": _code(i), "spec": "ints"}),
+    "generate-and-save": ("/bundle/generate-and-save",
+                          lambda i: {"code": _code(i), "spec": "ints", "module_path": f"mod_{i}.py"}),
+    "generate-run": ("/bundle/generate-run", lambda i: {"code": _code(i), "spec": "ints", "publish": False}),
+}
+DEFAULT_ENDPOINTS = ["generate.txt", "generate.stream", "generate-and-save"]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> dict:
+    ok = sum(n for code, n in statuses.items() if 200 <= code < 300)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def _drive(http: httpx.AsyncClient, path: str, payload: Callable[[int], dict],
+                 requests: int, concurrency: int, offset: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(i: int) -> None:
+        async with sem:
+            started = time.perf_counter()
+            try:
+                r = await http.post(path, json=payload(offset + i))
+                code = r.status_code
+            except Exception:
+                code = 599
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def run_load(app, profile: UpstreamProfile, endpoints: List[str] = None,
+                   requests: int = 200, concurrency: int = 20) -> dict:
+    fake = FakeMistral(profile)
+    core.client = fake
+    endpoints = endpoints or DEFAULT_ENDPOINTS
+    if "generate-run" in endpoints:
+        os.environ["ENABLE_RUN"] = "1"
+        if core._pytest_pool is not None:
+            await asyncio.to_thread(core._pytest_pool.start)
+
+    results = {}
+    cwd = os.getcwd()
+    # generate-and-save publishes into the working directory; keep that out of the repo
+    with tempfile.TemporaryDirectory(prefix="spec2test-bench-") as td:
+        os.chdir(td)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+                for n, name in enumerate(endpoints):
+                    path, payload = ENDPOINTS[name]
+                    results[name] = await _drive(http, path, payload, requests, concurrency, n * requests)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "endpoints": results,
+        "upstream": {"calls": dict(fake.chat.calls), "errors": dict(fake.chat.errors)},
+        "hedging": dict(core._hedge_stats),
+    }
@@ -0,0 +1,89 @@
+"""
+Micro-benchmarks for the hot helpers in core.py and for the pytest run path.
+
+Helper timings use timeit's autorange and keep the best of several repeats
+(microseconds per call). The run path is timed end to end through
+_exec_pytest, on the warm pool and on a cold subprocess (milliseconds per run).
+"""
+import asyncio
+import time
+import timeit
+
+import core
+from bench.fake_upstream import UpstreamProfile, fake_completion_text
+
+MODULE = '''\
+import math
+
+CONSTANT = 3
+
+
+class Shape:
+    def area(self):
+        raise NotImplementedError
+
+
+def helper(x):
+    return x * 2
+
+
+def mult(a, b):
+    """Multiply two numbers."""
+    if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+        raise TypeError("numbers only")
+    return a * b
+'''
+
+RUN_TEST = "from under_test import mult\n\ndef test_mult():\n    assert mult(2, 3) == 6\n"
+
+
+def _per_call_us(fn, repeat: int = 5) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, 3)
+
+
+def bench_helpers() -> dict:
+    model_text = fake_completion_text("mult", UpstreamProfile(cases=20, chatter=400))
+    json_text = '```json\n{"tests_py": "def test_x():\\n    assert True\\n", "rationale": "ok"}\n```'
+    return {
+        "detect_symbol_name_us": _per_call_us(lambda: core.detect_symbol_name(MODULE)),
+        "parse_json_from_model_us": _per_call_us(lambda: core._parse_json_from_model(json_text)),
+        "extract_between_us": _per_call_us(
+            lambda: core._extract_between(model_text, "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")),
+    }
+
+
+async def _time_runs(runs: int) -> float:
+    total = 0.0
+    for _ in range(runs):
+        with core._workspaces.create() as ws:
+            ws.write_code(MODULE)
+            ws.write_test("test_mult.py", RUN_TEST)
+            started = time.perf_counter()
+            res = await core._exec_pytest(str(ws.path), ["-q", "tests"], timeout=30)
+            total += time.perf_counter() - started
+            if res["exit_code"] != 0:
+                raise RuntimeError(f"benchmark test run failed: {res['stdout'][-500:]}")
+    return round(total / runs * 1000, 2)
+
+
+def bench_pytest_run(runs: int = 5) -> dict:
+    out = {}
+    pool = core._pytest_pool
+    if pool is not None:
+        pool.start()
+        out["pytest_run_pool_ms"] = asyncio.run(_time_runs(runs))
+    core._pytest_pool = None
+    try:
+        out["pytest_run_cold_ms"] = asyncio.run(_time_runs(runs))
+    finally:
+        core._pytest_pool = pool
+    return out
+
+
+def run_micro(pytest_runs: int = 5) -> dict:
+    results = bench_helpers()
+    if pytest_runs > 0:
+        results.update(bench_pytest_run(pytest_runs))
+    return results
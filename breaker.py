@@ -0,0 +1,90 @@
+"""
+Per-model circuit breaker with a rolling latency window.
+
+closed     -> calls go through; `failure_threshold` consecutive failures open it
+open       -> calls are skipped until `cooldown` seconds have passed
+half_open  -> exactly one probe call is let through; success closes the
+              breaker, failure re-opens it
+
+The latency window also provides the p95 used to decide when to hedge.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown: float = 30.0, window: int = 100):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.total_successes = 0
+        self.total_failures = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self.total_successes += 1
+            self.failures = 0
+            self.state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.total_failures += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """The call was abandoned (e.g. lost a hedge race) without an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "successes": self.total_successes,
+            "failures": self.total_failures,
+            "times_opened": self.times_opened,
+            "latency_p50_s": round(p50, 3) if p50 is not None else None,
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+        }
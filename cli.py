@@ -6,19 +6,55 @@ Allows running generation and test execution directly from the command line.
 Usage examples:
     python cli.py generate under_test.py "n/a"
     python cli.py run
+    python cli.py run --enable --mutation
+    python cli.py run --enable --artifact 12
+    python cli.py artifacts list --symbol power
+    python cli.py artifacts show 12
+    python cli.py batch items.json --concurrency 8
+    python cli.py stream under_test.py --spec "Only ints/floats"
+    python cli.py watch under_test.py --spec "Only ints/floats"
+    python cli.py repo src/mypkg --enable --out reports/mypkg
+    python cli.py --profile generate under_test.py --spec "Only ints/floats"
+    python cli.py --socket /tmp/spec2test.sock generate under_test.py   # reuse a running server
 """
 
 import argparse
+import asyncio
 import os
+import sys
 import json
 from pathlib import Path
-from main import generate_and_save_bundle, _run_enabled, run_bundle_tests, BundleRequest
+
+# Heavy modules (main -> FastAPI, pydantic, the Mistral SDK) are imported inside
+# the commands that need them, so `run` and `--help` start quickly.
+from daemon_client import DaemonError, connect, socket_path
+
+
+def print_profile(t: dict) -> None:
+    """Per-stage breakdown of a trace dict, written to stderr so stdout stays parseable."""
+    out = sys.stderr
+    print(f"⏱  total {t['total_s']:.3f}s", file=out)
+    for name, seconds in sorted(t["stages"].items(), key=lambda kv: -kv[1]):
+        print(f"   {name:<12} {seconds:8.3f}s", file=out)
+    for call in t["model_calls"]:
+        print(f"   model call: {call['model']} {call['outcome']} in {call['seconds']:.3f}s, "
+              f"{call['retries']} retries ({call['backoff_s']:.3f}s backoff), "
+              f"tokens {call.get('prompt_tokens', '?')}/{call.get('completion_tokens', '?')}", file=out)
 
 def main():
     parser = argparse.ArgumentParser(
         description="Spec→Test Generator CLI (using FastAPI backend logic)"
     )
 
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Print a per-stage timing breakdown (model, backoff, parse, workspace, pytest) to stderr",
+    )
+    parser.add_argument(
+        "--socket", default=None,
+        help="Send work to a server started with `uvicorn main:app --uds PATH` (default: $SPEC2TEST_SOCKET)",
+    )
+
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # ------------- generate -------------
@@ -32,41 +68,314 @@ def main():
         help="Description of what the function does",
     )
     gen_parser.add_argument("--cleanup", action="store_true", help="Cleanup old tests (per-symbol mode)")
+    gen_parser.add_argument("--size", choices=["mini", "std", "max"], default="std",
+                            help="How many tests to ask for (also caps prompt and completion tokens)")
+    gen_parser.add_argument(
+        "--all-symbols", action="store_true",
+        help="Generate one test file per public function/class/method, in parallel",
+    )
+    gen_parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only regenerate symbols whose definition or spec changed since the last run",
+    )
 
     # ------------- run -------------
     run_parser = subparsers.add_parser("run", help="Run generated tests via pytest")
     run_parser.add_argument("--enable", action="store_true", help="Force enable run mode (sets ENABLE_RUN=1)")
+    run_parser.add_argument("--force", action="store_true", help="Run pytest even if the result is cached")
+    run_parser.add_argument("--mutation", action="store_true",
+                            help="Also score the tests by how many code mutants they catch")
+    run_parser.add_argument("--artifact", type=int, default=None,
+                            help="Run this indexed test artifact instead of the newest one")
+
+    # ------------- artifacts -------------
+    art_parser = subparsers.add_parser("artifacts", help="List or show indexed generated test files")
+    art_sub = art_parser.add_subparsers(dest="action", required=True)
+    art_list = art_sub.add_parser("list", help="Artifacts, newest first")
+    art_list.add_argument("--module", default=None, help="Only artifacts for this module_path")
+    art_list.add_argument("--symbol", default=None, help="Only artifacts for this symbol")
+    art_list.add_argument("--model", default=None, help="Only artifacts generated by this model")
+    art_list.add_argument("--limit", type=int, default=20, help="How many to list")
+    art_show = art_sub.add_parser("show", help="Print one artifact's metadata and test file")
+    art_show.add_argument("artifact_id", type=str, help="Artifact id, or 'latest'")
+
+    # ------------- batch -------------
+    batch_parser = subparsers.add_parser("batch", help="Generate tests for many requests concurrently")
+    batch_parser.add_argument(
+        "items_path", type=str,
+        help="JSON file with a list of BundleRequest objects (or {\"items\": [...]})",
+    )
+    batch_parser.add_argument("--concurrency", "-c", type=int, default=None, help="Max concurrent generations")
+
+    # ------------- stream -------------
+    stream_parser = subparsers.add_parser("stream", help="Print generated tests live as the model writes them")
+    stream_parser.add_argument("code_path", type=str, help="Path to Python module (e.g. under_test.py)")
+    stream_parser.add_argument("--spec", "-s", type=str, default="n/a", help="Description of what the function does")
+    stream_parser.add_argument("--symbol", type=str, default=None, help="Target symbol (default: first top-level def)")
+    stream_parser.add_argument("--no-cache", action="store_true", help="Bypass the generation cache")
+    stream_parser.add_argument("--size", choices=["mini", "std", "max"], default="std",
+                               help="How many tests to ask for (also caps prompt and completion tokens)")
+
+    # ------------- watch -------------
+    watch_parser = subparsers.add_parser("watch", help="Regenerate tests for changed symbols whenever the file is saved")
+    watch_parser.add_argument("code_path", type=str, help="Path to Python module (e.g. under_test.py)")
+    watch_parser.add_argument("--spec", "-s", type=str, default="n/a", help="Description of what the function does")
+    watch_parser.add_argument("--debounce", type=float, default=0.5, help="Seconds of quiet before regenerating")
+    watch_parser.add_argument("--interval", type=float, default=0.25, help="Polling interval in seconds")
+
+    # ------------- repo -------------
+    repo_parser = subparsers.add_parser("repo", help="Generate (and run) tests for every module of a package")
+    repo_parser.add_argument("package_dir", type=str, help="Package directory (with __init__.py) or source root")
+    repo_parser.add_argument("--spec", "-s", type=str, default="n/a", help="Spec applied to every module")
+    repo_parser.add_argument("--size", choices=["mini", "std", "max"], default="std",
+                             help="How many tests to ask for (also caps prompt and completion tokens)")
+    repo_parser.add_argument("--out", default="tests/generated/repo",
+                             help="Where test files, report.jsonl, junit.xml and summary.json go")
+    repo_parser.add_argument("--concurrency", "-c", type=int, default=4, help="Max concurrent generations")
+    repo_parser.add_argument("--procs", type=int, default=None, help="Processes for parsing/compiling (default: cores)")
+    repo_parser.add_argument("--window", type=int, default=8, help="Max modules in flight at once")
+    repo_parser.add_argument("--timeout", type=float, default=60, help="pytest timeout per module, in seconds")
+    repo_parser.add_argument("--enable", action="store_true", help="Also run the tests (sets ENABLE_RUN=1)")
 
     args = parser.parse_args()
 
+    daemon = connect(socket_path(args.socket))
+    if args.profile and daemon is None and args.command != "watch":
+        from metrics import trace_scope
+
+        with trace_scope() as trace:
+            try:
+                run_command(args, daemon)
+            finally:
+                print_profile(trace.as_dict())
+    else:
+        run_command(args, daemon)
+
+
+def generate_bundle(payload: dict, daemon, profile: bool = False) -> dict:
+    """generate-and-save through the daemon when connected, else in-process."""
+    if daemon is not None:
+        result = daemon.request("POST", "/bundle/generate-and-save", {**payload, "timings": profile})
+    else:
+        from main import BundleRequest, generate_and_save_bundle
+
+        result = asyncio.run(generate_and_save_bundle(BundleRequest(**payload))).model_dump()
+    if daemon is not None and profile and result.get("timings"):
+        print_profile(result["timings"])
+    return result
+
+
+async def watch_command(args, daemon, stop=None) -> None:
+    """
+    `watch`: regenerate on every burst of saves until `stop()` returns True.
+    The whole session runs in one event loop, because the in-process SDK
+    client's connection pool is bound to the loop it was first used on.
+    """
+    from incremental import watch_changes
+    from metrics import trace_scope
+
+    async def regenerate():
+        payload = dict(
+            code=Path(args.code_path).read_text(),
+            spec=args.spec,
+            module_path=args.code_path,
+            all_symbols=True,
+            incremental=True,
+            cleanup_old=True,
+        )
+        try:
+            # one breakdown per regeneration
+            with trace_scope(nested=True) as trace:
+                if daemon is not None:
+                    result = await asyncio.to_thread(generate_bundle, payload, daemon, args.profile)
+                else:
+                    from main import BundleRequest, generate_and_save_bundle
+
+                    result = (await generate_and_save_bundle(BundleRequest(**payload))).model_dump()
+        except Exception as e:
+            print(f"❌ {e}")
+            return
+        if args.profile and daemon is None:
+            print_profile(trace.as_dict())
+        changed = [s for s in result["symbols"] if s not in result["unchanged"]]
+        print(f"✅ regenerated: {', '.join(changed) or '-'} | unchanged: {', '.join(result['unchanged']) or '-'}")
+
+    print(f"👀 Watching {args.code_path} (Ctrl-C to stop)")
+    await regenerate()
+    async for _ in watch_changes(args.code_path, debounce=args.debounce, interval=args.interval, stop=stop):
+        await regenerate()
+
+
+def artifacts_command(args, daemon) -> None:
+    """`artifacts list` / `artifacts show` from the server's index when connected, else the local one."""
+    from urllib.parse import urlencode
+
+    if args.action == "list":
+        filters = {"module_path": args.module, "symbol": args.symbol, "model": args.model, "limit": args.limit}
+        if daemon is not None:
+            query = urlencode({k: v for k, v in filters.items() if v is not None})
+            found = daemon.request("GET", f"/artifacts?{query}")["artifacts"]
+        else:
+            import core
+
+            found = core._artifacts.query(**filters)
+        for a in found:
+            run = a["last_run"]
+            status = "never run" if run is None else f"exit {run['exit_code']}"
+            print(f"{a['id']:>6}  {a['module_path']}::{a['symbol']}  {a['file_name']}  {a['model']}  {status}")
+        if not found:
+            print("No artifacts.")
+        return
+
+    if daemon is not None:
+        artifact = daemon.request("GET", f"/artifacts/{args.artifact_id}")
+    else:
+        import core
+
+        if args.artifact_id == "latest":
+            artifact = core._artifacts.latest()
+        else:
+            artifact = core._artifacts.get(int(args.artifact_id)) if args.artifact_id.isdigit() else None
+        if artifact is None:
+            print("❌ Unknown artifact.")
+            raise SystemExit(1)
+        artifact = {**artifact, "content": core._artifacts.read(artifact)}
+    content = artifact.pop("content")
+    print(json.dumps(artifact, indent=2))
+    print(content)
+
+
+def run_command(args, daemon=None):
+    try:
+        _run_command(args, daemon)
+    except DaemonError as e:
+        print(f"❌ daemon: {e.detail}")
+        raise SystemExit(1)
+
+
+def _run_command(args, daemon):
     if args.command == "generate":
         code = Path(args.code_path).read_text()
 
-        req = BundleRequest(
+        payload = dict(
             code=code,
             spec=args.spec,
+            size=args.size,
             module_path=args.code_path,
             tests_mode="per_symbol" if args.cleanup else "single",
-            cleanup_old=args.cleanup
+            cleanup_old=args.cleanup,
+            all_symbols=args.all_symbols,
+            incremental=args.incremental,
         )
 
-        result = generate_and_save_bundle(req)
+        result = generate_bundle(payload, daemon, profile=args.profile)
+        result.pop("timings", None)
         print("✅ Generated tests:")
-        print(json.dumps(result.model_dump(), indent=2))
+        print(json.dumps(result, indent=2))
 
 
     elif args.command == "run":
-        if args.enable:
-            os.environ["ENABLE_RUN"] = "1"
+        if daemon is not None:
+            res = daemon.request("POST", "/bundle/run", {"code_path": "under_test.py", "force": args.force,
+                                                         "mutation": args.mutation, "artifact_id": args.artifact})
+        else:
+            if args.enable:
+                os.environ["ENABLE_RUN"] = "1"
+
+            from core import GenerationError, _run_enabled, run_latest_bundle
+
+            if not _run_enabled():
+                print("❌ Run mode disabled. Use '--enable' to override.")
+                return
+
+            try:
+                res = asyncio.run(run_latest_bundle(force=args.force, mutation=args.mutation,
+                                                    artifact_id=args.artifact))
+            except GenerationError as e:
+                print(f"❌ {e.detail}")
+                raise SystemExit(1)
+        if res.get("limit"):
+            print(f"❌ pytest stopped by the {res['limit']} limit")
+            print(res["stdout"] + res["stderr"])
+            raise SystemExit(1)
+        print(f"✅ Pytest output{' (cached, use --force to re-run)' if res['cached'] else ''}:\n")
+        print(res["stdout"] + res["stderr"])
+        print(f"Exit code: {res['exit_code']}" + (f" (artifact {res['artifact']})" if res.get("artifact") else ""))
+        if res.get("mutation"):
+            from mutation import format_summary
 
-        if not _run_enabled():
-            print("❌ Run mode disabled. Use '--enable' to override.")
+            print(format_summary(res["mutation"]))
+
+    elif args.command == "artifacts":
+        artifacts_command(args, daemon)
+
+    elif args.command == "batch":
+        data = json.loads(Path(args.items_path).read_text())
+        items = data["items"] if isinstance(data, dict) else data
+        if daemon is not None:
+            result = daemon.request("POST", "/bundle/generate-batch", {"items": items, "concurrency": args.concurrency})
+        else:
+            from fastapi import HTTPException
+            from main import BatchRequest, generate_batch
+
+            req = BatchRequest(items=items, concurrency=args.concurrency)
+            try:
+                result = asyncio.run(generate_batch(req)).model_dump()
+            except HTTPException as e:
+                print(f"❌ {e.detail}")
+                raise SystemExit(1)
+        print(json.dumps(result, indent=2))
+        print(f"{'✅' if not result['failed'] else '⚠️'} {result['succeeded']} succeeded, {result['failed']} failed")
+        if result["failed"]:
+            raise SystemExit(1)
+
+    elif args.command == "stream":
+        code = Path(args.code_path).read_text()
+
+        if daemon is not None:
+            payload = {"code": code, "spec": args.spec, "symbol": args.symbol, "no_cache": args.no_cache,
+                       "size": args.size}
+            for chunk in daemon.stream("/tests/generate.stream", payload):
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+            sys.stdout.write("\n")
             return
 
-        exit_code, out = run_bundle_tests()
-        print("✅ Pytest output:\n")
-        print(out)
-        print(f"Exit code: {exit_code}")
+        from core import detect_symbol_name, _stream_tests_text
+
+        symbol = args.symbol or detect_symbol_name(code) or "target"
+
+        async def _print_stream():
+            async for chunk in _stream_tests_text(symbol, args.spec, code, no_cache=args.no_cache, size=args.size):
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+            sys.stdout.write("\n")
+
+        asyncio.run(_print_stream())
+
+    elif args.command == "watch":
+        try:
+            asyncio.run(watch_command(args, daemon))
+        except KeyboardInterrupt:
+            pass
+
+    elif args.command == "repo":
+        # always in-process: the run streams through local files, not one request
+        if args.enable:
+            os.environ["ENABLE_RUN"] = "1"
+        from core import _run_enabled
+        from repo import run_repo
+
+        summary = asyncio.run(run_repo(
+            args.package_dir, spec=args.spec, out_dir=args.out, size=args.size, concurrency=args.concurrency,
+            procs=args.procs, window=args.window, timeout=args.timeout, run=_run_enabled(),
+        ))
+        print(json.dumps(summary, indent=2))
+        bad = summary["modules_failed"] or summary["generation_errors"]
+        print(f"{'⚠️' if bad else '✅'} {summary['modules']} modules, {summary['generated']} test files, "
+              f"{summary['passed']} passed, {summary['failed']} failed -> {args.out}")
+        if bad:
+            raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
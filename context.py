@@ -0,0 +1,185 @@
+"""
+Prompt context for one target symbol.
+
+Instead of sending a whole module, build_context() extracts the target's
+source (or, for a method, its class header plus the method), its signature
+and docstring, and the top-level helpers / same-class methods it references
+directly, then fits them into a token budget. When the budget is tight the
+target is kept, helpers degrade to signatures, and as a last resort the target
+itself is reduced to its signature and docstring.
+"""
+import ast
+from typing import List, Optional, Set
+
+# ~4 characters per token, the same estimate the rate limiter uses
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Context:
+    """The prompt-ready context for a symbol and what had to be left out."""
+
+    def __init__(self, symbol: str, signature: str = "", docstring: str = "", text: str = "",
+                 helpers: Optional[List[str]] = None, truncated: bool = False):
+        self.symbol = symbol
+        self.signature = signature
+        self.docstring = docstring
+        self.text = text
+        self.helpers = helpers or []
+        self.truncated = truncated
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def as_dict(self) -> dict:
+        return {"symbol": self.symbol, "signature": self.signature, "helpers": self.helpers,
+                "tokens": self.tokens, "truncated": self.truncated}
+
+
+def _segment(code: str, node: ast.AST) -> str:
+    """Source of node including its decorators."""
+    lines = code.splitlines()
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    return "\n".join(lines[start - 1:node.end_lineno])
+
+
+def signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(b) for b in node.bases + node.keywords)
+        return f"class {node.name}({bases}):" if bases else f"class {node.name}:"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}:"
+
+
+def _stub(node: ast.AST, indent: str = "") -> str:
+    """Signature plus docstring, body elided."""
+    doc = ast.get_docstring(node)
+    body = f'{indent}    """{doc}"""\n{indent}    ...' if doc else f"{indent}    ..."
+    return f"{indent}{signature(node)}\n{body}"
+
+
+def _referenced(node: ast.AST):
+    """Bare names loaded in node and attributes accessed on self/cls."""
+    names: Set[str] = set()
+    attrs: Set[str] = set()
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Load):
+            names.add(sub.id)
+        elif isinstance(sub, ast.Attribute) and isinstance(sub.value, ast.Name) and sub.value.id in ("self", "cls"):
+            attrs.add(sub.attr)
+    return names, attrs
+
+
+def _find(tree: ast.Module, symbol: str):
+    """(top-level node, method node or None) for "name" or "Class.method"."""
+    head, _, rest = symbol.partition(".")
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name == head:
+            if not rest:
+                return node, None
+            if isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name == rest:
+                        return node, item
+            return node, None
+    return None, None
+
+
+def _top_level(tree: ast.Module) -> dict:
+    """name -> defining node for top-level defs, classes, assignments and imports."""
+    defs = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defs[node.name] = node
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for sub in ast.walk(target):
+                    if isinstance(sub, ast.Name):
+                        defs.setdefault(sub.id, node)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                defs.setdefault(alias.asname or alias.name.split(".")[0], node)
+    return defs
+
+
+def build_context(code: str, symbol: str, budget_tokens: int) -> Context:
+    """
+    Context for `symbol` ("name" or "Class.method") from `code`, at most
+    budget_tokens long where possible. Unparsable code or an unknown symbol
+    falls back to the raw code cut to the budget.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        tree = None
+    top, method = _find(tree, symbol) if tree is not None else (None, None)
+    if top is None:
+        text = code[:budget_tokens * CHARS_PER_TOKEN]
+        return Context(symbol, text=text.strip(), truncated=len(text) < len(code))
+
+    target = method or top
+    ctx = Context(symbol, signature=signature(target), docstring=ast.get_docstring(target) or "")
+    target_src = _segment(code, method or top)
+    if estimate_tokens(target_src) > budget_tokens:
+        target_src = _stub(target, "    " if method is not None else "")
+        ctx.truncated = True
+    used = estimate_tokens(target_src)
+
+    def fit(node, indent: str = "") -> Optional[str]:
+        """Full source, else a stub, else None, whichever still fits the budget."""
+        nonlocal used
+        full = _segment(code, node)
+        stub = _stub(node, indent) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) else None
+        for chosen in (full, stub):
+            if chosen is not None and used + estimate_tokens(chosen) + 1 <= budget_tokens:
+                used += estimate_tokens(chosen) + 1
+                ctx.truncated = ctx.truncated or chosen is not full
+                return chosen
+        ctx.truncated = True
+        return None
+
+    # direct references only: names used by the target, and self./cls. methods of its class
+    defs = _top_level(tree)
+    names, attrs = _referenced(target)
+    imports = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))
+               and any((a.asname or a.name.split(".")[0]) in names for a in n.names)]
+    parts = [_segment(code, n) for n in imports]
+    used += sum(estimate_tokens(p) + 1 for p in parts)
+
+    if method is not None:
+        # the class header and constructor, plus the same-class methods the target calls
+        header = signature(top)
+        if ast.get_docstring(top):
+            header += f'\n    """{ast.get_docstring(top)}"""'
+        used += estimate_tokens(header) + 1
+        members = []
+        for item in top.body:
+            if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) or item is method:
+                continue
+            if item.name == "__init__" or item.name in attrs:
+                chosen = fit(item, "    ")
+                if chosen is not None:
+                    members.append(chosen)
+                    if item.name != "__init__":
+                        ctx.helpers.append(f"{top.name}.{item.name}")
+        target_src = "\n".join([header] + members + [target_src])
+
+    for node in tree.body:
+        if node is top or isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        bound = sorted(n for n in names if defs.get(n) is node)
+        if not bound:
+            continue
+        chosen = fit(node)
+        if chosen is not None:
+            parts.append(chosen)
+            ctx.helpers.append(getattr(node, "name", None) or ", ".join(bound))
+
+    ctx.text = "\n\n".join(parts + [target_src]).strip()
+    return ctx
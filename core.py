@@ -0,0 +1,1242 @@
+"""
+Generation core: model calls, caching, rate limiting, prompt/marker parsing,
+workspaces and the pytest runner, with no web framework imports.
+
+main.py wraps this in the FastAPI app; cli.py uses it directly (or talks to a
+running server, see daemon_client.py). The Mistral SDK and httpx are only
+imported when a client is first needed, so `cli.py run` and `--help` start
+quickly and never need an API key.
+"""
+import os, sys, json, re, time, random, ast, asyncio, hashlib, tempfile, contextvars
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from gen_cache import TwoTierCache, make_key, normalized_code_hash
+from ratelimit import RateLimiter
+from pytest_pool import PytestPool, PoolTimeout, TailBuffer, LineSplitter
+from workspace import Workspace, WorkspaceManager, atomic_write
+from incremental import Manifest, symbol_hashes
+from breaker import CircuitBreaker
+from jobs import JobQueue
+from artifacts import ArtifactStore
+from singleflight import SingleFlight
+from sandbox import AdmissionController, AdmissionTimeout, Limits, apply_limits, classify, default_slots, scrubbed_env
+from metrics import (
+    current_trace, stage, GEN_CACHE_LOOKUPS, GEN_COALESCED, RUN_CACHE_LOOKUPS, MODEL_BACKOFF_SECONDS, MODEL_CALL_SECONDS, MODEL_RETRIES,
+    MODEL_TOKENS, MUTANTS, PYTEST_RUNS, ROUTE_COMPLEXITY, ROUTE_DECISIONS, ROUTE_OUTCOMES, ROUTE_SECONDS,
+    RUN_LIMITS_HIT, STAGE_SECONDS, VALIDATIONS,
+)
+from validate import validate_tests
+from context import build_context
+from router import Router
+from mutation import build_schemata, format_summary, imported_targets, sample, summarize
+
+MistralAPIException = Exception
+
+
+class GenerationError(Exception):
+    """A generation failure with the HTTP status the API should answer with (main maps it)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# -----------------------------------------------------------------------------
+# Setup
+# -----------------------------------------------------------------------------
+load_dotenv()
+API_KEY = os.getenv("MISTRAL_API_KEY")
+MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
+FALLBACK_MODEL = os.getenv("MISTRAL_FALLBACK_MODEL", "mistral-medium-latest")
+STUB_MODE = os.getenv("STUB_GEN") == "1"
+
+# Shared SDK client (a mistralai.Mistral) backed by one pooled httpx.AsyncClient;
+# installed by the app lifespan (see main._lifespan) or lazily by _get_client().
+HTTP_MAX_CONNECTIONS = int(os.getenv("MISTRAL_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("MISTRAL_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_TIMEOUT = float(os.getenv("MISTRAL_HTTP_TIMEOUT", "120"))
+client = None
+
+def _new_http_client():
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        timeout=HTTP_TIMEOUT,
+    )
+
+def _new_client(http=None):
+    from mistralai import Mistral
+
+    return Mistral(api_key=API_KEY, async_client=http or _new_http_client())
+
+def _get_client():
+    global client
+    if client is None:
+        if not API_KEY:
+            raise GenerationError(500, "MISTRAL_API_KEY is not set (or set STUB_GEN=1).")
+        client = _new_client()
+    return client
+
+# Generation cache: GEN_CACHE=0 disables it, GEN_CACHE_PATH="" keeps it memory-only.
+GEN_CACHE_ENABLED = os.getenv("GEN_CACHE", "1") != "0"
+_gen_cache = TwoTierCache(
+    os.getenv("GEN_CACHE_PATH", ".cache/gen_cache.sqlite3") or None,
+    table="generations",
+    max_entries=int(os.getenv("GEN_CACHE_MAX_ENTRIES", "256")),
+    disk_max_entries=int(os.getenv("GEN_CACHE_DISK_MAX_ENTRIES", "5000")),
+    ttl=float(os.getenv("GEN_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Test-result cache: RUN_CACHE=0 disables it. Keyed on the exact workspace files,
+# pytest args and the Python/pytest versions, so a hit never needs a process.
+RUN_CACHE_ENABLED = os.getenv("RUN_CACHE", "1") != "0"
+_run_cache = TwoTierCache(
+    os.getenv("RUN_CACHE_PATH", ".cache/run_cache.sqlite3") or None,
+    table="runs",
+    max_entries=int(os.getenv("RUN_CACHE_MAX_ENTRIES", "128")),
+    disk_max_entries=int(os.getenv("RUN_CACHE_DISK_MAX_ENTRIES", "2000")),
+    ttl=float(os.getenv("RUN_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# One limiter shared by every model call (single requests and batch workers).
+_limiter = RateLimiter(
+    rps=float(os.getenv("RATE_LIMIT_RPS", "5")),
+    tpm=float(os.getenv("RATE_LIMIT_TPM", "0")),
+)
+# 429/capacity retries back off exponentially from RETRY_BASE_DELAY up to RETRY_MAX_DELAY seconds.
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2.0"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+# Per-model circuit breakers; an open primary is skipped straight to the fallback.
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+_breakers: dict = {}
+
+# Model routing: targets whose AST complexity score is at most ROUTER_MAX_SCORE (scaled by
+# the size preset) try CHEAP_MODEL first and escalate to MODEL when its answer fails a check.
+CHEAP_MODEL = os.getenv("MISTRAL_CHEAP_MODEL", "mistral-small-latest")
+ROUTER_RUN_CHECK = os.getenv("ROUTER_RUN_CHECK") == "1"
+_router = Router(
+    CHEAP_MODEL,
+    max_score=float(os.getenv("ROUTER_MAX_SCORE", "20")),
+    enabled=os.getenv("ROUTER", "1") != "0" and CHEAP_MODEL != MODEL,
+)
+
+# Hedging: if the primary is slower than its p95, also ask the fallback and take the first answer.
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED") == "1"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))
+_hedge_stats = {"fired": 0, "won_by_primary": 0, "won_by_fallback": 0, "primary_skipped": 0}
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# Identical generations in flight at the same time share one model call; waiters
+# give up after COALESCE_WAIT_TIMEOUT seconds (0 = wait as long as the call takes).
+COALESCE_ENABLED = os.getenv("COALESCE", "1") != "0"
+COALESCE_WAIT_TIMEOUT = float(os.getenv("COALESCE_WAIT_TIMEOUT", "300"))
+_inflight = SingleFlight()
+
+# size preset -> completion budget, budget for the code context in the prompt, and
+# how much to ask for. Smaller prompts and completions mean a faster first token.
+SIZE_PRESETS = {
+    "mini": {"max_tokens": 600, "context_tokens": 400, "guidance": "a few focused tests of the main behaviour"},
+    "std": {"max_tokens": 1200, "context_tokens": 1200, "guidance": "typical, edge and invalid inputs"},
+    "max": {"max_tokens": 2400, "context_tokens": 3000, "guidance": "thorough coverage of every branch and edge case"},
+}
+
+# Generated tests that still fail static validation after deterministic repair get
+# up to this many short repair prompts before the request fails.
+VALIDATE_REPAIR_ATTEMPTS = int(os.getenv("VALIDATE_REPAIR_ATTEMPTS", "1"))
+
+RUN_OUTPUT_MAX_BYTES = int(os.getenv("RUN_OUTPUT_MAX_BYTES", str(64 * 1024)))
+# Events a /bundle/generate-run/stream client may fall behind by; past that, line and
+# test events are dropped (counted in the summary) and the summary is still delivered.
+STREAM_MAX_PENDING_EVENTS = int(os.getenv("STREAM_MAX_PENDING_EVENTS", "1000"))
+
+# Sandbox for generated tests: per-run rlimits, a scrubbed environment, and at most
+# RUN_MAX_CONCURRENT runs at once (default: by cores and memory); the rest queue.
+RUN_LIMITS = Limits.from_env()
+RUN_MAX_CONCURRENT = int(os.getenv("RUN_MAX_CONCURRENT", "0")) or default_slots(RUN_LIMITS)
+RUN_ADMISSION_TIMEOUT = float(os.getenv("RUN_ADMISSION_TIMEOUT", "60"))
+_admission = AdmissionController(RUN_MAX_CONCURRENT)
+
+# Mutation scoring (opt-in per request): at most MUTATION_MAX_MUTANTS mutants, split over
+# MUTATION_WORKERS pytest processes that each get MUTATION_TIMEOUT seconds.
+MUTATION_WORKERS = int(os.getenv("MUTATION_WORKERS", "2"))
+MUTATION_MAX_MUTANTS = int(os.getenv("MUTATION_MAX_MUTANTS", "200"))
+MUTATION_TIMEOUT = float(os.getenv("MUTATION_TIMEOUT", "60"))
+
+# Warm pytest runners; PYTEST_POOL_SIZE=0 falls back to one cold subprocess per run.
+PYTEST_POOL_SIZE = int(os.getenv("PYTEST_POOL_SIZE", "2"))
+_pytest_pool = PytestPool(
+    size=PYTEST_POOL_SIZE,
+    max_jobs=int(os.getenv("PYTEST_POOL_MAX_JOBS", "50")),
+    # the workers never see the server's secrets either
+    env=scrubbed_env(tempfile.gettempdir()),
+) if PYTEST_POOL_SIZE > 0 and PytestPool.supported() else None
+
+# One directory per request/job; WORKSPACE_ROOT defaults to tmpfs when available.
+_workspaces = WorkspaceManager(
+    os.getenv("WORKSPACE_ROOT") or None,
+    ttl=float(os.getenv("WORKSPACE_TTL", "3600")),
+    gc_interval=float(os.getenv("WORKSPACE_GC_INTERVAL", "300")),
+)
+
+# Asynchronous jobs (POST /jobs): persistent queue drained by JOB_WORKERS workers in the server.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+_jobs = JobQueue(
+    os.getenv("JOBS_PATH", ".cache/jobs.sqlite3") or None,
+    ttl=float(os.getenv("JOB_TTL", str(24 * 3600))),
+    lease=float(os.getenv("JOB_LEASE", "60")),
+)
+
+# Published test files are indexed in an artifact store (blobs + SQLite) under ARTIFACTS_PATH;
+# the newest ARTIFACTS_KEEP_LAST per (module, symbol) are kept, 0 keeps everything.
+_artifacts = ArtifactStore(
+    os.getenv("ARTIFACTS_PATH", ".cache/artifacts"),
+    keep_last=int(os.getenv("ARTIFACTS_KEEP_LAST", "5")),
+)
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+def detect_symbol_name(code: str) -> Optional[str]:
+    """Return the first top-level function or class name in the code."""
+    try:
+        tree = ast.parse(code)
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                return node.name
+            if isinstance(node, ast.ClassDef):
+                return node.name
+    except Exception:
+        pass
+    return None
+
+def detect_symbols(code: str) -> List[str]:
+    """
+    Return every public top-level function/class, plus public methods of those
+    classes as "Class.method", in source order.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and not node.name.startswith("_"):
+            symbols.append(node.name)
+            if isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and not item.name.startswith("_"):
+                        symbols.append(f"{node.name}.{item.name}")
+    return symbols
+
+def _import_name(symbol: str) -> str:
+    """Methods ("Class.method") are imported through their class."""
+    return symbol.split(".", 1)[0]
+
+def _tests_file_name(symbol: str) -> str:
+    return f"test_{symbol.replace('.', '_')}.py"
+
+def _parse_json_from_model(raw_content) -> dict:
+    # normalize to string
+    if isinstance(raw_content, list):
+        parts = []
+        for c in raw_content:
+            if isinstance(c, dict) and "text" in c:
+                parts.append(c["text"])
+        text = "".join(parts)
+    else:
+        text = str(raw_content)
+
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?\s*", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\s*```$", "", text)
+    text = _clean_to_first_json(text)
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        m = re.search(r"\{.*\}", text, flags=re.DOTALL)
+        if not m:
+            raise GenerationError(502, f"Model did not return valid JSON. Raw: {text[:800]}")
+        try:
+            return json.loads(m.group(0))
+        except json.JSONDecodeError as e:
+            raise GenerationError(502, f"JSON parse failed: {e}. Raw: {text[:800]}")
+
+def _estimate_tokens(messages, max_tokens: int = 0) -> int:
+    # ~4 characters per token is close enough for budgeting
+    chars = sum(len(str(m.get("content", ""))) for m in messages or [])
+    return chars // 4 + max_tokens
+
+# Models that answered during the current generation, in order (see _generate_tests).
+# A list rather than a value so calls made in hedging tasks are seen by their caller.
+_served_by: contextvars.ContextVar = contextvars.ContextVar("spec2test_served_by", default=None)
+
+def _breaker(model: str) -> CircuitBreaker:
+    if model not in _breakers:
+        _breakers[model] = CircuitBreaker(model, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN)
+    return _breakers[model]
+
+def _record_usage(model: str, usage) -> dict:
+    """Count prompt/completion tokens reported by the API (usage may be missing)."""
+    counts = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+    }
+    MODEL_TOKENS.inc(counts["prompt_tokens"], model=model, kind="prompt")
+    MODEL_TOKENS.inc(counts["completion_tokens"], model=model, kind="completion")
+    trace = current_trace()
+    if trace is not None:
+        trace.add_tokens(counts["prompt_tokens"], counts["completion_tokens"])
+    return counts
+
+async def _call_with_retries(model, stream: bool = False, **kwargs):
+    """
+    Call the chat API with shared rate limiting and 429/capacity backoff.
+    With stream=True the opened event stream is returned (errors surface on open).
+    Outcomes feed the model's circuit breaker; once it opens, retrying stops.
+    Time is split into rate_limit / model / backoff stages, and the call
+    (attempts, backoff, tokens) is added to the current trace.
+    """
+    breaker = _breaker(model)
+    delay = RETRY_BASE_DELAY
+    tokens = _estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens", 0))
+    call_started = time.monotonic()
+    attempts, backoff_s, outcome, usage = 0, 0.0, "error", {}
+    try:
+        for _ in range(6):  
+            attempts += 1
+            try:
+                with stage("rate_limit"):
+                    await _limiter.acquire(tokens)
+                started = time.monotonic()
+                chat = _get_client().chat
+                with stage("model"):
+                    res = await (chat.stream_async if stream else chat.complete_async)(model=model, **kwargs)
+                _limiter.on_success()
+                # time-to-headers of a stream isn't comparable with full completions
+                breaker.record_success(None if stream else time.monotonic() - started)
+                if not stream:
+                    usage = _record_usage(model, getattr(res, "usage", None))
+                served = _served_by.get()
+                if served is not None:
+                    served.append(model)
+                outcome = "ok"
+                return res
+            except asyncio.CancelledError:
+                breaker.release()
+                outcome = "cancelled"
+                raise
+            except MistralAPIException as e:
+                breaker.record_failure()
+                msg = str(e).lower()
+                if "429" in msg or "capacity" in msg or "rate limit" in msg:
+                    _limiter.on_rate_limited()
+                    if breaker.is_open():
+                        raise GenerationError(503, f"Circuit open for {model}.")
+                    MODEL_RETRIES.inc(model=model)
+                    pause = delay + random.uniform(0, 0.75 * RETRY_BASE_DELAY)
+                    with stage("backoff"):
+                        await asyncio.sleep(pause)
+                    MODEL_BACKOFF_SECONDS.observe(pause, model=model)
+                    backoff_s += pause
+                    delay = min(delay * 2, RETRY_MAX_DELAY)
+                    continue
+                raise
+        raise GenerationError(502, "Upstream capacity/rate limit after retries.")
+    finally:
+        elapsed = time.monotonic() - call_started
+        MODEL_CALL_SECONDS.observe(elapsed, model=model, outcome=outcome)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_model_call(model=model, outcome=outcome, stream=stream, attempts=attempts,
+                                 retries=attempts - 1, seconds=round(elapsed, 4),
+                                 backoff_s=round(backoff_s, 4), **usage)
+
+def _hedge_delay() -> Optional[float]:
+    if not HEDGE_ENABLED:
+        return None
+    p95 = _breaker(MODEL).percentile(0.95, min_samples=HEDGE_MIN_SAMPLES)
+    return None if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+async def _chat(messages, max_tokens: int = 1200):
+    kwargs = dict(messages=messages, temperature=0, max_tokens=max_tokens)
+    if not _breaker(MODEL).allow():
+        _hedge_stats["primary_skipped"] += 1
+        return await _call_with_retries(FALLBACK_MODEL, **kwargs)
+
+    hedge_after = _hedge_delay()
+    if hedge_after is None:
+        try:
+            return await _call_with_retries(MODEL, **kwargs)
+        except GenerationError:
+            return await _call_with_retries(FALLBACK_MODEL, **kwargs)
+
+    primary = asyncio.create_task(_call_with_retries(MODEL, **kwargs))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        try:
+            return primary.result()
+        except GenerationError:
+            return await _call_with_retries(FALLBACK_MODEL, **kwargs)
+
+    # primary is slower than its p95: race it against the fallback
+    _hedge_stats["fired"] += 1
+    hedge = asyncio.create_task(_call_with_retries(FALLBACK_MODEL, **kwargs))
+    pending = {primary, hedge}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    _hedge_stats["won_by_primary" if task is primary else "won_by_fallback"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _chat_stream(messages, max_tokens: int = 1200, served: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """
+    Yield text deltas from the streaming chat API; closing the generator closes
+    the upstream stream. The model that answered is appended to `served`.
+    """
+    kwargs = dict(stream=True, messages=messages, temperature=0, max_tokens=max_tokens)
+    model = MODEL
+    if not _breaker(MODEL).allow():
+        _hedge_stats["primary_skipped"] += 1
+        model = FALLBACK_MODEL
+        events = await _call_with_retries(model, **kwargs)
+    else:
+        try:
+            events = await _call_with_retries(model, **kwargs)
+        except GenerationError:
+            model = FALLBACK_MODEL
+            events = await _call_with_retries(model, **kwargs)
+    if served is not None:
+        served.append(model)
+    async with events:
+        async for event in events:
+            # usage only arrives on the final chunk
+            if getattr(event.data, "usage", None) is not None:
+                _record_usage(model, event.data.usage)
+            if not event.data.choices:
+                continue
+            delta = event.data.choices[0].delta.content
+            if isinstance(delta, list):
+                delta = "".join((c.get("text", "") if isinstance(c, dict) else getattr(c, "text", "")) for c in delta)
+            if delta:
+                yield delta
+    
+def _clean_to_first_json(text: str) -> str:
+    text = text.lstrip("\ufeff")
+    m = re.search(r"\{", text)
+    return text[m.start():] if m else text
+
+def _extract_between(text: str, start: str, end: str) -> str:
+    s = text.find(start)
+    if s == -1:
+        raise GenerationError(502, "Start marker not found in model output.")
+    s += len(start)
+    e = text.find(end, s)
+    if e == -1:
+        raise GenerationError(502, "End marker not found in model output.")
+    return text[s:e].strip()
+
+class _MarkerScanner:
+    """
+    Incremental _extract_between: feed() model chunks and get back only the
+    text between the markers, as soon as it can no longer be part of the end
+    marker. The concatenated output equals _extract_between(...) on the whole text.
+    """
+
+    def __init__(self, start: str, end: str):
+        self.start, self.end = start, end
+        self.buf = ""
+        self.started = False
+        self.done = False
+        self._emitted = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self.buf += chunk
+        if not self.started:
+            i = self.buf.find(self.start)
+            if i == -1:
+                # keep just enough to match a marker split across chunks
+                self.buf = self.buf[-(len(self.start) - 1):]
+                return ""
+            self.started = True
+            self.buf = self.buf[i + len(self.start):]
+        if not self._emitted:
+            self.buf = self.buf.lstrip()
+        e = self.buf.find(self.end)
+        if e != -1:
+            self.done = True
+            out, self.buf = self.buf[:e].rstrip(), ""
+        else:
+            # hold back a possible partial end marker and trailing whitespace
+            safe = self.buf[:max(0, len(self.buf) - (len(self.end) - 1))]
+            cut = len(safe.rstrip())
+            out, self.buf = self.buf[:cut], self.buf[cut:]
+        if out:
+            self._emitted = True
+        return out
+
+    def finish(self) -> None:
+        if not self.started:
+            raise GenerationError(502, "Start marker not found in model output.")
+        if not self.done:
+            raise GenerationError(502, "End marker not found in model output.")
+
+def _gen_cache_key(symbol: str, spec: str, code: str, size: str = "std", style_hints=(),
+                   tier: Optional[str] = None) -> str:
+    """tier: the router's serving key for the target (computed when None); streaming passes "default"."""
+    stub = os.getenv("STUB_GEN") == "1"
+    model = "stub" if stub else MODEL
+    if tier is None:
+        # the stub never routes
+        tier = "default" if stub else _router.serving_key(code, symbol, size)
+    return make_key(model, tier, RAW_SYSTEM, RAW_USER, symbol, spec.strip(), normalized_code_hash(code),
+                    size, *style_hints)
+
+def _cache_entry(tests_py: str, model: str) -> str:
+    return json.dumps({"tests": tests_py, "model": model})
+
+def _cache_value(raw: str) -> Tuple[str, str]:
+    entry = json.loads(raw)
+    return entry["tests"], entry["model"]
+
+async def _gen_tests_text(symbol: str, spec: str, code: str = "", no_cache: bool = False,
+                          size: str = "std", style_hints=()) -> str:
+    """_gen_tests without the model name."""
+    tests_py, _ = await _gen_tests(symbol, spec, code, no_cache, size, style_hints)
+    return tests_py
+
+async def _gen_tests(symbol: str, spec: str, code: str = "", no_cache: bool = False,
+                     size: str = "std", style_hints=()) -> Tuple[str, str]:
+    """
+    Cached front for _generate_tests: (tests, model that wrote them). The key
+    covers model, routing tier, prompt templates, symbol, spec, the
+    AST-normalized code, size and style hints; no_cache skips the lookup but
+    still stores the fresh result. On a miss, callers with the same key share
+    one in-flight generation (_coalesced).
+    """
+    key = _gen_cache_key(symbol, spec, code, size, style_hints)
+    if not GEN_CACHE_ENABLED:
+        return await _coalesced(key, lambda: _generate_tests(symbol, spec, code, size, style_hints))
+    if not no_cache:
+        with stage("cache"):
+            cached = _gen_cache.get(key)
+        GEN_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return _cache_value(cached)
+
+    async def generate() -> Tuple[str, str]:
+        tests_py, model = await _generate_tests(symbol, spec, code, size, style_hints)
+        _gen_cache.set(key, _cache_entry(tests_py, model))
+        return tests_py, model
+
+    return await _coalesced(key, generate)
+
+async def _coalesced(key: str, generate):
+    """Run generate() once per key at a time; identical concurrent callers wait for that result."""
+    if not COALESCE_ENABLED:
+        return await generate()
+    started = time.monotonic()
+    try:
+        result, shared = await _inflight.do(key, generate, timeout=COALESCE_WAIT_TIMEOUT or None)
+    except asyncio.TimeoutError:
+        GEN_COALESCED.inc(result="timeout")
+        raise GenerationError(504, "Timed out waiting for an identical generation already in progress.")
+    if shared:
+        # the leader's trace has the model stages; a waiter only saw the wait
+        GEN_COALESCED.inc(result="shared")
+        waited = time.monotonic() - started
+        STAGE_SECONDS.observe(waited, stage="coalesce_wait")
+        trace = current_trace()
+        if trace is not None:
+            trace.add("coalesce_wait", waited)
+    return result
+
+async def _generate_tests(symbol: str, spec: str, code: str = "", size: str = "std",
+                          style_hints=()) -> Tuple[str, str]:
+    """
+    (tests, model that wrote them). When STUB_GEN=1, a tiny deterministic
+    pytest file from "stub". Otherwise, call the real model through _chat(...)
+    with RAW_* prompts, sized by the `size` preset. Simple targets try
+    CHEAP_MODEL first (see router.py) and fall through to the default path if
+    that answer is rejected. Either way the result passes static validation
+    (see _validated).
+    """
+    if os.getenv("STUB_GEN") == "1":
+        return await _validated(_stub_tests_text(symbol), symbol, code), "stub"
+
+    served: List[str] = []
+    token = _served_by.set(served)
+    try:
+        tests_py, tier = await _routed_tests(symbol, spec, code, size, style_hints)
+    finally:
+        _served_by.reset(token)
+    # the last model to answer wrote (or repaired) the tests
+    return tests_py, served[-1] if served else (_router.cheap_model if tier == "cheap" else MODEL)
+
+async def _routed_tests(symbol: str, spec: str, code: str, size: str, style_hints) -> Tuple[str, str]:
+    """(tests, tier that produced them) for _generate_tests."""
+    max_tokens = _size_preset(size)["max_tokens"]
+    messages = _prompt_messages(symbol, spec, code, size, style_hints)
+    with stage("route"):
+        decision = _router.decide(code, symbol, size)
+    ROUTE_DECISIONS.inc(tier=decision["tier"], reason=decision["reason"])
+
+    if decision["tier"] == "cheap":
+        started = time.monotonic()
+        tests_py, result = await _cheap_tests(messages, symbol, code, max_tokens)
+        _route_outcome(decision, "cheap", result, started)
+        if tests_py is not None:
+            return tests_py, "cheap"
+
+    started = time.monotonic()
+    try:
+        res = await _chat(messages, max_tokens=max_tokens)
+        with stage("parse"):
+            tests_py = _extract_between(_message_text(res), "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+        tests_py = await _validated(tests_py, symbol, code, max_tokens)
+    except GenerationError:
+        _route_outcome(decision, "default", "failed", started)
+        raise
+    _route_outcome(decision, "default", "accepted", started)
+    return tests_py, "default"
+
+async def _cheap_tests(messages, symbol: str, code: str, max_tokens: int):
+    """
+    (tests, "accepted") from the router's cheap model, or (None, "escalated_<why>") when its
+    breaker is open, the call fails in any way, the markers are missing,
+    validation needs more than the deterministic repairs, or (ROUTER_RUN_CHECK=1
+    with runs enabled) the tests fail against the code.
+    """
+    if not _breaker(_router.cheap_model).allow():
+        return None, "escalated_breaker"
+    try:
+        res = await _call_with_retries(_router.cheap_model, messages=messages, temperature=0, max_tokens=max_tokens)
+    except Exception:
+        # API errors other than 429 and transport errors are re-raised unchanged; any of them escalates
+        return None, "escalated_error"
+    try:
+        with stage("parse"):
+            tests_py = _extract_between(_message_text(res), "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+    except GenerationError:
+        return None, "escalated_extraction"
+    try:
+        tests_py = await _validated(tests_py, symbol, code, max_tokens, repair_attempts=0)
+    except GenerationError:
+        return None, "escalated_validation"
+    if ROUTER_RUN_CHECK and _run_enabled() and code.strip() and not await _passes_run_check(code, tests_py):
+        return None, "escalated_run"
+    return tests_py, "accepted"
+
+async def _passes_run_check(code: str, tests_py: str) -> bool:
+    """Quick pytest run of cheap-model tests; a busy runner counts as a pass rather than a stall."""
+    with _workspaces.create() as ws:
+        ws.write_code(code)
+        ws.write_test("test_route_check.py", tests_py)
+        try:
+            with stage("route_check"):
+                res = await _exec_pytest(str(ws.path), ["-q", "-p", "no:cacheprovider", "tests"], timeout=10)
+        except GenerationError:
+            return True
+    return res["exit_code"] == 0
+
+def _route_outcome(decision: dict, tier: str, result: str, started: float) -> None:
+    seconds = time.monotonic() - started
+    _router.record(tier, result, seconds)
+    ROUTE_OUTCOMES.inc(tier=tier, result=result)
+    ROUTE_SECONDS.observe(seconds, tier=tier, result=result)
+    if decision["complexity"] is not None:
+        ROUTE_COMPLEXITY.observe(decision["complexity"]["score"], tier=tier, result=result)
+
+def _message_text(res) -> str:
+    content = res.choices[0].message.content
+    if isinstance(content, list):
+        content = "".join((c.get("text","") if isinstance(c, dict) else str(c)) for c in content)
+    return str(content)
+
+def _repair_messages(symbol: str, tests_py: str, problems: List[str]) -> list:
+    import_name = _import_name(symbol)
+    sysmsg = RAW_SYSTEM.format(symbol=symbol, import_name=import_name)
+    usrmsg = REPAIR_USER.format(
+        symbol=symbol, import_name=import_name, tests=tests_py.strip(),
+        problems="\n".join(f"- {p}" for p in problems),
+    )
+    return [{"role": "system", "content": sysmsg},
+            {"role": "user", "content": usrmsg}]
+
+async def _validated(tests_py: str, symbol: str, code: str, max_tokens: int = 1200,
+                     repair_attempts: Optional[int] = None) -> str:
+    """
+    Statically validate generated tests before anything runs them. Deterministic
+    repairs are applied in place; what remains goes back to the model as a short
+    repair prompt (repair_attempts, default VALIDATE_REPAIR_ATTEMPTS, times, never
+    in stub mode) instead of a full regeneration. Raises GenerationError(502) if
+    problems remain.
+    """
+    with stage("validate"):
+        result = validate_tests(tests_py, symbol, code)
+    outcome = "repaired" if result.repairs else "ok"
+    attempts = 0
+    if repair_attempts is None:
+        repair_attempts = VALIDATE_REPAIR_ATTEMPTS
+    while not result.ok and attempts < repair_attempts and os.getenv("STUB_GEN") != "1":
+        attempts += 1
+        outcome = "reprompted"
+        res = await _chat(_repair_messages(symbol, result.text, result.problems), max_tokens=max_tokens)
+        with stage("parse"):
+            fixed = _extract_between(_message_text(res), "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+        with stage("validate"):
+            result = validate_tests(fixed, symbol, code)
+    if not result.ok:
+        VALIDATIONS.inc(result="failed")
+        raise GenerationError(502, "Generated tests failed validation: " + "; ".join(result.problems))
+    VALIDATIONS.inc(result=outcome)
+    return result.text
+
+def _stub_tests_text(symbol: str) -> str:
+    import_name = _import_name(symbol)
+    return (
+        f"from under_test import {import_name}\n"
+        "import pytest\n\n"
+        f"@pytest.mark.parametrize('a,b,expected', [(2, 3, 6)])\n"
+        f"def test_{symbol.replace('.', '_')}(a, b, expected):\n"
+        f"    assert {symbol}(a, b) == expected\n"
+    )
+
+def _size_preset(size: str) -> dict:
+    return SIZE_PRESETS.get(size, SIZE_PRESETS["std"])
+
+def _prompt_messages(symbol: str, spec: str, code: str = "", size: str = "std", style_hints=()) -> list:
+    """
+    RAW_* prompts with only the code relevant to symbol (see context.py),
+    capped at the size preset's context budget.
+    """
+    import_name = _import_name(symbol)
+    preset = _size_preset(size)
+    with stage("context"):
+        ctx = build_context(code, symbol, preset["context_tokens"])
+    hints = "\n".join(f"- {h.strip()}" for h in style_hints if h.strip()) or "- none"
+    sysmsg = RAW_SYSTEM.format(symbol=symbol, import_name=import_name)
+    usrmsg = RAW_USER.format(symbol=symbol, import_name=import_name, spec=spec.strip(),
+                             context=ctx.text or "(not provided)", size=size if size in SIZE_PRESETS else "std",
+                             guidance=preset["guidance"], hints=hints)
+    return [{"role": "system", "content": sysmsg},
+            {"role": "user", "content": usrmsg}]
+
+async def _stream_tests_text(symbol: str, spec: str, code: str = "", no_cache: bool = False,
+                             size: str = "std", style_hints=()) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of _gen_tests_text + _ensure_import_line: yields the
+    pytest body as it arrives and stops reading upstream at the end marker.
+    The full result is stored in the generation cache.
+    """
+    # streaming never routes, so its output is keyed as the default tier's
+    key = _gen_cache_key(symbol, spec, code, size, style_hints, tier="default")
+    if GEN_CACHE_ENABLED and not no_cache:
+        cached = _gen_cache.get(key)
+        if cached is not None:
+            yield _ensure_import_line(_cache_value(cached)[0], symbol)
+            return
+
+    served: List[str] = []
+    if os.getenv("STUB_GEN") == "1":
+        served.append("stub")
+        source = _stub_stream(symbol)
+    else:
+        source = _chat_stream(_prompt_messages(symbol, spec, code, size, style_hints),
+                              max_tokens=_size_preset(size)["max_tokens"], served=served)
+
+    scanner = _MarkerScanner("<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+    parts: List[str] = []
+    # Hold the head back until we know whether the import line is present.
+    head, head_flushed = "", False
+    try:
+        async for chunk in source:
+            out = scanner.feed(chunk)
+            if out:
+                parts.append(out)
+                if head_flushed:
+                    yield out
+                else:
+                    head += out
+                    if "from under_test import " in head or len(head) > 2000:
+                        head_flushed = True
+                        yield _ensure_import_line(head, symbol)
+            if scanner.done:
+                break
+    finally:
+        await source.aclose()
+    scanner.finish()
+    if not head_flushed and head:
+        yield _ensure_import_line(head, symbol)
+
+    # Already streamed, so it can't be repaired; just don't cache output that fails validation.
+    if GEN_CACHE_ENABLED and served and validate_tests("".join(parts), symbol, code).ok:
+        _gen_cache.set(key, _cache_entry("".join(parts), served[-1]))
+
+async def _stub_stream(symbol: str) -> AsyncIterator[str]:
+    """STUB_GEN=1 stand-in for _chat_stream: the stub file, line by line, between markers."""
+    yield "<<<PYTEST_START>>>\n"
+    for line in _stub_tests_text(symbol).splitlines(keepends=True):
+        yield line
+    yield "<<<PYTEST_END>>>\nignored trailing text"
+
+def _ensure_import_line(tests_py: str, symbol: str) -> str:
+    if "from under_test import " in tests_py:
+        return tests_py
+    return f"from under_test import {_import_name(symbol)}\n" + tests_py
+
+def _run_enabled() -> bool:
+    return os.getenv("ENABLE_RUN") == "1"
+
+async def _exec_pytest(td: str, args: List[str], timeout: float = 10, on_line=None,
+                       pythonpath: Optional[str] = None, limits: Optional[dict] = None) -> dict:
+    """
+    Run pytest inside td without blocking the event loop, on a warm pool worker
+    when available, once the admission controller has a slot. on_line(stream,
+    line) receives output lines as they are produced. Only the last
+    RUN_OUTPUT_MAX_BYTES of each stream are kept. Never raises on timeout or a
+    resource limit: the result says which (timed_out, limit, signal). Raises
+    GenerationError(503) if no slot frees up within RUN_ADMISSION_TIMEOUT.
+    pythonpath is put on sys.path after td (repository mode imports the real package).
+    limits replaces RUN_LIMITS.as_dict() for this run.
+    """
+    try:
+        with stage("admission"):
+            await _admission.acquire(RUN_ADMISSION_TIMEOUT or None)
+    except AdmissionTimeout:
+        PYTEST_RUNS.inc(outcome="rejected")
+        raise GenerationError(503, "All test runners are busy; try again later.")
+    limits = limits or RUN_LIMITS.as_dict()
+    try:
+        with stage("pytest"):
+            res = classify(await _exec_pytest_untimed(td, args, timeout, on_line, pythonpath, limits), limits)
+    finally:
+        _admission.release()
+    if res["limit"] is not None:
+        RUN_LIMITS_HIT.inc(limit=res["limit"])
+    if res["timed_out"]:
+        PYTEST_RUNS.inc(outcome="timeout")
+    else:
+        PYTEST_RUNS.inc(outcome="passed" if res["exit_code"] == 0 else "failed")
+    return res
+
+async def _exec_pytest_untimed(td: str, args: List[str], timeout: float, on_line,
+                               pythonpath: Optional[str] = None, limits: Optional[dict] = None) -> dict:
+    env = scrubbed_env(td, {"PYTHONPATH": os.pathsep.join(p for p in (td, pythonpath) if p)})
+    limits = limits or RUN_LIMITS.as_dict()
+    if _pytest_pool is not None:
+        try:
+            return await asyncio.to_thread(_pytest_pool.run, td, args, timeout, env, on_line, RUN_OUTPUT_MAX_BYTES,
+                                           limits)
+        except PoolTimeout as e:
+            return e.args[0]
+
+    started = time.monotonic()
+    proc = await asyncio.create_subprocess_exec(
+        "pytest", *args,
+        cwd=td,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+        preexec_fn=(lambda: apply_limits(limits)) if hasattr(os, "fork") else None,
+    )
+    tails = {"stdout": TailBuffer(RUN_OUTPUT_MAX_BYTES), "stderr": TailBuffer(RUN_OUTPUT_MAX_BYTES)}
+
+    async def pump(reader, name):
+        splitter = LineSplitter(RUN_OUTPUT_MAX_BYTES)
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            tails[name].write(data)
+            if on_line is not None:
+                for line in splitter.feed(data):
+                    on_line(name, line)
+        if on_line is not None:
+            for line in splitter.flush():
+                on_line(name, line)
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(proc.stdout, "stdout"), pump(proc.stderr, "stderr"), proc.wait()),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+        proc.kill()
+        await proc.wait()
+    return {
+        "exit_code": None if timed_out else proc.returncode,
+        "timed_out": timed_out,
+        "stdout": tails["stdout"].text(),
+        "stderr": tails["stderr"].text(),
+        "truncated": tails["stdout"].truncated or tails["stderr"].truncated,
+        "duration_s": round(time.monotonic() - started, 4),
+    }
+
+# "-v" lines ("nodeid PASSED") and "-rA" summary lines ("PASSED nodeid")
+_TEST_RESULT_RE = re.compile(r"^(?P<nodeid>\S+::\S+)\s+(?P<outcome>PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS)\b")
+_SUMMARY_RESULT_RE = re.compile(r"^(?P<outcome>PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS) (?P<nodeid>\S+::\S+)")
+
+def parse_outcomes(stdout: str) -> dict:
+    """Per-test outcomes ({nodeid: "passed"|"failed"|...}) from pytest -v or -rA output."""
+    outcomes = {}
+    for line in stdout.splitlines():
+        m = _TEST_RESULT_RE.match(line) or _SUMMARY_RESULT_RE.match(line)
+        if m:
+            outcomes[m.group("nodeid")] = m.group("outcome").lower()
+    return outcomes
+
+_versions: Optional[tuple] = None
+
+def _runtime_versions() -> tuple:
+    global _versions
+    if _versions is None:
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            pytest_version = version("pytest")
+        except PackageNotFoundError:
+            pytest_version = "?"
+        _versions = (sys.version, pytest_version)
+    return _versions
+
+def _run_cache_key(td: str, args: List[str]) -> str:
+    """Hash of every file in the workspace (paths + bytes), the args and the interpreter/pytest versions."""
+    root = Path(td)
+    parts = []
+    for path in sorted(p for p in root.rglob("*") if p.is_file() and "__pycache__" not in p.parts):
+        parts += [path.relative_to(root).as_posix(), hashlib.sha256(path.read_bytes()).hexdigest()]
+    return make_key("pytest-run", *_runtime_versions(), *sorted(RUN_LIMITS.as_dict().items()), *args, *parts)
+
+async def run_pytest_cached(td: str, args: List[str], timeout: float = 10, force: bool = False) -> dict:
+    """
+    _exec_pytest with the test-result cache in front: an identical workspace
+    returns the stored exit code, output and outcomes (cached=True) without
+    spawning pytest. force=True always runs (and refreshes the entry). Timed
+    out runs and runs stopped by a resource limit are never stored.
+    """
+    key = None
+    if RUN_CACHE_ENABLED:
+        key = _run_cache_key(td, args)
+        if not force:
+            with stage("run_cache"):
+                hit = _run_cache.get(key)
+            RUN_CACHE_LOOKUPS.inc(result="miss" if hit is None else "hit")
+            if hit is not None:
+                return {**json.loads(hit), "cached": True}
+    res = await _exec_pytest(td, args, timeout=timeout)
+    res = {**res, "outcomes": parse_outcomes(res["stdout"]), "cached": False}
+    if key is not None and not res["timed_out"] and res["limit"] is None:
+        _run_cache.set(key, json.dumps({k: v for k, v in res.items() if k != "cached"}))
+    return res
+
+def _bundle_artifact(code_path: str, artifact_id: Optional[int]) -> Optional[dict]:
+    """The requested artifact, else the newest one for code_path; None if code_path has none indexed."""
+    if artifact_id is not None:
+        artifact = _artifacts.get(artifact_id)
+        if artifact is None:
+            raise GenerationError(404, f"Unknown artifact {artifact_id}.")
+        return artifact
+    return _artifacts.latest(module_path=code_path)
+
+async def run_latest_bundle(code_path: str = "under_test.py", tests_path: str = None, force: bool = False,
+                            mutation: bool = False, artifact_id: Optional[int] = None) -> dict:
+    """
+    Run the newest indexed test artifact for code_path (or artifact_id, or the
+    file tests_path) against code_path in a fresh workspace; returns the
+    run_pytest_cached result plus the `artifact` id, and a `mutation` score
+    (score_mutants) when mutation=True. The run result is recorded on the artifact.
+    """
+    artifact = None
+    if not tests_path:
+        artifact = _bundle_artifact(code_path, artifact_id)
+    if not tests_path and artifact is None:
+        # test files written by hand (or before the index existed); files other modules published are not candidates
+        gen_dir = Path("tests/generated")
+        indexed = set(_artifacts.published_files())
+        candidates = sorted((p for p in gen_dir.glob("test_*.py") if p.name not in indexed),
+                            key=lambda p: p.stat().st_mtime, reverse=True)
+        if not candidates:
+            raise GenerationError(404, "No generated test files found.")
+        tests_path = str(candidates[0])
+
+    with _workspaces.create() as ws:
+        code = Path(code_path).read_text(encoding="utf-8")
+        ws.write_code(code)
+        if artifact is not None:
+            try:
+                ws.write_test(artifact["file_name"], _artifacts.read(artifact))
+            except FileNotFoundError:
+                raise GenerationError(404, f"Artifact {artifact['id']} has no stored content.")
+        else:
+            ws.add_test_file(tests_path)
+        res = await run_pytest_cached(str(ws.path), ["-q", "-rA", "tests"], force=force)
+        if mutation and not res["timed_out"]:
+            res = {**res, "mutation": await score_mutants(code, ws.tests_dir)}
+    if artifact is not None:
+        record_artifact_runs([artifact["id"]], res)
+        res = {**res, "artifact": artifact["id"]}
+    return res
+
+def run_bundle_tests(code_path: str = "under_test.py", tests_path: str = None, force: bool = False,
+                     mutation: bool = False, artifact_id: Optional[int] = None):
+    """
+    Run pytest safely in a fresh workspace, returning (exit_code, output).
+    Reuses the same logic as /bundle/generate-run endpoint; unchanged code and
+    tests are answered from the test-result cache unless force=True. With
+    mutation=True the mutation score is appended to the output.
+    """
+    try:
+        res = asyncio.run(run_latest_bundle(code_path, tests_path, force=force, mutation=mutation,
+                                            artifact_id=artifact_id))
+    except GenerationError as e:
+        raise RuntimeError(e.detail)
+    if res["timed_out"]:
+        raise RuntimeError("pytest timed out")
+    output = res["stdout"] + res["stderr"]
+    if res["limit"] is not None:
+        output += f"\n[stopped by the {res['limit']} limit]\n"
+    if "mutation" in res:
+        output += "\n" + format_summary(res["mutation"]) + "\n"
+    return res["exit_code"], output
+
+async def score_mutants(code: str, tests_dir: Path, symbols: Optional[List[str]] = None) -> dict:
+    """
+    Mutation score of the test files in tests_dir against code. Mutants of
+    `symbols` (default: whatever the tests import from under_test) are compiled
+    into one schemata module. MUTATION_WORKERS warm pytest processes then each
+    take a share, see mutation_plugin.py. Tests that fail on the original code
+    are left out; mutants no passing test reaches count as survivors.
+    """
+    tests = sorted(tests_dir.glob("test_*.py"))
+    if symbols is None:
+        symbols = sorted({name for p in tests for name in imported_targets(p.read_text(encoding="utf-8"))})
+    with stage("mutate"):
+        try:
+            source, mutants = build_schemata(code, symbols)
+        except SyntaxError as e:
+            raise GenerationError(400, f"Cannot mutate code that does not parse: {e}")
+    selected = sample(mutants, MUTATION_MAX_MUTANTS)
+    shards = [selected[i::max(1, MUTATION_WORKERS)] for i in range(max(1, MUTATION_WORKERS))]
+    shards = [shard for shard in shards if shard]
+    # the shards' own wall-clock budget replaces the usual per-run CPU limit
+    limits = RUN_LIMITS.as_dict()
+    if limits["cpu_seconds"]:
+        limits["cpu_seconds"] = max(limits["cpu_seconds"], int(MUTATION_TIMEOUT) + 1)
+
+    with _workspaces.create() as ws:
+        ws.write_code(source)
+        for path in tests:
+            ws.add_test_file(str(path))
+
+        async def run_shard(i: int, shard) -> tuple:
+            report = ws.path / f"mutation-{i}.jsonl"
+            args = ["-q", "-p", "no:cacheprovider", "-p", "mutation_plugin",
+                    f"--mutants={','.join(str(m.id) for m in shard)}", f"--mutation-report={report.name}", "tests"]
+            res = await _exec_pytest(str(ws.path), args, timeout=MUTATION_TIMEOUT,
+                                     pythonpath=str(Path(__file__).resolve().parent), limits=limits)
+            text = report.read_text(encoding="utf-8") if report.exists() else None
+            return [m.id for m in shard], text, res
+
+        started = time.monotonic()
+        with stage("mutation"):
+            results = await asyncio.gather(*(run_shard(i, shard) for i, shard in enumerate(shards)))
+    summary = summarize(selected, list(results))
+    for status in ("killed", "timeout", "survived", "no_coverage", "not_run"):
+        if summary[status]:
+            MUTANTS.inc(summary[status], status=status)
+    return {**summary, "generated": len(mutants), "symbols": symbols, "workers": len(shards),
+            "duration_s": round(time.monotonic() - started, 4)}
+
+# -----------------------------------------------------------------------------
+# Prompting
+# -----------------------------------------------------------------------------
+RAW_SYSTEM = """
+Return ONLY the pytest file content as plain text, between the markers:
+<<<PYTEST_START>>>
+... (pytest module text)
+<<<PYTEST_END>>>
+
+Rules:
+- No JSON, no code fences, no commentary outside the markers.
+- Use only pytest + Python stdlib.
+- Use pytest.mark.parametrize where sensible.
+- For floats: use pytest.approx.
+- Import target as: from under_test import {import_name}
+- Tests must be self-contained and runnable as tests/test_generated.py.
+"""
+
+RAW_USER = """Write a pytest module that tests the callable {symbol} imported as:
+
+from under_test import {import_name}
+
+Relevant source (the target and the helpers it uses):
+{context}
+
+Human spec:
+{spec}
+
+Size: {size}, so cover {guidance}.
+Style hints:
+{hints}
+
+Constraints:
+- Do not modify the target code.
+- Put ONLY the pytest file content between the markers.
+<<<PYTEST_START>>>
+<<<PYTEST_END>>>"""
+
+REPAIR_USER = """This pytest module for {symbol} has problems:
+{problems}
+
+Fix only these problems; keep every other test as it is.
+Import the target as: from under_test import {import_name}
+Return the whole corrected module between the markers.
+<<<PYTEST_START>>>
+{tests}
+<<<PYTEST_END>>>"""
+
+
+# -----------------------------------------------------------------------------
+# Bundles
+# -----------------------------------------------------------------------------
+def _generated_dir() -> Path:
+    return Path("tests") / "generated"
+
+async def _generate_into_workspace(req):
+    """
+    Generate tests for req (a main.BundleRequest) into a fresh workspace.
+    Returns (workspace, symbols, test file names, unchanged symbols). With
+    req.incremental, symbols whose definition and spec match the manifest
+    reuse their published test file instead of calling the model.
+    """
+    if req.all_symbols and not req.symbol:
+        symbols = detect_symbols(req.code)
+    else:
+        symbols = [s for s in [req.symbol or detect_symbol_name(req.code)] if s]
+    if not symbols:
+        raise GenerationError(400, "Could not detect a top-level function/class name. Provide 'symbol'.")
+
+    # Multi-symbol mode always writes one file per symbol.
+    if req.tests_mode == "per_symbol" or len(symbols) > 1:
+        names = [_tests_file_name(sym) for sym in symbols]
+    else:
+        names = ["test_generated.py"]
+
+    reused = {}
+    if req.incremental:
+        manifest = Manifest(_generated_dir())
+        hashes = symbol_hashes(req.code)
+        for sym, name in zip(symbols, names):
+            if manifest.unchanged(req.module_path, sym, hashes.get(sym), req.spec) == name:
+                reused[sym] = (_generated_dir() / name).read_text(encoding="utf-8")
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def gen_one(sym: str) -> Tuple[str, Optional[str]]:
+        if sym in reused:
+            return reused[sym], None
+        async with sem:
+            tests_py, model = await _gen_tests(sym, req.spec, req.code, no_cache=req.no_cache,
+                                               size=req.size, style_hints=tuple(req.style_hints))
+        return _ensure_import_line(tests_py, sym), model
+
+    generated = await asyncio.gather(*(gen_one(sym) for sym in symbols))
+
+    with stage("workspace"):
+        ws = _workspaces.create()
+        ws.write_code(req.code)
+        for name, (tests_py, model) in zip(names, generated):
+            ws.write_test(name, tests_py)
+            if model is not None:
+                ws.models[name] = model
+    return ws, symbols, names, [sym for sym in symbols if sym in reused]
+
+def _publish_files(req, ws: Workspace, symbols: List[str], names: List[str],
+                   unchanged: List[str]):
+    """
+    Atomically write the module and changed test files and index each test in
+    the artifact store; returns (code_path, tests_paths, artifact ids), one id
+    per symbol (the existing artifact for unchanged ones). cleanup_old removes
+    files this module published before for symbols it no longer has.
+    """
+    code_path = Path(req.module_path)
+    atomic_write(code_path, req.code)
+
+    tests_root = Path("tests")
+    gen_dir = _generated_dir()
+    gen_dir.mkdir(parents=True, exist_ok=True)
+    tests_paths = [gen_dir / name for name in names]
+
+    if (req.tests_mode == "per_symbol" or len(names) > 1) and req.cleanup_old:
+        for name in _artifacts.published_files(req.module_path):
+            if name not in names:
+                try:
+                    (gen_dir / name).unlink()
+                except FileNotFoundError:
+                    pass
+
+    conftest = tests_root / "conftest.py"
+    if not conftest.exists():
+        conftest.write_text(
+            "import sys, pathlib\n"
+            "ROOT = pathlib.Path(__file__).resolve().parents[1]\n"
+            "if str(ROOT) not in sys.path:\n"
+            "    sys.path.insert(0, str(ROOT))\n",
+            encoding="utf-8",
+        )
+
+    code_hash = normalized_code_hash(req.code)
+    artifact_ids = []
+    for sym, tests_path, name in zip(symbols, tests_paths, names):
+        previous = _artifacts.latest(req.module_path, sym) if sym in unchanged else None
+        if previous is not None:
+            artifact_ids.append(previous["id"])
+            continue
+        tests_py = (ws.tests_dir / name).read_text(encoding="utf-8")
+        if sym not in unchanged:
+            atomic_write(tests_path, tests_py)
+        artifact = _artifacts.put(tests_py, module_path=req.module_path, symbol=sym, file_name=name,
+                                  code_hash=code_hash, spec=req.spec, model=ws.models.get(name, "unknown"))
+        artifact_ids.append(artifact["id"])
+
+    if req.incremental:
+        manifest = Manifest(gen_dir)
+        hashes = symbol_hashes(req.code)
+        for sym, name in zip(symbols, names):
+            manifest.record(req.module_path, sym, hashes.get(sym), req.spec, name)
+        manifest.save()
+
+    return code_path, tests_paths, artifact_ids
+
+def record_artifact_runs(artifact_ids: List[int], res: dict) -> None:
+    """Store a run's exit code, and each artifact's own test outcomes, in the artifact index."""
+    for artifact_id in artifact_ids:
+        artifact = _artifacts.get(artifact_id)
+        if artifact is None:
+            continue
+        prefix = f"tests/{artifact['file_name']}::"
+        outcomes = {nodeid: o for nodeid, o in res.get("outcomes", {}).items() if nodeid.startswith(prefix)}
+        _artifacts.record_run(artifact_id, res["exit_code"], outcomes)
@@ -0,0 +1,117 @@
+"""
+Client for a resident server listening on a Unix socket.
+
+Start the server once from the project root:
+
+    uvicorn main:app --uds /tmp/spec2test.sock
+
+and point the CLI at it with `--socket /tmp/spec2test.sock` or
+SPEC2TEST_SOCKET. Calls then reuse the server's SDK client, caches and warm
+pytest pool instead of importing and building everything per invocation.
+Only the standard library is used here, so the client side starts instantly.
+
+The server resolves relative paths (module_path, tests/generated) against its
+own working directory, so connect() only returns a client when that matches
+ours; otherwise the CLI falls back to running in-process. /health only
+publishes a hash of that directory (directory_hash), never the path itself.
+"""
+import hashlib
+import http.client
+import json
+import os
+import socket
+import sys
+from typing import Iterator, Optional
+
+SOCKET_ENV = "SPEC2TEST_SOCKET"
+
+
+def directory_hash(path: str) -> str:
+    """sha256 of the resolved path: enough to tell two directories apart without revealing either."""
+    return hashlib.sha256(os.path.realpath(path).encode("utf-8")).hexdigest()
+
+
+class DaemonError(Exception):
+    """The server answered with an error status."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._path)
+        self.sock = sock
+
+
+class DaemonClient:
+    def __init__(self, path: str, timeout: float = 600):
+        self.path = path
+        self.timeout = timeout
+
+    def _send(self, method: str, url: str, payload: Optional[dict]):
+        conn = _UnixHTTPConnection(self.path, self.timeout)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, url, body=body, headers=headers)
+        resp = conn.getresponse()
+        if resp.status >= 400:
+            raw = resp.read().decode("utf-8", "replace")
+            conn.close()
+            try:
+                detail = json.loads(raw).get("detail", raw)
+            except (ValueError, AttributeError):
+                detail = raw
+            raise DaemonError(resp.status, str(detail))
+        return conn, resp
+
+    def request(self, method: str, url: str, payload: Optional[dict] = None) -> dict:
+        conn, resp = self._send(method, url, payload)
+        try:
+            return json.loads(resp.read().decode("utf-8"))
+        finally:
+            conn.close()
+
+    def stream(self, url: str, payload: dict) -> Iterator[str]:
+        """Yield the response body as it arrives (chunked text endpoints)."""
+        conn, resp = self._send("POST", url, payload)
+        try:
+            while True:
+                chunk = resp.read1(8192) if hasattr(resp, "read1") else resp.read(8192)
+                if not chunk:
+                    break
+                yield chunk.decode("utf-8", "replace")
+        finally:
+            conn.close()
+
+
+def socket_path(explicit: Optional[str] = None) -> Optional[str]:
+    return explicit or os.getenv(SOCKET_ENV) or None
+
+
+def connect(path: Optional[str]) -> Optional[DaemonClient]:
+    """
+    A client for the server at `path`, or None (with a note on stderr) when no
+    socket is configured, nothing is listening, or the server runs elsewhere.
+    """
+    if not path:
+        return None
+    client = DaemonClient(path)
+    try:
+        health = client.request("GET", "/health")
+    except (OSError, DaemonError) as e:
+        print(f"⚠️  daemon at {path} unavailable ({e}); running in-process", file=sys.stderr)
+        return None
+    cwd_hash = health.get("cwd_hash")
+    if cwd_hash and cwd_hash != directory_hash(os.getcwd()):
+        print(f"⚠️  daemon at {path} serves another directory, not this one; running in-process", file=sys.stderr)
+        return None
+    return client
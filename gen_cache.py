@@ -0,0 +1,137 @@
+"""
+Two-tier cache: an in-process LRU in front of a persistent SQLite store.
+
+Values are plain strings; callers that need structured data store JSON.
+"""
+import ast
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def normalized_code_hash(code: str) -> str:
+    """Hash the AST of the code so whitespace/comment-only edits hash the same."""
+    try:
+        norm = ast.dump(ast.parse(code), annotate_fields=False, include_attributes=False)
+    except SyntaxError:
+        norm = code.strip()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def make_key(*parts) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class TwoTierCache:
+    """
+    Memory LRU (max_entries) backed by an optional SQLite table (disk_max_entries).
+    Entries older than ttl seconds are treated as misses and evicted.
+    path=None keeps the cache memory-only.
+    """
+
+    def __init__(self, path: Optional[str], table: str = "entries", max_entries: int = 256,
+                 disk_max_entries: int = 5000, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.ttl = ttl
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    # -- disk tier -------------------------------------------------------------
+    def _db(self) -> Optional[sqlite3.Connection]:
+        # connect lazily so the path is resolved against the cwd at first use
+        if self.path is None:
+            return None
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed)")
+            self._conn.commit()
+        return self._conn
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    # -- public API ------------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                value, created = item
+                if not self._expired(created, now):
+                    self._mem.move_to_end(key)
+                    self.hits_memory += 1
+                    return value
+                del self._mem[key]
+
+            db = self._db()
+            if db is not None:
+                row = db.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        db.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+                        db.commit()
+                        self._remember(key, value, created)
+                        self.hits_disk += 1
+                        return value
+                    db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            db = self._db()
+            if db is None:
+                return
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            (count,) = db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            if count > self.disk_max_entries:
+                db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                    (count - self.disk_max_entries,),
+                )
+            if self.ttl > 0:
+                db.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+            db.commit()
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        self._mem[key] = (value, created)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "entries_memory": len(self._mem),
+        }
@@ -0,0 +1,148 @@
+"""
+Incremental regeneration support.
+
+A manifest next to tests/generated/ records, per (module, symbol), the AST
+hash of the symbol's definition, the spec hash and the test file written for
+it. A symbol only needs a new model call when one of those changed or its test
+file is gone. watch_changes() adds debounced polling for `cli.py watch`.
+"""
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; writers are then only serialized within this process
+    fcntl = None
+
+from workspace import atomic_write
+
+MANIFEST_NAME = ".manifest.json"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def symbol_hashes(code: str) -> Dict[str, str]:
+    """
+    AST hash of every top-level def/class and of each method ("Class.method").
+    Whitespace/comment edits don't change a hash; a class hash covers its methods.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return {}
+    hashes = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            hashes[node.name] = _digest(ast.dump(node, include_attributes=False))
+            if isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        hashes[f"{node.name}.{item.name}"] = _digest(ast.dump(item, include_attributes=False))
+    return hashes
+
+
+def spec_hash(spec: str) -> str:
+    return _digest(spec.strip())
+
+
+_save_lock = threading.Lock()
+
+
+class Manifest:
+    """
+    Loaded once for lookups; save() merges this instance's records into the
+    file as it is on disk at that moment, under a lock (an flock on a sidecar
+    file, so other processes are covered too), so concurrent publishers never
+    drop each other's entries.
+    """
+
+    def __init__(self, gen_dir: Path):
+        self.path = Path(gen_dir) / MANIFEST_NAME
+        self.data = self._load()
+        self._changes: Dict[str, dict] = {}
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"version": 1, "symbols": {}}
+
+    @staticmethod
+    def _key(module_path: str, symbol: str) -> str:
+        return f"{module_path}::{symbol}"
+
+    def unchanged(self, module_path: str, symbol: str, code_hash: Optional[str], spec: str) -> Optional[str]:
+        """Return the recorded test file name if nothing changed for this symbol, else None."""
+        entry = self.data["symbols"].get(self._key(module_path, symbol))
+        if not entry or code_hash is None:
+            return None
+        if entry["hash"] != code_hash or entry["spec"] != spec_hash(spec):
+            return None
+        if not (self.path.parent / entry["file"]).exists():
+            return None
+        return entry["file"]
+
+    def record(self, module_path: str, symbol: str, code_hash: Optional[str], spec: str, file: str) -> None:
+        entry = {"hash": code_hash, "spec": spec_hash(spec), "file": file, "updated": time.time()}
+        self.data["symbols"][self._key(module_path, symbol)] = entry
+        self._changes[self._key(module_path, symbol)] = entry
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _save_lock, open(self.path.with_name(MANIFEST_NAME + ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield  # closing the file releases the flock
+
+    def save(self) -> None:
+        with self._locked():
+            self.data = self._load()
+            self.data["symbols"].update(self._changes)
+            atomic_write(self.path, json.dumps(self.data, indent=2, sort_keys=True))
+        self._changes = {}
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+async def watch_changes(path: str, debounce: float = 0.5, interval: float = 0.25,
+                        stop=None) -> AsyncIterator[None]:
+    """
+    Poll `path` and yield once per burst of changes: after a change is seen,
+    wait until the file has been quiet for `debounce` seconds. `stop()`
+    returning True ends the loop. Async, so the caller's event loop (and the
+    SDK client bound to it) lives for the whole watch session.
+    """
+    target = Path(path)
+    last = _signature(target)
+    while stop is None or not stop():
+        await asyncio.sleep(interval)
+        sig = _signature(target)
+        if sig == last:
+            continue
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < debounce:
+            await asyncio.sleep(min(interval, debounce))
+            newer = _signature(target)
+            if newer != sig:
+                sig = newer
+                quiet_since = time.monotonic()
+        last = sig
+        if sig is not None:
+            yield
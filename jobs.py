@@ -0,0 +1,303 @@
+"""
+Persistent job queue and worker pool for long generate/run requests.
+
+POST /jobs stores the request in a SQLite table and returns at once; a fixed
+number of asyncio workers claim jobs in priority order (lower number first,
+then submission order) and store the result or error next to them. Several
+server processes can share one queue file: a claim is a conditional UPDATE,
+and a running job carries its claimer's id and a lease that the claimer
+renews while it works. Only jobs whose lease ran out (their process stopped
+or crashed) go back to the queue, so a restarting sibling never re-runs work
+that is still in progress elsewhere.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+PRIORITIES = {"interactive": 0, "normal": 5, "batch": 9}
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobQueue:
+    """
+    Jobs in one SQLite table. Safe to share between threads and processes;
+    path=None keeps the queue in memory (nothing survives a restart). Finished
+    jobs are deleted after ttl seconds. Jobs claimed through this instance are
+    leased to `owner` for `lease` seconds at a time.
+    """
+
+    def __init__(self, path: Optional[str], ttl: float = 24 * 3600, lease: float = 60):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # connect lazily so the path is resolved against the cwd at first use
+        if self._conn is None:
+            if self.path is not None:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False, timeout=5)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, kind TEXT NOT NULL, "
+                "priority INTEGER NOT NULL, status TEXT NOT NULL, request TEXT NOT NULL, "
+                "result TEXT, error TEXT, status_code INTEGER, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created REAL NOT NULL, started REAL, finished REAL, owner TEXT, lease_until REAL)"
+            )
+            # queue files from before leases existed
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, priority, seq)")
+            self._conn.commit()
+        return self._conn
+
+    def _row(self, row) -> dict:
+        (seq, job_id, kind, priority, status, request, result, error, status_code, attempts,
+         created, started, finished, owner, lease_until) = row
+        return {
+            "id": job_id, "kind": kind, "priority": priority, "status": status,
+            "request": json.loads(request), "result": json.loads(result) if result else None,
+            "error": error, "status_code": status_code, "attempts": attempts,
+            "created": created, "started": started, "finished": finished, "seq": seq,
+            "owner": owner, "lease_until": lease_until,
+        }
+
+    # -- producer side ---------------------------------------------------------
+    def submit(self, kind: str, request: dict, priority: int = PRIORITIES["normal"]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO jobs (id, kind, priority, status, request, created) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, priority, json.dumps(request), now),
+            )
+            if self.ttl > 0:
+                db.execute(
+                    f"DELETE FROM jobs WHERE status IN {FINISHED} AND finished < ?", (now - self.ttl,)
+                )
+            db.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._row(row)
+            if job["status"] == "queued":
+                (ahead,) = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority < ? OR (priority = ? AND seq < ?))",
+                    (job["priority"], job["priority"], job["seq"]),
+                ).fetchone()
+                job["position"] = ahead
+        return job
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Mark a queued/running job cancelled. Returns its status before the call (None if unknown)."""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] not in FINISHED:
+                db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?", (time.time(), job_id))
+                db.commit()
+            return row[0]
+
+    # -- worker side -----------------------------------------------------------
+    def claim(self) -> Optional[dict]:
+        """
+        Atomically move the most urgent queued job to running, leased to this
+        queue's owner, and return it. The UPDATE only succeeds while the job is
+        still queued, so another process claiming it first just means trying the next one.
+        """
+        with self._lock:
+            db = self._db()
+            while True:
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority ASC, seq ASC LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                cur = db.execute(
+                    "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1, owner = ?, "
+                    "lease_until = ? WHERE id = ? AND status = 'queued'",
+                    (now, self.owner, now + self.lease, row[0]),
+                )
+                db.commit()
+                if cur.rowcount == 1:
+                    return self._row(db.execute("SELECT * FROM jobs WHERE id = ?", (row[0],)).fetchone())
+
+    def renew(self, job_ids) -> None:
+        """Extend the leases of running jobs this queue's owner still holds."""
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                [(time.time() + self.lease, job_id, self.owner) for job_id in job_ids],
+            )
+            db.commit()
+
+    def _finish(self, job_id: str, status: str, result=None, error: Optional[str] = None,
+                status_code: Optional[int] = None) -> None:
+        with self._lock:
+            db = self._db()
+            # a job cancelled while it ran stays cancelled; one whose lease lapsed and was
+            # claimed again belongs to its new owner
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished = ? "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, status_code,
+                 time.time(), job_id, self.owner),
+            )
+            db.commit()
+
+    def succeed(self, job_id: str, result: dict) -> None:
+        self._finish(job_id, "succeeded", result=result, status_code=200)
+
+    def fail(self, job_id: str, status_code: int, error: str) -> None:
+        self._finish(job_id, "failed", error=error, status_code=status_code)
+
+    def requeue(self, job_id: Optional[str] = None) -> int:
+        """
+        Put one running job this owner holds back in the queue, or (job_id=None)
+        every running job whose lease has expired; returns how many moved.
+        """
+        with self._lock:
+            db = self._db()
+            if job_id is None:
+                cur = db.execute("UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, lease_until = NULL "
+                                 "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+                                 (time.time(),))
+            else:
+                cur = db.execute("UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, lease_until = NULL "
+                                 "WHERE id = ? AND status = 'running' AND owner = ?", (job_id, self.owner))
+            db.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ("queued", "running") + FINISHED}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobWorkers:
+    """
+    `concurrency` asyncio tasks draining a JobQueue through `runner(job) -> result`.
+    runner errors with a `status_code` (HTTPException, GenerationError) fail the
+    job with that code, anything else with 500. While running, the workers
+    renew their jobs' leases and requeue jobs whose lease expired elsewhere.
+    stop() puts running jobs back in the queue. Queue calls run in a thread
+    (sqlite can wait up to 5 s on a lock held by another process), never on
+    the event loop.
+    """
+
+    def __init__(self, queue: JobQueue, runner: Callable[[dict], Awaitable[dict]], concurrency: int = 2,
+                 poll_interval: float = 1.0):
+        self.queue = queue
+        self.runner = runner
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    def notify(self) -> None:
+        """A job was submitted; wake an idle worker instead of waiting for the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        previous = await asyncio.to_thread(self.queue.cancel, job_id)
+        task = self._running.get(job_id)
+        if previous == "running" and task is not None:
+            task.cancel()
+        return previous
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._heartbeat_task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            # running jobs whose lease lapsed were interrupted by a crash or restart
+            if await asyncio.to_thread(self.queue.requeue):
+                self.notify()
+            await asyncio.sleep(self.queue.lease / 3)
+            await asyncio.to_thread(self.queue.renew, list(self._running))
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            claim = asyncio.ensure_future(asyncio.to_thread(self.queue.claim))
+            try:
+                job = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # the claim still lands in its thread: hand the job straight back
+                job = await claim
+                if job is not None:
+                    await asyncio.to_thread(self.queue.requeue, job["id"])
+                raise
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self.runner(job))
+            self._running[job["id"]] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if self._stopping:
+                    await asyncio.to_thread(self.queue.requeue, job["id"])
+                    raise
+                continue  # cancelled through cancel(); the queue already says so
+            except Exception as e:
+                code = getattr(e, "status_code", None) or 500
+                detail = getattr(e, "detail", None) or f"{type(e).__name__}: {e}"
+                await asyncio.to_thread(self.queue.fail, job["id"], code, str(detail))
+            else:
+                await asyncio.to_thread(self.queue.succeed, job["id"], result)
+            finally:
+                self._running.pop(job["id"], None)
+
+    async def stats(self) -> dict:
+        return {"workers": len(self._tasks), "running": len(self._running),
+                **await asyncio.to_thread(self.queue.stats)}
@@ -1,240 +1,58 @@
-import os, json, re, time, random, ast, subprocess, tempfile, shutil
-from pathlib import Path
-from typing import List, Optional
-
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-from mistralai import Mistral
-
-MistralAPIException = Exception
-
-# -----------------------------------------------------------------------------
-# Setup
-# -----------------------------------------------------------------------------
-load_dotenv()
-API_KEY = os.getenv("MISTRAL_API_KEY")
-MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
-FALLBACK_MODEL = os.getenv("MISTRAL_FALLBACK_MODEL", "mistral-medium-latest")
-STUB_MODE = os.getenv("STUB_GEN") == "1"
-
-if not STUB_MODE and not API_KEY:
-    raise RuntimeError("Set MISTRAL_API_KEY in .env or env vars (not required when STUB_GEN=1).")
-
-client = Mistral(api_key=API_KEY) if API_KEY else None
-app = FastAPI(title="Spec→Test Generator", version="0.2.0")
-
-# -----------------------------------------------------------------------------
-# Helpers
-# -----------------------------------------------------------------------------
-def detect_symbol_name(code: str) -> Optional[str]:
-    """Return the first top-level function or class name in the code."""
-    try:
-        tree = ast.parse(code)
-        for node in tree.body:
-            if isinstance(node, ast.FunctionDef):
-                return node.name
-            if isinstance(node, ast.ClassDef):
-                return node.name
-    except Exception:
-        pass
-    return None
-
-def _parse_json_from_model(raw_content) -> dict:
-    # normalize to string
-    if isinstance(raw_content, list):
-        parts = []
-        for c in raw_content:
-            if isinstance(c, dict) and "text" in c:
-                parts.append(c["text"])
-        text = "".join(parts)
-    else:
-        text = str(raw_content)
-
-    text = text.strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```(?:json)?\s*", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\s*```$", "", text)
-    text = _clean_to_first_json(text)
-
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        m = re.search(r"\{.*\}", text, flags=re.DOTALL)
-        if not m:
-            raise HTTPException(status_code=502, detail=f"Model did not return valid JSON. Raw: {text[:800]}")
-        try:
-            return json.loads(m.group(0))
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=502, detail=f"JSON parse failed: {e}. Raw: {text[:800]}")
-
-def _call_with_retries(model, **kwargs):
-    delay = 2.0
-    for _ in range(6):  
-        try:
-            return client.chat.complete(model=model, **kwargs)
-        except MistralAPIException as e:
-            msg = str(e).lower()
-            if "429" in msg or "capacity" in msg or "rate limit" in msg:
-                time.sleep(delay + random.uniform(0, 1.5))
-                delay = min(delay * 2, 30)
-                continue
-            raise
-    raise HTTPException(status_code=502, detail="Upstream capacity/rate limit after retries.")
-
-def _chat(messages):
-    try:
-        return _call_with_retries(MODEL, messages=messages, temperature=0, max_tokens=1200)
-    except HTTPException:
-        return _call_with_retries(FALLBACK_MODEL, messages=messages, temperature=0, max_tokens=1200)
-    
-def _clean_to_first_json(text: str) -> str:
-    text = text.lstrip("\ufeff")
-    m = re.search(r"\{", text)
-    return text[m.start():] if m else text
-
-def _extract_between(text: str, start: str, end: str) -> str:
-    s = text.find(start)
-    if s == -1:
-        raise HTTPException(status_code=502, detail="Start marker not found in model output.")
-    s += len(start)
-    e = text.find(end, s)
-    if e == -1:
-        raise HTTPException(status_code=502, detail="End marker not found in model output.")
-    return text[s:e].strip()
-
-def _gen_tests_text(symbol: str, spec: str) -> str:
-    """
-    When STUB_GEN=1, return a tiny deterministic pytest file.
-    Otherwise, call the real model through _chat(...) with RAW_* prompts.
-    """
-    if os.getenv("STUB_GEN") == "1":
-        return (
-            f"from under_test import {symbol}\n"
-            "import pytest\n\n"
-            f"@pytest.mark.parametrize('a,b,expected', [(2, 3, 6)])\n"
-            f"def test_{symbol}(a, b, expected):\n"
-            f"    assert {symbol}(a, b) == expected\n"
-        )
-
-    sysmsg = RAW_SYSTEM.format(symbol=symbol)
-    usrmsg = RAW_USER.format(symbol=symbol, spec=spec.strip())
-    res = _chat([{"role": "system", "content": sysmsg},
-                 {"role": "user", "content": usrmsg}])
-    content = res.choices[0].message.content
-    if isinstance(content, list):
-        content = "".join((c.get("text","") if isinstance(c, dict) else str(c)) for c in content)
-    text = str(content)
-    return _extract_between(text, "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
-
-def _ensure_import_line(tests_py: str, symbol: str) -> str:
-    if "from under_test import " in tests_py:
-        return tests_py
-    return f"from under_test import {symbol}\n" + tests_py
-
-def _run_enabled() -> bool:
-    return os.getenv("ENABLE_RUN") == "1"
-
-def run_bundle_tests(code_path: str = "under_test.py", tests_path: str = None):
-    """
-    Run pytest safely in a temporary directory, returning (exit_code, output).
-    Reuses the same logic as /bundle/generate-run endpoint.
-    """
-    import subprocess, tempfile, shutil, os
-    from pathlib import Path
-
-    if not tests_path:
-        gen_dir = Path("tests/generated")
-        candidates = sorted(gen_dir.glob("test_*.py"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if not candidates:
-            raise RuntimeError("No generated test files found.")
-        tests_path = str(candidates[0])
-
-    with tempfile.TemporaryDirectory() as td:
-        shutil.copy(code_path, os.path.join(td, "under_test.py"))
-        os.makedirs(os.path.join(td, "tests"), exist_ok=True)
-        shutil.copy(tests_path, os.path.join(td, "tests", os.path.basename(tests_path)))
-
-        Path(os.path.join(td, "tests", "conftest.py")).write_text(
-            "import sys, pathlib\nROOT = pathlib.Path(__file__).resolve().parents[1]\n"
-            "sys.path.insert(0, str(ROOT))\n",
-            encoding="utf-8"
-        )
-
-        cmd = ["pytest", "-q", "tests"]
-        run = subprocess.run(
-            cmd, cwd=td, capture_output=True, text=True, timeout=10,
-            env={**os.environ, "PYTHONPATH": td},
-        )
-
-    return run.returncode, run.stdout + run.stderr
-
-# -----------------------------------------------------------------------------
-# Prompting
-# -----------------------------------------------------------------------------
-SYSTEM_MSG_TEMPLATE = """
-You must output VALID JSON only with keys:
-- "tests_b64": base64-encoded UTF-8 contents of a complete pytest module (preferred)
-- "tests_py": plain string of the pytest module (optional, provided only if b64 is impossible)
-- "rationale": short string
-
-Rules:
-- JSON only (no markdown fences).
-- Use only pytest and the Python standard library.
-- Prefer pytest.mark.parametrize where sensible.
-- For floats, use pytest.approx (never exact == for 0.1+0.2).
-- Do not mark str+str or list+list as invalid (Python allows those).
-- If the spec forbids non-(int|float), include invalid cases expecting TypeError.
-- No side-effects or file/network access in tests.
-- Import the target with: from under_test import {symbol}
-- Assume 'under_test.py' is at repo root; tests run from 'tests/'. 
-- Avoid extraneous characters before or after the JSON (no leading quotes, BOMs, or comments).
-"""
-
-USER_TEMPLATE = """Target callable name: {symbol}
-
-Write pytest tests for the callable imported as:
-from under_test import {symbol}
-
-Human spec:
-{spec}
-
-Size preset: {size}
-Style hints: {hints}
-
-Constraints:
-- Do not modify the target code.
-- The file must be directly runnable by pytest as tests/test_generated.py.
 """
-
-RAW_SYSTEM = """
-Return ONLY the pytest file content as plain text, between the markers:
-<<<PYTEST_START>>>
-... (pytest module text)
-<<<PYTEST_END>>>
-
-Rules:
-- No JSON, no code fences, no commentary outside the markers.
-- Use only pytest + Python stdlib.
-- Use pytest.mark.parametrize where sensible.
-- For floats: use pytest.approx.
-- Import target as: from under_test import {symbol}
-- Tests must be self-contained and runnable as tests/test_generated.py.
+FastAPI app for the Spec→Test generator. The generation logic lives in core.py;
+this module adds the request/response schemas, routes and app lifecycle.
 """
+import os, json, asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
-RAW_USER = """Write a pytest module that tests the callable {symbol} imported as:
-
-from under_test import {symbol}
-
-Human spec:
-{spec}
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-Constraints:
-- Do not modify the target code.
-- Put ONLY the pytest file content between the markers.
-<<<PYTEST_START>>>
-<<<PYTEST_END>>>"""
+import core
+from core import (
+    GenerationError, Workspace, detect_symbol_name, _ensure_import_line, _exec_pytest, _gen_tests_text,
+    _generate_into_workspace, _publish_files, _run_enabled, _stream_tests_text, record_artifact_runs, run_latest_bundle,
+    run_pytest_cached, score_mutants, _TEST_RESULT_RE,
+)
+from daemon_client import directory_hash
+from jobs import PRIORITIES, JobWorkers
+from metrics import JOB_WAIT_SECONDS, JOBS, REGISTRY, MetricsMiddleware, current_trace, stage, trace_scope
+
+_job_workers: Optional[JobWorkers] = None
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    global _job_workers
+    if not core.STUB_MODE and not core.API_KEY:
+        raise RuntimeError("Set MISTRAL_API_KEY in .env or env vars (not required when STUB_GEN=1).")
+    http = core._new_http_client()
+    if core.API_KEY:
+        core.client = core._new_client(http)
+    if core._pytest_pool is not None and _run_enabled():
+        await asyncio.to_thread(core._pytest_pool.start)
+    gc_task = asyncio.create_task(core._workspaces.gc_forever())
+    _job_workers = JobWorkers(core._jobs, _run_job, concurrency=core.JOB_WORKERS)
+    _job_workers.start()
+    try:
+        yield
+    finally:
+        # running jobs go back to the queue and resume on the next start
+        await _job_workers.stop()
+        _job_workers = None
+        gc_task.cancel()
+        core.client = None
+        await http.aclose()
+        if core._pytest_pool is not None:
+            core._pytest_pool.shutdown()
+
+app = FastAPI(title="Spec→Test Generator", version="0.2.0", lifespan=_lifespan)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(GenerationError)
+async def _generation_error(request: Request, exc: GenerationError):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
 
 # -----------------------------------------------------------------------------
 # Schemas
@@ -248,12 +66,42 @@ class BundleRequest(BaseModel):
     symbol: Optional[str] = None
     tests_mode: str = Field("per_symbol", pattern="^(per_symbol|single)$")
     cleanup_old: bool = True 
+    no_cache: bool = False
+    all_symbols: bool = False
+    publish: bool = True
+    incremental: bool = False
+    timings: bool = False
+    force_run: bool = False
+    mutation: bool = False
 
 class BundleResponse(BaseModel):
     code_path: str
     tests_path: str
     symbol: str
     rationale: str
+    symbols: List[str] = []
+    tests_paths: List[str] = []
+    unchanged: List[str] = []
+    artifacts: List[int] = []
+    # publish=false: the module and tests, keyed by their path inside the (already removed) workspace
+    files: Dict[str, str] = {}
+    timings: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    items: List[BundleRequest]
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
+
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[BundleResponse] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
 
 class GenerateTextRequest(BaseModel):
     code: str
@@ -261,113 +109,404 @@ class GenerateTextRequest(BaseModel):
     size: str = Field("std", pattern="^(mini|std|max)$")
     style_hints: List[str] = []
     symbol: Optional[str] = None
+    no_cache: bool = False
+    timings: bool = False
+
+class JobRequest(BaseModel):
+    kind: str = Field("generate-run", pattern="^(generate-run|generate-and-save)$")
+    priority: str = Field("normal", pattern="^(interactive|normal|batch)$")
+    request: BundleRequest
+
+class RunRequest(BaseModel):
+    code_path: str = "under_test.py"
+    tests_path: Optional[str] = None
+    artifact_id: Optional[int] = None
+    force: bool = False
+    mutation: bool = False
 
 # -----------------------------------------------------------------------------
 # Routes
 # -----------------------------------------------------------------------------
 @app.get("/health")
-def health():
-    return {"ok": True, "model": MODEL, "fallback": FALLBACK_MODEL}
-
-@app.post("/bundle/generate-and-save", response_model=BundleResponse)
-def generate_and_save_bundle(req: BundleRequest):
-    code_path = Path(req.module_path)
-    code_path.parent.mkdir(parents=True, exist_ok=True)
-    code_path.write_text(req.code, encoding="utf-8")
+async def health():
+    return {
+        "ok": True,
+        "model": core.MODEL,
+        "fallback": core.FALLBACK_MODEL,
+        "cache": core._gen_cache.stats(),
+        "run_cache": core._run_cache.stats(),
+        "rate_limiter": core._limiter.stats(),
+        "pytest_pool": core._pytest_pool.stats() if core._pytest_pool is not None else None,
+        "workspaces": core._workspaces.stats(),
+        "breakers": {name: b.stats() for name, b in core._breakers.items()},
+        "hedging": {"enabled": core.HEDGE_ENABLED, **core._hedge_stats},
+        "coalescing": {"enabled": core.COALESCE_ENABLED, **core._inflight.stats()},
+        "routing": core._router.stats(),
+        "artifacts": core._artifacts.stats(),
+        "runner": {"limits": core.RUN_LIMITS.as_dict(), "admission": core._admission.stats()},
+        "jobs": await (_job_workers.stats() if _job_workers is not None else asyncio.to_thread(core._jobs.stats)),
+        "cwd_hash": directory_hash(os.getcwd()),
+    }
 
-    symbol = req.symbol or detect_symbol_name(req.code)
-    if not symbol:
-        raise HTTPException(status_code=400, detail="Could not detect a top-level function/class name. Provide 'symbol'.")
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the stage/model/HTTP histograms and counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
-    tests_py = _gen_tests_text(symbol, req.spec)
-    tests_py = _ensure_import_line(tests_py, symbol)
+def _timings() -> Optional[dict]:
+    trace = current_trace()
+    return trace.as_dict() if trace is not None else None
 
-    tests_root = Path("tests")
-    gen_dir = tests_root / "generated"
-    gen_dir.mkdir(parents=True, exist_ok=True)
-
-    if req.tests_mode == "per_symbol":
-        tests_path = gen_dir / f"test_{symbol}.py"
-        if req.cleanup_old:
-            for p in gen_dir.glob("test_*.py"): 
-                if p.name != tests_path.name:
-                    try:
-                        p.unlink()
-                    except Exception:
-                        pass
+def _publish_bundle(req: BundleRequest, ws: Workspace, symbols: List[str], names: List[str],
+                    unchanged: List[str]) -> BundleResponse:
+    """
+    Copy the workspace's module and tests to module_path / tests/generated
+    (atomic renames; unchanged incremental files are left alone) and index
+    the tests in the artifact store. With publish=False nothing outside the
+    workspace is touched and no artifacts are recorded; the workspace goes
+    away with the request, so its files are returned inline under paths
+    relative to it.
+    """
+    artifact_ids, files = [], {}
+    if not req.publish:
+        code_path = ws.code_path.relative_to(ws.path)
+        tests_paths = [(ws.tests_dir / name).relative_to(ws.path) for name in names]
+        files = {str(path): (ws.path / path).read_text(encoding="utf-8") for path in (code_path, *tests_paths)}
     else:
-        tests_path = gen_dir / "test_generated.py"
-
-    conftest = tests_root / "conftest.py"
-    if not conftest.exists():
-        conftest.write_text(
-            "import sys, pathlib\n"
-            "ROOT = pathlib.Path(__file__).resolve().parents[1]\n"
-            "if str(ROOT) not in sys.path:\n"
-            "    sys.path.insert(0, str(ROOT))\n",
-            encoding="utf-8",
-        )
-
-    tests_path.write_text(tests_py, encoding="utf-8")
+        with stage("publish"):
+            code_path, tests_paths, artifact_ids = _publish_files(req, ws, symbols, names, unchanged)
 
     return BundleResponse(
         code_path=str(code_path),
-        tests_path=str(tests_path),
-        symbol=symbol,
+        tests_path=str(tests_paths[0]),
+        symbol=symbols[0],
         rationale="Generated via raw-text markers; floats use pytest.approx; imports from under_test.py.",
+        symbols=symbols,
+        tests_paths=[str(p) for p in tests_paths],
+        unchanged=unchanged,
+        artifacts=artifact_ids,
+        files=files,
     )
 
+@app.post("/bundle/generate-and-save", response_model=BundleResponse)
+async def generate_and_save_bundle(req: BundleRequest):
+    with trace_scope():
+        ws, symbols, names, unchanged = await _generate_into_workspace(req)
+        try:
+            resp = _publish_bundle(req, ws, symbols, names, unchanged)
+        finally:
+            ws.close()
+        if req.timings:
+            resp.timings = _timings()
+        return resp
+
+@app.post("/bundle/generate-batch", response_model=BatchResponse)
+async def generate_batch(req: BatchRequest):
+    """
+    Generate every item concurrently (at most `concurrency` at once). All items
+    share the module-level rate limiter; failures are reported per item.
+    Publishing items must use distinct module_path values (422 otherwise), and
+    they never clean up tests/generated, which sibling items are writing to.
+    """
+    if len(req.items) > core.BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Batch too large ({len(req.items)} > {core.BATCH_MAX_ITEMS} items).")
+    seen = {}
+    for index, item in enumerate(req.items):
+        if not item.publish:
+            continue
+        path = os.path.normpath(item.module_path)
+        if path in seen:
+            raise HTTPException(422, f"Items {seen[path]} and {index} both publish to {item.module_path}.")
+        seen[path] = index
+    items = [item.model_copy(update={"cleanup_old": False}) if item.publish else item for item in req.items]
+
+    sem = asyncio.Semaphore(req.concurrency or core.BATCH_CONCURRENCY)
+
+    async def one(index: int, item: BundleRequest) -> BatchItemResult:
+        async with sem:
+            try:
+                # each item gets its own breakdown, still rolled up into the batch's trace
+                with trace_scope(nested=True):
+                    return BatchItemResult(index=index, ok=True, result=await generate_and_save_bundle(item))
+            except (HTTPException, GenerationError) as e:
+                return BatchItemResult(index=index, ok=False, status_code=e.status_code, error=str(e.detail))
+            except Exception as e:
+                return BatchItemResult(index=index, ok=False, status_code=500, error=f"{type(e).__name__}: {e}")
+
+    results = await asyncio.gather(*(one(i, item) for i, item in enumerate(items)))
+    ok = sum(1 for r in results if r.ok)
+    return BatchResponse(succeeded=ok, failed=len(results) - ok, results=results)
+
 @app.post("/bundle/generate-run")
-def generate_and_run(req: BundleRequest):
+async def generate_and_run(req: BundleRequest):
     if not _run_enabled():
         raise HTTPException(403, "Test execution disabled. Set ENABLE_RUN=1 to enable.")
 
-    resp = generate_and_save_bundle(req)
-
-    with tempfile.TemporaryDirectory() as td:
-        shutil.copy(resp.code_path, os.path.join(td, "under_test.py"))
-        os.makedirs(os.path.join(td, "tests"), exist_ok=True)
-        shutil.copy(resp.tests_path, os.path.join(td, "tests", os.path.basename(resp.tests_path)))
-
-        Path(os.path.join(td, "tests", "conftest.py")).write_text(
-            "import sys, pathlib\nROOT = pathlib.Path(__file__).resolve().parents[1]\n"
-            "sys.path.insert(0, str(ROOT))\n",
-            encoding="utf-8",
-        )
-
-        cmd = ["pytest", "-q", "tests"]
-        try:
-            run = subprocess.run(
-                cmd,
-                cwd=td,
-                capture_output=True,
-                text=True,
-                timeout=10,  
-                env={**os.environ, "PYTHONPATH": td},
-            )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(504, "pytest timed out")
-
-    return {
+    ws, symbols, names, unchanged = await _generate_into_workspace(req)
+    try:
+        resp = _publish_bundle(req, ws, symbols, names, unchanged)
+        # the workspace already has the runner layout: run it in place
+        res = await run_pytest_cached(str(ws.path), ["-q", "-rA", "tests"], timeout=10, force=req.force_run)
+        if req.mutation and not res["timed_out"]:
+            res["mutation"] = await score_mutants(req.code, ws.tests_dir, symbols)
+    finally:
+        ws.close()
+    record_artifact_runs(resp.artifacts, res)
+
+    # a run stopped by the wall clock or an rlimit is still a result: timed_out/limit say which
+    out = {
         "code_path": resp.code_path,
         "tests_path": resp.tests_path,
         "symbol": resp.symbol,
-        "exit_code": run.returncode,
-        "stdout": run.stdout[-4000:],  
-        "stderr": run.stderr[-4000:],
+        "symbols": resp.symbols,
+        "tests_paths": resp.tests_paths,
+        "artifacts": resp.artifacts,
+        "files": resp.files,
+        "exit_code": res["exit_code"],
+        "stdout": res["stdout"][-4000:],  
+        "stderr": res["stderr"][-4000:],
+        "outcomes": res["outcomes"],
+        "cached": res["cached"],
+        "timed_out": res["timed_out"],
+        "limit": res["limit"],
+        "signal": res["signal"],
     }
+    if "mutation" in res:
+        out["mutation"] = res["mutation"]
+    if req.timings:
+        out["timings"] = _timings()
+    return out
+
+@app.post("/bundle/run")
+async def run_bundle(req: RunRequest):
+    """
+    Run the newest indexed test artifact for code_path (or artifact_id / tests_path)
+    against code_path (the `cli.py run` equivalent).
+    """
+    if not _run_enabled():
+        raise HTTPException(403, "Test execution disabled. Set ENABLE_RUN=1 to enable.")
+    res = await run_latest_bundle(req.code_path, req.tests_path, force=req.force, mutation=req.mutation,
+                                  artifact_id=req.artifact_id)
+    return {key: res[key] for key in ("exit_code", "stdout", "stderr", "outcomes", "cached", "timed_out", "limit",
+                                      "signal", "mutation", "artifact") if key in res}
+
+@app.post("/bundle/generate-run/stream")
+async def generate_and_run_stream(req: BundleRequest):
+    """
+    NDJSON variant of /bundle/generate-run (always runs pytest; the test-result
+    cache only serves the non-streaming endpoints). Emits one event per line:
+      {"event": "generated", ...BundleResponse}
+      {"event": "line", "stream": "stdout"|"stderr", "line": str}
+      {"event": "test", "nodeid": str, "outcome": "passed"|"failed"|...}
+      {"event": "summary", "exit_code": int|null, "timed_out": bool, "limit": str|null,
+       "signal": int|null, "counts": {...}, "dropped_events": int, "stdout": str, "stderr": str,
+       "truncated": bool}
+    On timeout the summary still carries the outcomes and output seen so far. A
+    client more than STREAM_MAX_PENDING_EVENTS behind loses line/test events
+    (counted in dropped_events; counts still cover every test).
+    """
+    if not _run_enabled():
+        raise HTTPException(403, "Test execution disabled. Set ENABLE_RUN=1 to enable.")
+
+    ws, symbols, names, unchanged = await _generate_into_workspace(req)
+    try:
+        resp = _publish_bundle(req, ws, symbols, names, unchanged)
+    except BaseException:
+        ws.close()
+        raise
+    loop = asyncio.get_running_loop()
+    # one slot stays free for the summary, so it is never dropped
+    events: asyncio.Queue = asyncio.Queue(maxsize=max(core.STREAM_MAX_PENDING_EVENTS, 1) + 1)
+    counts: dict = {}
+    dropped = 0
+
+    def offer(event: dict) -> None:
+        # runs on the loop; a slow client loses line/test events instead of buffering them all
+        nonlocal dropped
+        if event["event"] == "test":
+            counts[event["outcome"]] = counts.get(event["outcome"], 0) + 1
+        if event["event"] != "summary" and events.qsize() >= events.maxsize - 1:
+            dropped += 1
+            return
+        events.put_nowait(event)
+
+    def on_line(stream: str, line: str) -> None:
+        # called from the pool thread (or the loop itself on the cold path)
+        loop.call_soon_threadsafe(offer, {"event": "line", "stream": stream, "line": line})
+        m = _TEST_RESULT_RE.match(line) if stream == "stdout" else None
+        if m:
+            outcome = m.group("outcome").lower()
+            loop.call_soon_threadsafe(offer, {"event": "test", "nodeid": m.group("nodeid"), "outcome": outcome})
+
+    async def run():
+        try:
+            res = await _exec_pytest(str(ws.path), ["-v", "tests"], timeout=10, on_line=on_line)
+        except Exception as e:
+            res = {"exit_code": None, "timed_out": False, "limit": None, "signal": None, "stdout": "",
+                   "stderr": f"{type(e).__name__}: {e}", "truncated": False}
+        # queued after every line event, so the summary is always last
+        loop.call_soon_threadsafe(offer, {"event": "summary", **res})
+
+    async def body():
+        yield json.dumps({"event": "generated", **resp.model_dump()}) + "\n"
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event["event"] == "summary":
+                    event["counts"] = counts
+                    event["dropped_events"] = dropped
+                    if req.timings:
+                        event["timings"] = _timings()
+                    yield json.dumps(event) + "\n"
+                    break
+                yield json.dumps(event) + "\n"
+        finally:
+            await task
+            ws.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def _run_job(job: dict) -> dict:
+    """JobWorkers runner: the same work as the synchronous route for job["kind"]."""
+    JOB_WAIT_SECONDS.observe(job["started"] - job["created"], priority=str(job["priority"]))
+    req = BundleRequest(**job["request"])
+    outcome = "failed"
+    try:
+        with trace_scope():
+            if job["kind"] == "generate-run":
+                result = await generate_and_run(req)
+            else:
+                result = (await generate_and_save_bundle(req)).model_dump()
+        outcome = "succeeded"
+        return result
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        JOBS.inc(kind=job["kind"], status=outcome)
+
+def _job_view(job: dict) -> dict:
+    priority = next((name for name, value in PRIORITIES.items() if value == job["priority"]), job["priority"])
+    view = {key: job[key] for key in ("id", "kind", "status", "attempts", "created", "started", "finished")}
+    view["priority"] = priority
+    if "position" in job:
+        view["position"] = job["position"]
+    if job["status"] == "succeeded":
+        view["result"] = job["result"]
+    elif job["status"] == "failed":
+        view["status_code"] = job["status_code"]
+        view["error"] = job["error"]
+    return view
+
+@app.post("/jobs", status_code=202)
+async def submit_job(req: JobRequest):
+    """
+    Queue a generate-run / generate-and-save request and return its id at once;
+    poll GET /jobs/{id} for the result. Interactive jobs run before normal
+    ones, batch jobs last.
+    """
+    if req.kind == "generate-run" and not _run_enabled():
+        raise HTTPException(403, "Test execution disabled. Set ENABLE_RUN=1 to enable.")
+    # the queue is sqlite (which may wait on another process's lock): keep it off the event loop
+    job_id = await asyncio.to_thread(core._jobs.submit, req.kind, req.request.model_dump(), PRIORITIES[req.priority])
+    if _job_workers is not None:
+        _job_workers.notify()
+    return _job_view(await asyncio.to_thread(core._jobs.get, job_id))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(core._jobs.get, job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job.")
+    return _job_view(job)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; finished jobs answer 409."""
+    if _job_workers is not None:
+        previous = await _job_workers.cancel(job_id)
+    else:
+        previous = await asyncio.to_thread(core._jobs.cancel, job_id)
+    if previous is None:
+        raise HTTPException(404, "Unknown job.")
+    if previous in ("succeeded", "failed", "cancelled"):
+        raise HTTPException(409, f"Job already {previous}.")
+    return _job_view(await asyncio.to_thread(core._jobs.get, job_id))
+
+@app.get("/artifacts")
+async def list_artifacts(module_path: Optional[str] = None, symbol: Optional[str] = None,
+                         code_hash: Optional[str] = None, model: Optional[str] = None,
+                         before: Optional[int] = None, limit: int = Query(50, ge=1, le=500)):
+    """
+    Indexed test artifacts, newest first, filtered by any of the query
+    parameters. Pass the returned `next_before` as `before` for the next page.
+    """
+    found = core._artifacts.query(module_path=module_path, symbol=symbol, code_hash=code_hash, model=model,
+                                  before=before, limit=limit)
+    return {"artifacts": found, "next_before": found[-1]["id"] if len(found) == limit else None}
+
+@app.get("/artifacts/latest")
+async def latest_artifact(module_path: Optional[str] = None, symbol: Optional[str] = None):
+    """The newest artifact (for a module, or one of its symbols) with its content."""
+    artifact = core._artifacts.latest(module_path=module_path, symbol=symbol)
+    if artifact is None:
+        raise HTTPException(404, "No matching artifact.")
+    return _artifact_view(artifact)
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: int):
+    artifact = core._artifacts.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(404, "Unknown artifact.")
+    return _artifact_view(artifact)
+
+def _artifact_view(artifact: dict) -> dict:
+    try:
+        return {**artifact, "content": core._artifacts.read(artifact)}
+    except FileNotFoundError:
+        raise HTTPException(404, f"Artifact {artifact['id']} has no stored content.")
 
 @app.post("/tests/generate.txt", response_class=PlainTextResponse)
-def generate_tests_text(req: GenerateTextRequest):
+async def generate_tests_text(req: GenerateTextRequest):
     symbol = req.symbol or detect_symbol_name(req.code) or "target"
-    Path("under_test.py").write_text(req.code, encoding="utf-8")
 
-    tests_py = _gen_tests_text(symbol, req.spec)
+    tests_py = await _gen_tests_text(symbol, req.spec, req.code, no_cache=req.no_cache,
+                                     size=req.size, style_hints=tuple(req.style_hints))
 
     tests_py = _ensure_import_line(tests_py, symbol)
-    
+
+    if req.timings:
+        # plain-text body: the breakdown goes in a header instead
+        return PlainTextResponse(tests_py, headers={"X-Timings": json.dumps(_timings())})
     return tests_py
 
+@app.post("/tests/generate.stream")
+async def generate_tests_stream(req: GenerateTextRequest):
+    """
+    Chunked text/plain variant of /tests/generate.txt: forwards only the pytest
+    body as the model produces it and closes the upstream stream at the end marker.
+    """
+    symbol = req.symbol or detect_symbol_name(req.code) or "target"
+
+    chunks = _stream_tests_text(symbol, req.spec, req.code, no_cache=req.no_cache,
+                                size=req.size, style_hints=tuple(req.style_hints))
+    # Pull the first chunk before sending headers so upstream errors keep their status code.
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = ""
+
+    async def body():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except GenerationError as e:
+            yield f"\n# ERROR: {e.detail}\n"
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
 """
 curl -sS -X POST http://127.0.0.1:8000/bundle/generate-run \
   -H "Content-Type: application/json" \
@@ -0,0 +1,262 @@
+"""
+Minimal Prometheus-style metrics and per-request stage tracing.
+
+Counters and histograms render in the Prometheus text exposition format for
+/metrics. `stage("name")` times a block into the `stage_seconds` histogram and,
+when a trace is active (see `trace_scope`), into that request's breakdown.
+Traces live in a contextvar, so tasks spawned with asyncio.gather or
+asyncio.to_thread report into the same request. MetricsMiddleware opens one
+trace per HTTP request, times it and adds a Server-Timing header.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = ['%s="%s"' % (n, _escape(str(v))) for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, n) in sorted(self._series.items()):
+            for bound, c in zip(self.buckets, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {c}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, inf)} {n}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        m = Counter(name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+# -----------------------------------------------------------------------------
+# Per-request traces
+# -----------------------------------------------------------------------------
+class Trace:
+    """
+    Summed seconds per stage (concurrent stages add up), token totals and one
+    entry per model call. Everything recorded on a nested trace is also
+    recorded on its parent.
+    """
+
+    def __init__(self, parent: Optional["Trace"] = None):
+        self.parent = parent
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.model_calls = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if self.parent is not None:
+            self.parent.add(stage, seconds)
+
+    def add_tokens(self, prompt: int = 0, completion: int = 0) -> None:
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+        if self.parent is not None:
+            self.parent.add_tokens(prompt, completion)
+
+    def add_model_call(self, **info) -> None:
+        with self._lock:
+            self.model_calls.append(info)
+        if self.parent is not None:
+            self.parent.add_model_call(**info)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total_s": round(time.monotonic() - self.started, 4),
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "tokens": dict(self.tokens),
+                "model_calls": list(self.model_calls),
+            }
+
+    def server_timing(self) -> str:
+        with self._lock:
+            return ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in self.stages.items())
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("spec2test_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace_scope(nested: bool = False) -> Iterator[Trace]:
+    """
+    Start a trace unless one is already active, in which case the outer one is
+    shared. nested=True always starts a child trace (e.g. per batch item).
+    """
+    active = _current.get()
+    if active is not None and not nested:
+        yield active
+        return
+    trace = Trace(parent=active)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+# Defined once here (not in main) so reloading the app doesn't register duplicates.
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("spec2test_stage_seconds", "Time spent per pipeline stage.", ("stage",))
+HTTP_SECONDS = REGISTRY.histogram("spec2test_http_request_seconds", "HTTP request latency.", ("path", "status"))
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "spec2test_model_call_seconds", "Model call latency including retry backoff.", ("model", "outcome"))
+MODEL_BACKOFF_SECONDS = REGISTRY.histogram(
+    "spec2test_model_backoff_seconds", "Time spent sleeping between model retries.", ("model",))
+MODEL_RETRIES = REGISTRY.counter("spec2test_model_retries_total", "Model call retries after 429/capacity.", ("model",))
+MODEL_TOKENS = REGISTRY.counter("spec2test_model_tokens_total", "Tokens reported by the model.", ("model", "kind"))
+GEN_CACHE_LOOKUPS = REGISTRY.counter("spec2test_gen_cache_lookups_total", "Generation cache lookups.", ("result",))
+RUN_CACHE_LOOKUPS = REGISTRY.counter("spec2test_run_cache_lookups_total", "Test-result cache lookups.", ("result",))
+PYTEST_RUNS = REGISTRY.counter("spec2test_pytest_runs_total", "pytest executions.", ("outcome",))
+JOBS = REGISTRY.counter("spec2test_jobs_total", "Finished jobs by kind and final status.", ("kind", "status"))
+JOB_WAIT_SECONDS = REGISTRY.histogram("spec2test_job_wait_seconds", "Time jobs spent queued before a worker took them.",
+                                      ("priority",))
+GEN_COALESCED = REGISTRY.counter(
+    "spec2test_gen_coalesced_total", "Generations that waited on an identical in-flight call instead of calling "
+    "the model (result: shared/timeout).", ("result",))
+RUN_LIMITS_HIT = REGISTRY.counter("spec2test_run_limits_total", "Test runs stopped by a resource limit.", ("limit",))
+ROUTE_DECISIONS = REGISTRY.counter(
+    "spec2test_route_decisions_total", "Model tier chosen per generation (tier: cheap/default).", ("tier", "reason"))
+ROUTE_OUTCOMES = REGISTRY.counter(
+    "spec2test_route_outcomes_total", "Per-tier generation outcomes (accepted, escalated_<why>, failed).",
+    ("tier", "result"))
+ROUTE_SECONDS = REGISTRY.histogram("spec2test_route_seconds", "Generation latency per model tier and outcome.",
+                                   ("tier", "result"))
+ROUTE_COMPLEXITY = REGISTRY.histogram(
+    "spec2test_route_complexity", "AST complexity score of routed targets, by tier and outcome.", ("tier", "result"),
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 100, 200))
+MUTANTS = REGISTRY.counter(
+    "spec2test_mutants_total", "Mutants scored, by status (killed/timeout/survived/no_coverage/not_run).",
+    ("status",))
+VALIDATIONS = REGISTRY.counter(
+    "spec2test_validations_total", "Pre-flight validation of generated tests (ok/repaired/reprompted/failed).",
+    ("result",))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: one trace per HTTP request, the request latency histogram
+    (labelled by route template, so path parameters don't explode cardinality)
+    and a Server-Timing header with the stages finished before the headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.monotonic()
+        status = {"code": 500}
+
+        with trace_scope(nested=True) as trace:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    timing = trace.server_timing()
+                    if timing:
+                        message = {**message, "headers": [*message.get("headers", []),
+                                                          (b"server-timing", timing.encode("latin-1"))]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                HTTP_SECONDS.observe(time.monotonic() - started, path=path, status=status["code"])
@@ -0,0 +1,289 @@
+"""
+Mutation testing for generated suites.
+
+build_schemata() mutates the target symbols of the module under test
+(operator swaps, boundary shifts, logical flips, changed return values) and
+compiles every mutant into ONE module. Each mutation site becomes a runtime
+switch:
+
+    a + b   ->   (a - b) if __spec2test_m__(3) else (a + b)
+
+Module-level `__spec2test_mutant__` selects the active mutant (0 = original).
+So one pytest process can try every mutant without re-importing anything.
+While the original runs, the probe records which sites each test reaches,
+which gives per-test coverage of the mutants. mutation_plugin.py does the
+running inside pytest; summarize() turns its reports into a score.
+"""
+import ast
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SWITCH = "__spec2test_mutant__"
+HITS = "__spec2test_hits__"
+PROBE = "__spec2test_m__"
+
+# a function, not a bare compare, so the original run can record coverage
+PRELUDE = f"""
+{SWITCH} = 0
+{HITS} = set()
+
+def {PROBE}(k):
+    if {SWITCH} == 0:
+        {HITS}.add(k)
+        return False
+    return {SWITCH} == k
+"""
+
+_ARITHMETIC = {
+    ast.Add: ast.Sub, ast.Sub: ast.Add, ast.Mult: ast.Div, ast.Div: ast.Mult, ast.FloorDiv: ast.Mult,
+    ast.Mod: ast.FloorDiv, ast.Pow: ast.Mult, ast.BitAnd: ast.BitOr, ast.BitOr: ast.BitAnd,
+    ast.LShift: ast.RShift, ast.RShift: ast.LShift,
+}
+_BOUNDARY = {ast.Lt: ast.LtE, ast.LtE: ast.Lt, ast.Gt: ast.GtE, ast.GtE: ast.Gt}
+_NEGATION = {ast.Eq: ast.NotEq, ast.NotEq: ast.Eq, ast.Is: ast.IsNot, ast.IsNot: ast.Is,
+             ast.In: ast.NotIn, ast.NotIn: ast.In}
+_LOGICAL = {ast.And: ast.Or, ast.Or: ast.And}
+
+
+class Mutant:
+    def __init__(self, mutant_id: int, symbol: str, line: int, operator: str, original: str, mutated: str):
+        self.id = mutant_id
+        self.symbol = symbol
+        self.line = line
+        self.operator = operator
+        self.original = original
+        self.mutated = mutated
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "symbol": self.symbol, "line": self.line, "operator": self.operator,
+                "original": self.original, "mutated": self.mutated}
+
+
+def _numeric(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and type(node.value) in (int, float)
+
+
+def _alternatives(node: ast.AST) -> List[Tuple[str, ast.AST]]:
+    """(operator, replacement) pairs for one expression; replacements share node's children."""
+    alts = []
+    if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        alts.append(("arithmetic", ast.BinOp(node.left, _ARITHMETIC[type(node.op)](), node.right)))
+    elif isinstance(node, ast.Compare):
+        for i, op in enumerate(node.ops):
+            swap = _BOUNDARY.get(type(op)) or _NEGATION.get(type(op))
+            if swap is not None:
+                ops = list(node.ops)
+                ops[i] = swap()
+                alts.append(("boundary" if type(op) in _BOUNDARY else "comparison",
+                             ast.Compare(node.left, ops, node.comparators)))
+        operands = [node.left] + list(node.comparators)
+        for i, operand in enumerate(operands):
+            if _numeric(operand):
+                shifted = operands[:i] + [ast.Constant(operand.value + 1)] + operands[i + 1:]
+                alts.append(("boundary", ast.Compare(shifted[0], node.ops, shifted[1:])))
+    elif isinstance(node, ast.BoolOp):
+        alts.append(("logical", ast.BoolOp(_LOGICAL[type(node.op)](), node.values)))
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        alts.append(("logical" if isinstance(node.op, ast.Not) else "arithmetic", node.operand))
+    return alts
+
+
+def _return_alternatives(value: ast.AST) -> List[Tuple[str, ast.AST]]:
+    if isinstance(value, ast.Constant) and isinstance(value.value, bool):
+        return [("return", ast.Constant(not value.value))]
+    if isinstance(value, ast.Constant) and value.value is None:
+        return []
+    return [("return", ast.Constant(None))]
+
+
+class _Schemata(ast.NodeTransformer):
+    """Rewrite function bodies so every mutation site is switchable at runtime."""
+
+    def __init__(self):
+        self.mutants: List[Mutant] = []
+        self.symbol = ""
+
+    def _probe(self, mutant_id: int) -> ast.expr:
+        return ast.Call(ast.Name(PROBE, ast.Load()), [ast.Constant(mutant_id)], [])
+
+    def _register(self, node: ast.AST, alts: List[Tuple[str, ast.AST]], original: ast.AST) -> List[int]:
+        ids = []
+        for operator, alt in alts:
+            mutant_id = len(self.mutants) + 1
+            self.mutants.append(Mutant(mutant_id, self.symbol, node.lineno, operator,
+                                       ast.unparse(original), ast.unparse(alt)))
+            ids.append(mutant_id)
+        return ids
+
+    def _switch(self, ids: List[int], alts: List[ast.AST], original: ast.expr) -> ast.expr:
+        expr = original
+        for mutant_id, alt in zip(ids, alts):
+            expr = ast.IfExp(self._probe(mutant_id), alt, expr)
+        return expr
+
+    def generic_visit(self, node):
+        if not isinstance(node, ast.expr) or not _alternatives(node):
+            return super().generic_visit(node)
+        # describe the mutants on the untouched node, then build them from the rewritten children
+        ids = self._register(node, _alternatives(node), node)
+        node = super().generic_visit(node)
+        return self._switch(ids, [alt for _, alt in _alternatives(node)], node)
+
+    def visit_Return(self, node: ast.Return):
+        if node.value is None:
+            return node
+        alts = _return_alternatives(node.value)
+        ids = self._register(node, alts, node.value)
+        node.value = self.visit(node.value)
+        node.value = self._switch(ids, [alt for _, alt in alts], node.value)
+        return node
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        if type(node.op) not in _ARITHMETIC:
+            node.value = self.visit(node.value)
+            return node
+        swap = _ARITHMETIC[type(node.op)]
+        (mutant_id,) = self._register(node, [("arithmetic", ast.AugAssign(node.target, swap(), node.value))], node)
+        node.value = self.visit(node.value)
+        return ast.If(self._probe(mutant_id), [ast.AugAssign(node.target, swap(), node.value)], [node])
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        # annotations are never evaluated inside a function body; only the value matters
+        if node.value is not None:
+            node.value = self.visit(node.value)
+        return node
+
+    def visit_FunctionDef(self, node):
+        # decorators, defaults and annotations run once at definition time: only the body is mutated
+        node.body = [self.visit(stmt) for stmt in node.body]
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        node.body = self.visit(node.body)
+        return node
+
+
+def _targets(tree: ast.Module, symbols: Iterable[str]) -> List[Tuple[str, ast.AST]]:
+    """(symbol, function node) for every function body to mutate, in source order."""
+    wanted = set(symbols)
+    found = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in wanted:
+            found.append((node.name, node))
+        elif isinstance(node, ast.ClassDef):
+            whole = node.name in wanted
+            for item in node.body:
+                name = f"{node.name}.{item.name}" if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) else None
+                if name and (whole or name in wanted):
+                    found.append((name, item))
+    return found
+
+
+def _prelude_at(tree: ast.Module) -> int:
+    """Index in tree.body after the module docstring and __future__ imports."""
+    index = 0
+    for i, node in enumerate(tree.body):
+        is_doc = i == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+            and isinstance(node.value.value, str)
+        if not (is_doc or (isinstance(node, ast.ImportFrom) and node.module == "__future__")):
+            break
+        index = i + 1
+    return index
+
+
+def build_schemata(code: str, symbols: Iterable[str]) -> Tuple[str, List[Mutant]]:
+    """
+    The mutant-schemata source for `code` and the mutants it contains. Only
+    the bodies of `symbols` ("func", "Class" or "Class.method") are mutated.
+    """
+    tree = ast.parse(code)
+    schemata = _Schemata()
+    for symbol, node in _targets(tree, symbols):
+        schemata.symbol = symbol
+        schemata.visit(node)
+    at = _prelude_at(tree)
+    tree.body[at:at] = ast.parse(PRELUDE).body
+    return ast.unparse(ast.fix_missing_locations(tree)) + "\n", schemata.mutants
+
+
+def imported_targets(tests_text: str, module: str = "under_test") -> List[str]:
+    """Names a test module imports from the module under test (`from under_test import a, B`)."""
+    try:
+        tree = ast.parse(tests_text)
+    except SyntaxError:
+        return []
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == module and not node.level:
+            names.extend(a.name for a in node.names if a.name != "*" and a.name not in names)
+    return names
+
+
+def sample(mutants: List[Mutant], limit: int) -> List[Mutant]:
+    """At most `limit` mutants, spread evenly over the module."""
+    if limit <= 0 or len(mutants) <= limit:
+        return mutants
+    step = len(mutants) / limit
+    return [mutants[int(i * step)] for i in range(limit)]
+
+
+def summarize(mutants: List[Mutant], shards: List[Tuple[List[int], Optional[str], dict]],
+              max_survivors: int = 20) -> dict:
+    """
+    Score from the plugin reports. shards are (mutant ids, report text or
+    None, run result). If a shard was killed, its first unreported mutant
+    counts as a timeout (it is what hung). The rest count as not_run and are
+    left out of the score.
+    """
+    status: Dict[int, dict] = {}
+    baseline = {"tests": 0, "passing": 0}
+    errors = []
+    for ids, report, res in shards:
+        lines = [json.loads(line) for line in (report or "").splitlines() if line.strip()]
+        for line in lines:
+            if line["type"] == "baseline":
+                baseline["tests"] = max(baseline["tests"], line["tests"])
+                baseline["passing"] = max(baseline["passing"], line["passing"])
+            elif line["type"] == "mutant":
+                status[line["id"]] = line
+            elif line["type"] == "error" and line["error"] not in errors:
+                errors.append(line["error"])
+        missing = [i for i in ids if i not in status]
+        if missing and any(line["type"] == "baseline" for line in lines) and (res.get("timed_out") or res.get("limit")):
+            hung = missing.pop(0)
+            status[hung] = {"id": hung, "status": "timeout"}
+        for i in missing:
+            status.setdefault(i, {"id": i, "status": "not_run"})
+        if not lines and res.get("exit_code") not in (0, None):
+            errors.append((res.get("stdout", "") + res.get("stderr", ""))[-1000:].strip() or "mutation run failed")
+
+    counts = {name: 0 for name in ("killed", "timeout", "survived", "no_coverage", "not_run")}
+    for mutant in mutants:
+        counts[status.get(mutant.id, {"status": "not_run"})["status"]] += 1
+    scored = len(mutants) - counts["not_run"]
+    survivors = [{**m.as_dict(), "status": status[m.id]["status"]} for m in mutants
+                 if status.get(m.id, {}).get("status") in ("survived", "no_coverage")]
+    return {
+        "mutants": len(mutants),
+        **counts,
+        "score": round((counts["killed"] + counts["timeout"]) / scored, 4) if scored else None,
+        "baseline": baseline,
+        "survivors": survivors[:max_survivors],
+        "errors": errors,
+    }
+
+
+def format_summary(m: dict) -> str:
+    """Human-readable score and survivors of a core.score_mutants result."""
+    if m["score"] is None:
+        lines = [f"Mutation score: n/a ({m['mutants']} mutants)"]
+    else:
+        lines = [f"Mutation score: {m['score']:.0%} ({m['killed'] + m['timeout']}/{m['mutants'] - m['not_run']} killed, "
+                 f"{m['survived']} survived, {m['no_coverage']} not covered)"]
+    for s in m["survivors"]:
+        lines.append(f"  survived line {s['line']} ({s['symbol']}): {s['original']} -> {s['mutated']}"
+                     + (" [not covered]" if s["status"] == "no_coverage" else ""))
+    lines += [f"  error: {e}" for e in m["errors"]]
+    return "\n".join(lines)
@@ -0,0 +1,112 @@
+"""
+pytest plugin that scores mutants inside one pytest process.
+
+Loaded with `-p mutation_plugin --mutants=1,5,9 --mutation-report=PATH` into a
+workspace whose under_test.py is a mutant schemata (see mutation.py). It
+replaces the normal test loop:
+
+  1. run every test once against the original, recording which mutation
+     sites it reaches;
+  2. for each mutant, switch it on and run only the passing tests that reach
+     its site, stopping at the first failure (killed). A mutant that runs
+     longer than MUTANT_TIMEOUT_FACTOR x its tests' baseline time is stopped
+     and counted as killed by timeout.
+
+Each result is appended to the report as one JSON line as soon as it is known,
+so a shard killed by its wall-clock or CPU limit still reports what it finished.
+"""
+import json
+import signal
+import sys
+import time
+
+import pytest
+from _pytest.runner import runtestprotocol
+
+from mutation import HITS, SWITCH
+
+TARGET_MODULE = "under_test"
+MUTANT_TIMEOUT_FACTOR = 10
+MUTANT_MIN_TIMEOUT = 1.0
+
+
+class MutantTimeout(Exception):
+    """The active mutant ran far longer than the original (likely an endless loop)."""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("spec2test-mutation")
+    group.addoption("--mutants", default=None, help="Comma-separated mutant ids to try")
+    group.addoption("--mutation-report", default="mutation.jsonl", help="Where to append JSON-line results")
+
+
+def pytest_configure(config):
+    if config.getoption("mutants") is not None:
+        config.pluginmanager.register(_MutationRunner(config), "spec2test-mutation-runner")
+
+
+def _run(item) -> bool:
+    """Run one test outside the terminal reporter; True when it passed (or was skipped)."""
+    reports = runtestprotocol(item, log=False, nextitem=None)
+    return not any(r.failed for r in reports)
+
+
+class _MutationRunner:
+    def __init__(self, config):
+        self.ids = [int(i) for i in config.getoption("mutants").split(",") if i]
+        self.report_path = config.getoption("mutation_report")
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        with open(self.report_path, "a", encoding="utf-8") as report:
+            def write(record: dict) -> None:
+                report.write(json.dumps(record) + "\n")
+                report.flush()
+
+            if session.testsfailed:
+                write({"type": "error", "error": "test collection failed"})
+                return True
+            module = sys.modules.get(TARGET_MODULE)
+            if module is None or not hasattr(module, SWITCH):
+                write({"type": "error", "error": f"the tests never import {TARGET_MODULE}"})
+                return True
+
+            coverage, durations = {}, {}
+            for item in session.items:
+                getattr(module, HITS).clear()
+                started = time.monotonic()
+                if _run(item):
+                    durations[item] = time.monotonic() - started
+                    coverage[item] = set(getattr(module, HITS))
+            write({"type": "baseline", "tests": len(session.items), "passing": len(coverage)})
+
+            for mutant_id in self.ids:
+                tests = [item for item in coverage if mutant_id in coverage[item]]
+                if not tests:
+                    write({"type": "mutant", "id": mutant_id, "status": "no_coverage"})
+                    continue
+                budget = max(MUTANT_MIN_TIMEOUT, MUTANT_TIMEOUT_FACTOR * sum(durations[t] for t in tests))
+                write({"type": "mutant", "id": mutant_id, **self._try(module, mutant_id, tests, budget)})
+        return True
+
+    def _try(self, module, mutant_id: int, tests, budget: float) -> dict:
+        fired = []
+
+        def on_alarm(signum, frame):
+            fired.append(True)
+            raise MutantTimeout(f"mutant {mutant_id} exceeded {budget:.1f}s")
+
+        previous = signal.signal(signal.SIGALRM, on_alarm)
+        setattr(module, SWITCH, mutant_id)
+        signal.setitimer(signal.ITIMER_REAL, budget)
+        try:
+            for item in tests:
+                if not _run(item):
+                    return {"status": "timeout" if fired else "killed", "killed_by": item.nodeid}
+            return {"status": "survived"}
+        except MutantTimeout:  # fired outside the test call itself
+            return {"status": "timeout"}
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+            setattr(module, SWITCH, 0)
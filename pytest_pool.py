@@ -0,0 +1,413 @@
+"""
+Pool of warm pytest runner processes.
+
+Each worker is a long-lived interpreter that has already imported pytest and
+run a throwaway session, so its plugins are loaded. For every job it forks a fresh child, so jobs never share
+imported test modules or state, but none of them pays interpreter or pytest
+start-up. Workers are recycled after `max_jobs` jobs.
+
+The parent talks to a worker over JSON lines on stdin/stdout:
+    -> {"cwd": str, "args": [str], "timeout": float, "env": {str: str}|null,
+        "stream": bool, "max_output": int, "limits": {...}}
+    <- {"type": "ready", "startup_s": float}                       (once)
+    <- {"type": "line", "stream": "stdout"|"stderr", "line": str}  (stream=true)
+    <- {"type": "done", "exit_code": int|null, "timed_out": bool,
+        "stdout": str, "stderr": str, "truncated": bool,
+        "duration_s": float}                                       (per job)
+
+Only the last `max_output` bytes of each stream are kept for "done". The
+forked child runs with exactly `env` as its environment (null: the worker's)
+and with the rlimits in `limits` (see sandbox.apply_limits).
+"""
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+DEFAULT_MAX_OUTPUT = 64 * 1024
+
+
+class TailBuffer:
+    """Fixed-capacity byte ring: keeps only the last `capacity` bytes written."""
+
+    def __init__(self, capacity: int = DEFAULT_MAX_OUTPUT):
+        self.capacity = capacity
+        self._buf = bytearray()
+        self.truncated = False
+
+    def write(self, data: bytes) -> None:
+        self._buf += data
+        excess = len(self._buf) - self.capacity
+        if excess > 0:
+            del self._buf[:excess]
+            self.truncated = True
+
+    def text(self) -> str:
+        return self._buf.decode("utf-8", "replace")
+
+
+class LineSplitter:
+    """
+    Turn arbitrary byte chunks into complete decoded lines. A line longer than
+    max_line bytes is cut to its first max_line bytes (truncated=True), so a
+    huge write without a newline never grows the buffer.
+    """
+
+    def __init__(self, max_line: int = DEFAULT_MAX_OUTPUT):
+        self.max_line = max_line
+        self._partial = bytearray()
+        self.truncated = False
+
+    def _append(self, piece: bytes) -> None:
+        room = self.max_line - len(self._partial)
+        if len(piece) > room:
+            piece = piece[:max(room, 0)]
+            self.truncated = True
+        self._partial += piece
+
+    def _take(self) -> str:
+        line = self._partial.decode("utf-8", "replace")
+        self._partial = bytearray()
+        return line
+
+    def feed(self, data: bytes) -> List[str]:
+        # only the new chunk is split, so feeding stays linear in the output size
+        *complete, rest = data.split(b"\n")
+        lines = []
+        for piece in complete:
+            self._append(piece)
+            lines.append(self._take())
+        self._append(rest)
+        return lines
+
+    def flush(self) -> List[str]:
+        return [self._take()] if self._partial else []
+
+
+# -----------------------------------------------------------------------------
+# Worker side
+# -----------------------------------------------------------------------------
+def _warm_imports() -> None:
+    """
+    Import pytest and run one throwaway session in-process, so plugin
+    discovery and everything pytest imports lazily is already loaded in the
+    forked children.
+    """
+    import contextlib
+    import io
+    import tempfile
+    import pytest
+
+    with tempfile.TemporaryDirectory() as td:
+        with open(os.path.join(td, "test_warmup.py"), "w") as f:
+            f.write("def test_warmup():\n    assert True\n")
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            pytest.main(["-q", "-p", "no:cacheprovider", td])
+
+
+def _run_job(job: dict, send) -> dict:
+    import select
+    import signal
+
+    started = time.monotonic()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # child
+        code = 3
+        try:
+            os.setpgid(0, 0)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            for fd in (out_r, err_r, out_w, err_w, devnull):
+                os.close(fd)
+            sys.stdout = os.fdopen(1, "w", buffering=1)
+            sys.stderr = os.fdopen(2, "w", buffering=1)
+            if job.get("env") is not None:
+                os.environ.clear()
+                os.environ.update(job["env"])
+            os.chdir(job["cwd"])
+            if job.get("limits"):
+                from sandbox import apply_limits
+                apply_limits(job["limits"])
+            # the interpreter is already running, so PYTHONPATH has to be applied by hand
+            extra = [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p and p != job["cwd"]]
+            sys.path[:0] = [job["cwd"]] + extra
+            import pytest
+            code = int(pytest.main(job["args"]))
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+    os.close(out_w)
+    os.close(err_w)
+    max_output = int(job.get("max_output", DEFAULT_MAX_OUTPUT))
+    names = {out_r: "stdout", err_r: "stderr"}
+    tails = {out_r: TailBuffer(max_output), err_r: TailBuffer(max_output)}
+    splitters = {out_r: LineSplitter(max_output), err_r: LineSplitter(max_output)} if job.get("stream") else None
+    open_fds = [out_r, err_r]
+    deadline = started + float(job.get("timeout", 10))
+    timed_out = False
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(open_fds, [], [], remaining)
+        for fd in ready:
+            data = os.read(fd, 65536)
+            if data:
+                tails[fd].write(data)
+            else:
+                open_fds.remove(fd)
+            if splitters is not None:
+                lines = splitters[fd].feed(data) if data else splitters[fd].flush()
+                for line in lines:
+                    send({"type": "line", "stream": names[fd], "line": line})
+
+    reaped = 0
+    while not timed_out:
+        # EOF on both pipes is not an exit: the test may have closed them and kept running
+        reaped, status, usage = os.wait4(pid, os.WNOHANG)
+        if reaped:
+            break
+        if time.monotonic() >= deadline:
+            timed_out = True
+        else:
+            time.sleep(0.01)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        if splitters is not None:
+            for fd in (out_r, err_r):
+                for line in splitters[fd].flush():
+                    send({"type": "line", "stream": names[fd], "line": line})
+    if not reaped:
+        _, status, usage = os.wait4(pid, 0)
+    for fd in (out_r, err_r):
+        os.close(fd)
+
+    return {
+        "type": "done",
+        "exit_code": None if timed_out else os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+        "stdout": tails[out_r].text(),
+        "stderr": tails[err_r].text(),
+        "truncated": tails[out_r].truncated or tails[err_r].truncated,
+        "duration_s": round(time.monotonic() - started, 4),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 4),
+    }
+
+
+def _worker_main() -> None:
+    started = time.monotonic()
+    _warm_imports()
+    proto = sys.stdout
+    # anything the worker itself prints must not corrupt the protocol channel
+    sys.stdout = sys.stderr
+
+    def send(msg: dict) -> None:
+        proto.write(json.dumps(msg) + "\n")
+        proto.flush()
+
+    send({"type": "ready", "startup_s": round(time.monotonic() - started, 4)})
+    for line in sys.stdin:
+        if line.strip():
+            send(_run_job(json.loads(line), send))
+
+
+# -----------------------------------------------------------------------------
+# Pool side
+# -----------------------------------------------------------------------------
+class PoolTimeout(Exception):
+    """The job exceeded its timeout and its process group was killed."""
+
+
+class _Worker:
+    def __init__(self, env: Optional[Dict[str, str]] = None):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env,
+        )
+        ready = json.loads(self.proc.stdout.readline() or "{}")
+        if ready.get("type") != "ready":
+            self.close()
+            raise RuntimeError("pytest worker failed to start")
+        self.startup_s = ready["startup_s"]
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, job: dict, on_line=None) -> dict:
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError("pytest worker exited unexpectedly")
+            msg = json.loads(line)
+            if msg["type"] == "line":
+                if on_line is not None:
+                    on_line(msg["stream"], msg["line"])
+                continue
+            self.jobs += 1
+            return msg
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+
+
+class PytestPool:
+    """
+    Thread-safe; run() blocks, so async callers should use asyncio.to_thread.
+    Workers are started lazily (or eagerly via start()), with `env` as their
+    environment (None inherits ours).
+    """
+
+    def __init__(self, size: int = 2, max_jobs: int = 50, env: Optional[Dict[str, str]] = None):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.env = env
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._waiting = 0
+        self._closed = False
+        self.jobs_run = 0
+        self.recycled = 0
+        self.startup_total_s = 0.0
+        self.startups = 0
+        self.last_startup_s = None
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(os, "fork")
+
+    def _spawn(self) -> _Worker:
+        t0 = time.monotonic()
+        worker = _Worker(self.env)
+        with self._lock:
+            self.startups += 1
+            self.last_startup_s = round(time.monotonic() - t0, 4)
+            self.startup_total_s += self.last_startup_s
+        return worker
+
+    def start(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed or self._workers >= self.size:
+                    return
+                self._workers += 1
+            try:
+                self._idle.put(self._spawn())
+            except Exception:
+                with self._lock:
+                    self._workers -= 1
+                raise
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            spawn = self._workers < self.size
+            if spawn:
+                self._workers += 1
+        if spawn:
+            try:
+                return self._spawn()
+            except Exception:
+                with self._lock:
+                    self._workers -= 1
+                raise
+        return self._idle.get()
+
+    def _checkin(self, worker: _Worker) -> None:
+        if self._closed or not worker.alive() or worker.jobs >= self.max_jobs:
+            worker.close()
+            with self._lock:
+                self._workers -= 1
+                self.recycled += 1
+            return
+        self._idle.put(worker)
+
+    def run(self, cwd: str, args: List[str], timeout: float = 10,
+            env: Optional[Dict[str, str]] = None, on_line=None,
+            max_output: int = DEFAULT_MAX_OUTPUT, limits: Optional[dict] = None) -> dict:
+        """
+        Run pytest with `args` in cwd on a warm worker. on_line(stream, line)
+        is called from this thread for every output line as it is produced.
+        Raises PoolTimeout (carrying the partial result) on timeout.
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            worker = self._checkout()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            result = worker.run({
+                "cwd": cwd, "args": args, "timeout": timeout, "env": env,
+                "stream": on_line is not None, "max_output": max_output, "limits": limits or {},
+            }, on_line)
+        except Exception:
+            worker.close()
+            raise
+        finally:
+            self._checkin(worker)
+        with self._lock:
+            self.jobs_run += 1
+        if result["timed_out"]:
+            raise PoolTimeout(result)
+        return result
+
+    def shutdown(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.close()
+            with self._lock:
+                self._workers -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "workers": self._workers,
+            "idle": self._idle.qsize(),
+            "queue_depth": self._waiting,
+            "jobs_run": self.jobs_run,
+            "recycled": self.recycled,
+            "last_startup_s": self.last_startup_s,
+            "avg_startup_s": round(self.startup_total_s / self.startups, 4) if self.startups else None,
+        }
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,90 @@
+"""
+Shared upstream rate limiter.
+
+One token bucket for requests/sec and one for model tokens/min. Every model
+call acquires from both before going upstream, so concurrent workers queue
+here instead of each running its own 429 backoff loop. A 429 halves the
+effective rate; successes slowly restore it.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Bucket:
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.level = capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float, factor: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate * factor)
+        self.stamp = now
+
+    def wait_for(self, amount: float, factor: float) -> float:
+        # never ask for more than the bucket can hold, or we'd wait forever
+        missing = min(amount, self.capacity) - self.level
+        return 0.0 if missing <= 0 else missing / (self.rate * factor)
+
+
+class RateLimiter:
+    """
+    rps / tpm <= 0 disables the corresponding bucket. The lock is a threading
+    lock and waiting happens outside it, so one limiter can be shared across
+    event loops and threads.
+    """
+
+    def __init__(self, rps: float, tpm: float, min_factor: float = 0.1, recovery: float = 1.05):
+        self._req = _Bucket(rps, max(1.0, rps)) if rps > 0 else None
+        self._tok = _Bucket(tpm / 60.0, tpm) if tpm > 0 else None
+        self.min_factor = min_factor
+        self.recovery = recovery
+        self.factor = 1.0
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.rate_limited = 0
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Consume if possible and return 0, otherwise return the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            for bucket, amount in ((self._req, 1.0), (self._tok, tokens)):
+                if bucket is not None:
+                    bucket.refill(now, self.factor)
+                    wait = max(wait, bucket.wait_for(amount, self.factor))
+            if wait > 0:
+                return wait
+            if self._req is not None:
+                self._req.level -= 1.0
+            if self._tok is not None:
+                self._tok.level -= min(tokens, self._tok.capacity)
+            return 0.0
+
+    async def acquire(self, tokens: float = 0) -> None:
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.waits += 1
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def on_rate_limited(self) -> None:
+        with self._lock:
+            self.rate_limited += 1
+            self.factor = max(self.min_factor, self.factor * 0.5)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.factor = min(1.0, self.factor * self.recovery)
+
+    def stats(self) -> dict:
+        return {
+            "factor": round(self.factor, 3),
+            "waits": self.waits,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,281 @@
+"""
+Repository-scale generation: tests for every module of a package.
+
+Modules stream through discover -> extract -> generate -> finalize -> run, and
+at most `window` of them are in flight at once, so memory stays bounded however
+large the package is. Parsing and the compile check of generated tests are CPU
+work and run in a process pool; generation is network I/O and runs
+concurrently on the event loop (still through the cache, coalescing, rate
+limiter and breaker in core). Generated tests import the real module path
+(`from pkg.sub.mod import f`) instead of `under_test`, and run with the
+package's import root on sys.path.
+
+Results are written as each module finishes: one JSON line per module in
+report.jsonl, one <testsuite> per module appended to junit.xml, and totals in
+summary.json once everything is done.
+"""
+import ast
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from validate import retarget_imports
+
+SKIP_DIRS = frozenset({"tests", "test", "__pycache__", "build", "dist", "node_modules",
+                       "venv", ".venv", "env", "site-packages"})
+# importing these runs a script, not a library module
+SKIP_FILES = frozenset({"setup.py", "conftest.py", "__main__.py"})
+OUTPUT_TAIL_CHARS = 4000
+
+
+def import_root(package_dir: str) -> Tuple[Path, str]:
+    """
+    (directory to put on sys.path, dotted prefix of modules under package_dir).
+    A directory with __init__.py is a package imported from its parent;
+    anything else is treated as a source root.
+    """
+    path = Path(package_dir).resolve()
+    if (path / "__init__.py").is_file():
+        return path.parent, path.name
+    return path, ""
+
+
+def _is_test_file(name: str) -> bool:
+    return name.startswith("test_") or name.endswith("_test.py") or name in SKIP_FILES
+
+
+def discover(package_dir: str) -> Iterator[Tuple[Path, str]]:
+    """
+    Yield (path, dotted module name) for every importable module below
+    package_dir, lazily and in a stable order. Test files, hidden directories,
+    caches and virtualenvs are skipped.
+    """
+    _, prefix = import_root(package_dir)
+    base = Path(package_dir).resolve()
+
+    def walk(directory: Path, parts: Tuple[str, ...]) -> Iterator[Tuple[Path, str]]:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".py") and not _is_test_file(entry.name):
+                stem = entry.name[:-3]
+                if not stem.isidentifier():
+                    continue
+                names = parts if stem == "__init__" else parts + (stem,)
+                if names:
+                    yield Path(entry.path), ".".join(names)
+        for entry in entries:
+            if entry.is_dir() and not entry.name.startswith(".") and entry.name not in SKIP_DIRS \
+                    and entry.name.isidentifier():
+                yield from walk(Path(entry.path), parts + (entry.name,))
+
+    yield from walk(base, (prefix,) if prefix else ())
+
+
+# -- process-pool stages (module-level so they pickle) -------------------------
+def extract_module(path: str, module: str) -> dict:
+    """Read and parse one module; returns its code and public symbols, or the error."""
+    from core import detect_symbols  # imported in the worker; parsing is what costs here
+
+    try:
+        code = Path(path).read_text(encoding="utf-8")
+        ast.parse(code, filename=path)
+    except (OSError, UnicodeDecodeError, SyntaxError, ValueError) as e:
+        return {"module": module, "path": path, "code": "", "symbols": [], "error": f"{type(e).__name__}: {e}"}
+    return {"module": module, "path": path, "code": code, "symbols": detect_symbols(code), "error": None}
+
+
+def finalize_tests(text: str, module: str) -> dict:
+    """Point validated tests at the real module and make sure they still compile."""
+    try:
+        text = retarget_imports(text, module)
+        compile(text, f"test_{module}.py", "exec")
+    except SyntaxError as e:
+        return {"text": text, "error": f"SyntaxError: {e}"}
+    return {"text": text, "error": None}
+
+
+def _executor(procs: int) -> concurrent.futures.ProcessPoolExecutor:
+    # spawn: forking a process that already runs threads (the pytest pool, asyncio) is unsafe
+    return concurrent.futures.ProcessPoolExecutor(max_workers=procs, mp_context=multiprocessing.get_context("spawn"))
+
+
+class ReportWriter:
+    """
+    Incremental report: report.jsonl and junit.xml grow one module at a time
+    and nothing but the running totals is kept in memory.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self._jsonl = open(out_dir / "report.jsonl", "w", encoding="utf-8")
+        self._junit = open(out_dir / "junit.xml", "w", encoding="utf-8")
+        self._junit.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites name="spec2test-repo">\n')
+        self.totals = {"modules": 0, "modules_failed": 0, "symbols": 0, "generated": 0, "generation_errors": 0,
+                       "tests": 0, "passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+        self._started = time.monotonic()
+
+    def add(self, record: dict, suite: ET.Element) -> None:
+        t = self.totals
+        t["modules"] += 1
+        t["modules_failed"] += bool(record["error"] or (record["run"] or {}).get("exit_code") not in (None, 0, 5))
+        t["symbols"] += len(record["symbols"])
+        t["generated"] += sum(1 for s in record["symbols"] if s["error"] is None)
+        t["generation_errors"] += sum(1 for s in record["symbols"] if s["error"] is not None)
+        for key in ("tests", "passed", "failed", "errors", "skipped"):
+            t[key] += (record["run"] or {}).get(key, 0)
+        self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+        self._junit.write(ET.tostring(suite, encoding="unicode") + "\n")
+        self._junit.flush()
+
+    def close(self) -> dict:
+        self._junit.write("</testsuites>\n")
+        self._junit.close()
+        self._jsonl.close()
+        summary = {**self.totals, "duration_s": round(time.monotonic() - self._started, 3)}
+        (self.out_dir / "summary.json").write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+        return summary
+
+
+def _suite(record: dict, junit_path: Optional[Path]) -> ET.Element:
+    """
+    The module's <testsuite>: pytest's own when it ran, plus one synthesized
+    case per symbol whose tests could not be generated (skipped when nothing ran).
+    """
+    suite = None
+    if junit_path is not None and junit_path.is_file():
+        try:
+            parsed = ET.parse(junit_path).getroot()
+            suite = parsed if parsed.tag == "testsuite" else parsed.find("testsuite")
+        except ET.ParseError:
+            pass
+    ran = suite is not None
+    if suite is None:
+        suite = ET.Element("testsuite", tests="0", errors="0", failures="0", skipped="0")
+    suite.set("name", record["module"])
+
+    # a module that does not parse is one error; one without public symbols is an empty suite
+    cases = [{"symbol": "<module>", "error": record["error"]}] if record["error"] else record["symbols"]
+    for s in cases:
+        if ran and s["error"] is None:
+            continue
+        case = ET.SubElement(suite, "testcase", classname=record["module"], name=f"generate[{s['symbol']}]")
+        if s["error"]:
+            ET.SubElement(case, "error", message=s["error"])
+            counter = "errors"
+        else:
+            ET.SubElement(case, "skipped", message="test run disabled")
+            counter = "skipped"
+        for attr in ("tests", counter):
+            suite.set(attr, str(int(suite.get(attr, "0")) + 1))
+    return suite
+
+
+def _run_counts(res: dict) -> dict:
+    from core import parse_outcomes
+
+    outcomes = parse_outcomes(res["stdout"]).values()
+    count = lambda *kinds: sum(1 for o in outcomes if o in kinds)  # noqa: E731
+    run = {"exit_code": res["exit_code"], "timed_out": res["timed_out"], "limit": res["limit"],
+           "duration_s": res["duration_s"], "tests": len(outcomes), "passed": count("passed", "xfail"),
+           "failed": count("failed", "xpass"), "errors": count("error"), "skipped": count("skipped")}
+    if res["exit_code"] not in (0, 5):
+        run["output"] = (res["stdout"] + res["stderr"])[-OUTPUT_TAIL_CHARS:]
+    return run
+
+
+async def run_repo(package_dir: str, spec: str = "n/a", out_dir: str = "tests/generated/repo",
+                   size: str = "std", concurrency: int = 4, procs: Optional[int] = None, window: int = 8,
+                   timeout: float = 60, run: bool = False) -> dict:
+    """
+    Generate (and with run=True execute) tests for every module of package_dir.
+    Test files land in out_dir/<module path>/test_<symbol>.py next to the
+    reports. Returns the summary; per-module failures are reported, not raised.
+    """
+    import core
+
+    root, _ = import_root(package_dir)
+    out = Path(out_dir)
+    writer = ReportWriter(out)
+    loop = asyncio.get_running_loop()
+    pool = _executor(procs or os.cpu_count() or 1)
+    gen_slots = asyncio.Semaphore(concurrency)
+    window_slots = asyncio.Semaphore(window)
+
+    async def generate(module: dict, symbol: str) -> dict:
+        name = core._tests_file_name(symbol)
+        try:
+            async with gen_slots:
+                tests_py = await core._gen_tests_text(symbol, spec, module["code"], size=size)
+            done = await loop.run_in_executor(pool, finalize_tests, tests_py, module["module"])
+        except core.GenerationError as e:
+            return {"symbol": symbol, "file": None, "error": str(e.detail)}
+        except Exception as e:
+            # SDK/transport errors fail this symbol only; its siblings are still awaited and written
+            return {"symbol": symbol, "file": None, "error": f"{type(e).__name__}: {e}"}
+        return {"symbol": symbol, "file": name, "error": done["error"], "text": done["text"]}
+
+    async def build(path: Path, module_name: str, record: dict) -> ET.Element:
+        module = await loop.run_in_executor(pool, extract_module, str(path), module_name)
+        record["error"] = module["error"]
+        symbols = list(await asyncio.gather(*(generate(module, s) for s in module["symbols"])))
+        record["symbols"] = [{k: v for k, v in s.items() if k != "text"} for s in symbols]
+        written = [s for s in symbols if s["error"] is None]
+        if not written:
+            return _suite(record, None)
+        dest = out.joinpath(*module_name.split("."))
+        ws = core._workspaces.create()
+        try:
+            for s in written:
+                ws.write_test(s["file"], s["text"])
+                dest.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(ws.tests_dir / s["file"], dest / s["file"])
+            junit_path = None
+            if run:
+                junit_path = ws.path / "junit.xml"
+                res = await core._exec_pytest(
+                    str(ws.path),
+                    ["-q", "-rA", "-p", "no:cacheprovider", f"--junitxml={junit_path}", "tests"],
+                    timeout=timeout, pythonpath=str(root),
+                )
+                record["run"] = _run_counts(res)
+            return _suite(record, junit_path)
+        finally:
+            ws.close()
+
+    async def process(path: Path, module_name: str) -> None:
+        record = {"module": module_name, "path": str(path), "error": None, "run": None, "symbols": []}
+        try:
+            try:
+                suite = await build(path, module_name, record)
+            except Exception as e:
+                # a busy runner (503), a broken worker pool or an I/O error fails this module only
+                record["error"] = f"{type(e).__name__}: {getattr(e, 'detail', e)}"
+                suite = _suite(record, None)
+            writer.add(record, suite)
+        finally:
+            window_slots.release()
+
+    tasks = set()
+    try:
+        for path, module_name in discover(package_dir):
+            await window_slots.acquire()
+            task = asyncio.create_task(process(path, module_name))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return writer.close()
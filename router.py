@@ -0,0 +1,106 @@
+"""
+Complexity-based model routing.
+
+Each target symbol is scored from its AST: node count, branches, parameters,
+and methods for a class. The size preset then scales the threshold. Targets
+at or under the threshold go to a smaller, faster model first; core escalates
+to the default model when that answer fails extraction, validation or the
+optional run check. Every decision and its outcome is counted (with the score
+and latency), so the threshold can be tuned from /health or /metrics.
+"""
+import ast
+import threading
+from typing import Dict, Optional
+
+from context import _find
+
+# how much more (or less) complexity each size preset lets through to the cheap model
+SIZE_FACTORS = {"mini": 1.5, "std": 1.0, "max": 0.5}
+
+_BRANCHES = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+             ast.BoolOp, ast.comprehension, ast.Match, ast.Raise)
+
+
+def complexity(code: str, symbol: str) -> Optional[dict]:
+    """
+    Features and score of `symbol` ("name", "Class" or "Class.method") in
+    code, or None when the code does not parse or the symbol is not found.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    top, method = _find(tree, symbol)
+    target = method or top
+    if target is None:
+        return None
+    nodes = sum(1 for _ in ast.walk(target))
+    branches = sum(1 for n in ast.walk(target) if isinstance(n, _BRANCHES))
+    functions = [n for n in ast.walk(target) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    params = max((len(f.args.posonlyargs) + len(f.args.args) + len(f.args.kwonlyargs)
+                  - (1 if f.args.args and f.args.args[0].arg in ("self", "cls") else 0) for f in functions), default=0)
+    methods = sum(1 for n in target.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))) \
+        if isinstance(target, ast.ClassDef) else 0
+    lines = target.end_lineno - target.lineno + 1
+    score = nodes / 10 + 2 * branches + params + 3 * methods
+    return {"score": round(score, 2), "nodes": nodes, "branches": branches, "params": params,
+            "methods": methods, "lines": lines}
+
+
+class Router:
+    """Picks "cheap" or "default" per target and keeps accept/escalation stats per tier."""
+
+    def __init__(self, cheap_model: str, max_score: float = 20, enabled: bool = True):
+        self.cheap_model = cheap_model
+        self.max_score = max_score
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.decisions: Dict[str, int] = {"cheap": 0, "default": 0}
+        self.outcomes: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {"cheap": 0.0, "default": 0.0}
+
+    def threshold(self, size: str) -> float:
+        return self.max_score * SIZE_FACTORS.get(size, 1.0)
+
+    def _choose(self, code: str, symbol: str, size: str):
+        features = complexity(code, symbol) if self.enabled else None
+        if not self.enabled:
+            return "default", "disabled", features
+        if features is None:
+            return "default", "unknown_target", features
+        if features["score"] <= self.threshold(size):
+            return "cheap", "simple", features
+        return "default", "complex", features
+
+    def decide(self, code: str, symbol: str, size: str = "std") -> dict:
+        """{"tier", "reason", "complexity"}: cheap only for a target known to be simple enough."""
+        tier, reason, features = self._choose(code, symbol, size)
+        with self._lock:
+            self.decisions[tier] += 1
+        return {"tier": tier, "reason": reason, "complexity": features}
+
+    def serving_key(self, code: str, symbol: str, size: str = "std") -> str:
+        """The tier (and cheap model) decide() would pick, without counting it; part of cache keys."""
+        tier, _, _ = self._choose(code, symbol, size)
+        return f"cheap:{self.cheap_model}" if tier == "cheap" else "default"
+
+    def record(self, tier: str, result: str, seconds: float) -> None:
+        """result: "accepted" or "escalated_<why>" for cheap, "accepted" / "failed" for default."""
+        with self._lock:
+            key = f"{tier}:{result}"
+            self.outcomes[key] = self.outcomes.get(key, 0) + 1
+            self._seconds[tier] = self._seconds.get(tier, 0.0) + seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            cheap_tried = sum(v for k, v in self.outcomes.items() if k.startswith("cheap:"))
+            accepted = self.outcomes.get("cheap:accepted", 0)
+            per_tier = {tier: sum(v for k, v in self.outcomes.items() if k.startswith(tier + ":"))
+                        for tier in self._seconds}
+            return {
+                "enabled": self.enabled, "cheap_model": self.cheap_model, "max_score": self.max_score,
+                "decisions": dict(self.decisions), "outcomes": dict(self.outcomes),
+                "cheap_accept_rate": round(accepted / cheap_tried, 4) if cheap_tried else None,
+                "avg_seconds": {tier: round(self._seconds[tier] / n, 4) if n else None
+                                for tier, n in per_tier.items()},
+            }
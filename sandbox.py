@@ -0,0 +1,243 @@
+"""
+Resource limits, a scrubbed environment and admission control for test runs.
+
+Generated tests are untrusted code. Every run gets:
+  * rlimits, applied in the child just before pytest starts: CPU seconds,
+    address space, open files, size of files written, and how many more
+    processes it may create;
+  * an environment rebuilt from a short allowlist. API keys and other secrets
+    in the server's environment never reach the tests;
+  * a slot from a global AdmissionController sized by cores and memory. Runs
+    beyond that wait in FIFO order instead of all competing at once.
+
+classify() turns the raw outcome (signal, timeout, resource errors in the
+output) into a `limit` field, so callers can report which limit was hit.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import os
+import re
+import signal
+import threading
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows; runs there are unlimited
+    resource = None
+
+# variables tests may legitimately need (locale, timezone, executable lookup)
+ENV_ALLOWLIST = ("PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ", "SYSTEMROOT")
+
+
+class Limits:
+    """Per-run resource limits; 0 disables a limit."""
+
+    def __init__(self, cpu_seconds: int = 10, memory_mb: int = 1024, open_files: int = 256,
+                 file_size_mb: int = 64, processes: int = 32):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.open_files = open_files
+        self.file_size_mb = file_size_mb
+        self.processes = processes
+
+    @classmethod
+    def from_env(cls) -> "Limits":
+        return cls(
+            cpu_seconds=int(os.getenv("RUN_CPU_SECONDS", "10")),
+            memory_mb=int(os.getenv("RUN_MEMORY_MB", "1024")),
+            open_files=int(os.getenv("RUN_MAX_OPEN_FILES", "256")),
+            file_size_mb=int(os.getenv("RUN_MAX_FILE_MB", "64")),
+            processes=int(os.getenv("RUN_MAX_PROCESSES", "32")),
+        )
+
+    def as_dict(self) -> dict:
+        return {"cpu_seconds": self.cpu_seconds, "memory_mb": self.memory_mb, "open_files": self.open_files,
+                "file_size_mb": self.file_size_mb, "processes": self.processes}
+
+
+def _user_processes() -> int:
+    """Processes currently owned by this uid (Linux); RLIMIT_NPROC counts them all."""
+    uid = os.getuid()
+    count = 0
+    try:
+        for entry in os.scandir("/proc"):
+            if entry.name.isdigit():
+                try:
+                    if entry.stat().st_uid == uid:
+                        count += 1
+                except OSError:
+                    pass
+    except OSError:
+        return 0
+    return count
+
+
+def apply_limits(limits: dict) -> None:
+    """
+    Set rlimits on the current process (call in the child, before pytest).
+    `limits` is Limits.as_dict(), so it can cross the pool's JSON protocol.
+    """
+    if resource is None:
+        return
+
+    def cap(which, value):
+        _, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(which, (value, value))
+
+    if limits.get("cpu_seconds"):
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = limits["cpu_seconds"]
+        # SIGXCPU at the soft limit, SIGKILL one second later if it is ignored
+        new_hard = soft + 1 if hard == resource.RLIM_INFINITY else min(soft + 1, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (min(soft, new_hard), new_hard))
+    if limits.get("memory_mb"):
+        cap(resource.RLIMIT_AS, limits["memory_mb"] * 1024 * 1024)
+    if limits.get("open_files"):
+        cap(resource.RLIMIT_NOFILE, limits["open_files"])
+    if limits.get("file_size_mb"):
+        cap(resource.RLIMIT_FSIZE, limits["file_size_mb"] * 1024 * 1024)
+    if limits.get("processes") and hasattr(resource, "RLIMIT_NPROC"):
+        # per-user limit: allow `processes` more than the user already has (root ignores it)
+        cap(resource.RLIMIT_NPROC, _user_processes() + limits["processes"])
+
+
+def scrubbed_env(workdir: str, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """The only environment a test run sees: the allowlist, plus HOME/TMPDIR inside the workspace."""
+    env = {name: os.environ[name] for name in ENV_ALLOWLIST if name in os.environ}
+    env.setdefault("PATH", os.defpath)
+    env.update({
+        "HOME": workdir,
+        "TMPDIR": workdir,
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "PYTHONHASHSEED": "0",
+    })
+    env.update(extra or {})
+    return env
+
+
+_SIGNAL_LIMITS = {
+    getattr(signal, "SIGXCPU", None): "cpu",
+    getattr(signal, "SIGXFSZ", None): "file_size",
+}
+_OUTPUT_LIMITS = (
+    # only an uncaught MemoryError: the traceback's last line, or pytest's "E   MemoryError"
+    (re.compile(r"^(?:E\s+)?MemoryError\b", re.MULTILINE), "memory"),
+    (re.compile(r"\[Errno 24\]|Too many open files"), "open_files"),
+    (re.compile(r"\[Errno 11\] Resource temporarily unavailable|BlockingIOError.*fork"), "processes"),
+    (re.compile(r"\[Errno 27\]|File too large"), "file_size"),
+)
+
+
+def classify(result: dict, limits: Optional[dict] = None) -> dict:
+    """
+    Add `limit` (None, "wall_time", "cpu", "memory", "open_files", "processes"
+    or "file_size") and `signal` (the signal that killed pytest, if any) to a
+    run result. A SIGKILL counts as "cpu" only when the result's `cpu_s` shows
+    the run used up limits["cpu_seconds"]; any other SIGKILL has no limit.
+    """
+    code = result.get("exit_code")
+    sig = -code if isinstance(code, int) and code < 0 else None
+    cpu_seconds = (limits or {}).get("cpu_seconds")
+    cpu_used = result.get("cpu_s")
+    if result.get("timed_out"):
+        limit = "wall_time"
+    elif sig is not None and sig in _SIGNAL_LIMITS:
+        limit = _SIGNAL_LIMITS[sig]
+    elif sig == signal.SIGKILL:
+        # the hard CPU limit kills with SIGKILL; so can the OOM killer or anyone else
+        limit = "cpu" if cpu_seconds and cpu_used is not None and cpu_used >= cpu_seconds else None
+    else:
+        limit = None
+        if code:
+            output = result.get("stdout", "") + result.get("stderr", "")
+            limit = next((name for pattern, name in _OUTPUT_LIMITS if pattern.search(output)), None)
+    return {**result, "limit": limit, "signal": sig}
+
+
+def _available_memory_mb() -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_slots(limits: Limits) -> int:
+    """Concurrent runs the machine can take: one per core, and no more than memory allows at memory_mb each."""
+    slots = os.cpu_count() or 1
+    memory = _available_memory_mb()
+    if memory and limits.memory_mb:
+        slots = min(slots, memory // limits.memory_mb)
+    return max(1, slots)
+
+
+class AdmissionTimeout(Exception):
+    """No run slot became free within the admission timeout."""
+
+
+class AdmissionController:
+    """
+    At most `slots` concurrent runs; the rest wait in FIFO order. Waiters are
+    concurrent.futures.Futures, so callers may be on any event loop or thread.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: "collections.deque[concurrent.futures.Future]" = collections.deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            if self._active < self.slots and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                return
+            fut = concurrent.futures.Future()
+            self._waiters.append(fut)
+            self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), timeout)
+        except BaseException as e:
+            with self._lock:
+                granted = fut.done()
+                if not granted:
+                    self._waiters.remove(fut)
+                    fut.cancel()
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.rejected += 1
+            if granted:
+                self.release()  # the slot arrived as we gave up; pass it on
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionTimeout(f"no run slot free within {timeout}s") from None
+            raise
+        with self._lock:
+            self.admitted += 1
+
+    def release(self) -> None:
+        with self._lock:
+            # hand the slot straight to the next waiter, so _active never dips
+            while self._waiters:
+                fut = self._waiters.popleft()
+                if fut.set_running_or_notify_cancel():
+                    fut.set_result(True)
+                    return
+            self._active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"slots": self.slots, "active": self._active, "waiting": len(self._waiters),
+                    "admitted": self.admitted, "queued": self.queued, "rejected": self.rejected}
@@ -0,0 +1,89 @@
+"""
+Single-flight deduplication of identical in-flight calls.
+
+The first caller for a key runs the call; callers that arrive while it is in
+flight wait for the same result instead of starting their own. Results are
+handed over through a concurrent.futures.Future, so waiters may sit on other
+event loops or threads. A waiter that times out or is cancelled only gives up
+its own wait; if the leader itself is cancelled, the waiters start over and one
+of them becomes the new leader.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """The caller running the shared call went away before it finished."""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+        self._waiting = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable], timeout: Optional[float] = None) -> Tuple[object, bool]:
+        """
+        Run fn() for key, or wait (up to timeout seconds) for the identical call
+        already in flight. Returns (result, shared); errors are shared as well.
+        Raises asyncio.TimeoutError when a waiter times out.
+        """
+        while True:
+            with self._lock:
+                fut = self._calls.get(key)
+                leader = fut is None
+                if leader:
+                    fut = self._calls[key] = concurrent.futures.Future()
+                else:
+                    self.coalesced += 1
+                    self._waiting += 1
+            if leader:
+                return await self._lead(key, fut, fn), False
+
+            inner = asyncio.wrap_future(fut)
+            try:
+                # shield: a waiter timing out or being cancelled must not cancel the shared call
+                return await asyncio.wait_for(asyncio.shield(inner), timeout), True
+            except _LeaderCancelled:
+                continue
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+                if not inner.done():
+                    inner.add_done_callback(_consume)
+
+    async def _lead(self, key: str, fut: concurrent.futures.Future, fn: Callable[[], Awaitable]):
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                if self._calls.get(key) is fut:
+                    del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "waiting": self._waiting,
+                    "coalesced": self.coalesced, "timeouts": self.timeouts}
+
+
+def _consume(f: asyncio.Future) -> None:
+    # nobody awaits an abandoned wait any more; retrieve its outcome so asyncio doesn't warn
+    if not f.cancelled():
+        f.exception()
@@ -1,4 +1,20 @@
 import sys, pathlib
+
+import pytest
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
\ No newline at end of file
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _state_in_tmp_path(monkeypatch, tmp_path):
+    """
+    The caches, job queue and artifact store default to .cache/ under the cwd;
+    point them at tmp_path so tests that never chdir don't write into the repo.
+    """
+    state = tmp_path / ".cache"
+    monkeypatch.setenv("GEN_CACHE_PATH", str(state / "gen_cache.sqlite3"))
+    monkeypatch.setenv("RUN_CACHE_PATH", str(state / "run_cache.sqlite3"))
+    monkeypatch.setenv("JOBS_PATH", str(state / "jobs.sqlite3"))
+    monkeypatch.setenv("ARTIFACTS_PATH", str(state / "artifacts"))
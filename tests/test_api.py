@@ -11,7 +11,8 @@ def client_stub(monkeypatch):
     monkeypatch.setenv("STUB_GEN", "1")
     monkeypatch.delenv("MISTRAL_API_KEY", raising=False)
 
-    import main  
+    import core, main
+    importlib.reload(core)
     importlib.reload(main)
     return TestClient(main.app)
 
@@ -25,7 +26,8 @@ def client_with_run(monkeypatch):
     monkeypatch.setenv("ENABLE_RUN", "1")
     monkeypatch.setenv("RUN_ENABLED", "1") 
 
-    import main  
+    import core, main
+    importlib.reload(core)
     importlib.reload(main)
     return TestClient(main.app)
 
@@ -38,6 +40,7 @@ def test_health(client_stub):
     body = r.json()
     assert body.get("ok") is True
     assert "model" in body and "fallback" in body
+    assert "cwd" not in body and len(body["cwd_hash"]) == 64  # the working directory is not disclosed
 
 
 def test_bundle_generate_and_save_ok(client_stub, monkeypatch, tmp_path):
@@ -60,6 +63,10 @@ def test_bundle_generate_and_save_ok(client_stub, monkeypatch, tmp_path):
         assert k in data
     assert (tmp_path / data["code_path"]).exists()
     assert (tmp_path / data["tests_path"]).exists()
+    # published by default: the files land in the server's working directory
+    assert data["tests_path"] == "tests/generated/test_power.py" and data["files"] == {}
+    assert "from under_test import power" in (tmp_path / "tests" / "generated" / "test_power.py").read_text()
+    assert (tmp_path / "under_test.py").read_text() == payload["code"]
 
 
 def test_bundle_generate_run_disabled(client_stub, monkeypatch, tmp_path):
@@ -112,3 +119,755 @@ def test_generate_tests_plain_text(client_stub, monkeypatch, tmp_path):
     assert r.headers.get("content-type", "").startswith("text/plain")
     body = r.text
     assert "def test" in body or "pytest" in body.lower()
+
+
+def test_generation_cache_hits_and_bypass(client_stub, monkeypatch, tmp_path):
+    """
+    Repeated submissions are served from the cache; a comment-only edit still hits,
+    and no_cache forces a fresh generation.
+    """
+    monkeypatch.chdir(tmp_path)
+    payload = {
+        "code": "def power(a,b):\n    return a ** b\n",
+        "spec": "Only ints/floats.",
+        "symbol": "power",
+    }
+    assert client_stub.post("/tests/generate.txt", json=payload).status_code == 200
+    edited = {**payload, "code": "# comment\ndef power(a, b):\n\n    return a ** b  # pow\n"}
+    assert client_stub.post("/tests/generate.txt", json=edited).status_code == 200
+    assert client_stub.post("/tests/generate.txt", json={**payload, "no_cache": True}).status_code == 200
+
+    stats = client_stub.get("/health").json()["cache"]
+    assert stats["hits_memory"] + stats["hits_disk"] == 1
+    assert stats["misses"] == 1
+
+
+def test_call_with_retries_uses_async_backoff(client_stub, monkeypatch):
+    """
+    429s are retried with asyncio.sleep (never blocking the loop) on the shared async client.
+    """
+    import asyncio
+    import core
+
+    calls, sleeps = [], []
+
+    class FakeChat:
+        async def complete_async(self, model, **kwargs):
+            calls.append(model)
+            if len(calls) < 3:
+                raise Exception("Status 429: rate limit exceeded")
+            return "ok"
+
+    class FakeClient:
+        chat = FakeChat()
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(core, "client", FakeClient())
+    monkeypatch.setattr(core.asyncio, "sleep", fake_sleep)
+
+    assert asyncio.run(core._call_with_retries("m", messages=[])) == "ok"
+    assert calls == ["m", "m", "m"]
+    assert len(sleeps) == 2
+
+
+def test_generate_batch_reports_partial_failures(client_stub, monkeypatch, tmp_path):
+    """
+    A batch returns one result per item; an undetectable symbol fails only its own item.
+    """
+    monkeypatch.chdir(tmp_path)
+    payload = {
+        "items": [
+            {"code": "def power(a,b):\n    return a ** b\n", "spec": "ints", "module_path": "pkg_a/under_test.py"},
+            {"code": "x = 1\n", "spec": "n/a", "module_path": "pkg_b/under_test.py"},
+        ],
+        "concurrency": 2,
+    }
+    r = client_stub.post("/bundle/generate-batch", json=payload)
+    assert r.status_code == 200
+    data = r.json()
+    assert (data["succeeded"], data["failed"]) == (1, 1)
+    ok, bad = data["results"]
+    assert ok["ok"] and ok["result"]["symbol"] == "power"
+    assert not bad["ok"] and bad["status_code"] == 400
+
+
+def test_detect_symbols_includes_async_and_methods():
+    import core
+    code = (
+        "async def fetch(x):\n    return x\n\n"
+        "def _private():\n    pass\n\n"
+        "class Calc:\n"
+        "    def __init__(self):\n        pass\n"
+        "    def add(self, a, b):\n        return a + b\n"
+        "    async def _hidden(self):\n        pass\n"
+    )
+    assert core.detect_symbol_name(code) == "fetch"
+    assert core.detect_symbols(code) == ["fetch", "Calc", "Calc.add"]
+
+
+def test_generate_all_symbols_keeps_sibling_files(client_stub, monkeypatch, tmp_path):
+    """
+    all_symbols writes one file per symbol, and cleanup_old only removes files this module
+    published earlier for symbols it no longer has (files it never indexed are left alone).
+    """
+    monkeypatch.chdir(tmp_path)
+    other = tmp_path / "tests" / "generated" / "test_other.py"
+    other.parent.mkdir(parents=True)
+    other.write_text("")
+
+    payload = {
+        "code": "def power(a,b):\n    return a ** b\n\ndef stale(a):\n    return a\n",
+        "spec": "ints only",
+        "all_symbols": True,
+        "cleanup_old": True,
+    }
+    assert client_stub.post("/bundle/generate-and-save", json=payload).status_code == 200
+    payload["code"] = "def power(a,b):\n    return a ** b\n\ndef mult(a,b):\n    return a * b\n"
+    r = client_stub.post("/bundle/generate-and-save", json=payload)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["symbols"] == ["power", "mult"]
+    names = sorted(p.name for p in (tmp_path / "tests" / "generated").glob("test_*.py"))
+    assert names == ["test_mult.py", "test_other.py", "test_power.py"]
+
+
+def test_marker_scanner_matches_extract_between_for_any_chunking():
+    import core
+    text = (
+        "chatter <<<PYTEST_START>>>\n  import pytest\n\ndef test_x():\n    assert 1 == 1\n  \n"
+        "<<<PYTEST_END>>> trailing tokens that should never be forwarded"
+    )
+    expected = core._extract_between(text, "<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+    for size in (1, 2, 3, 7, 16, len(text)):
+        scanner = core._MarkerScanner("<<<PYTEST_START>>>", "<<<PYTEST_END>>>")
+        out = "".join(scanner.feed(text[i:i + size]) for i in range(0, len(text), size))
+        scanner.finish()
+        assert out == expected
+
+
+def test_generate_tests_stream(client_stub, monkeypatch, tmp_path):
+    """
+    /tests/generate.stream returns the same body as /tests/generate.txt, chunked.
+    """
+    monkeypatch.chdir(tmp_path)
+    payload = {"code": "def power(a,b):\n    return a ** b\n", "spec": "ints", "symbol": "power"}
+    r = client_stub.post("/tests/generate.stream", json=payload)
+    assert r.status_code == 200
+    assert r.headers.get("content-type", "").startswith("text/plain")
+    assert "ignored trailing text" not in r.text
+    assert r.text == client_stub.post("/tests/generate.txt", json=payload).text
+
+
+def test_stream_closes_upstream_at_end_marker(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+
+    pieces = ["<<<PYTEST_", "START>>>\nfrom under_test import f\n", "def test_f():\n    assert f()\n<<<PYT",
+              "EST_END>>>", "never read"]
+    seen = []
+
+    class FakeEvents:
+        closed = False
+
+        def __aiter__(self):
+            return self._gen()
+
+        async def _gen(self):
+            for p in pieces:
+                seen.append(p)
+                yield SimpleNamespace(data=SimpleNamespace(
+                    choices=[SimpleNamespace(delta=SimpleNamespace(content=p))]))
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            FakeEvents.closed = True
+
+    class FakeChat:
+        async def stream_async(self, model, **kwargs):
+            return FakeEvents()
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "client", SimpleNamespace(chat=FakeChat()))
+
+    async def collect():
+        return "".join([c async for c in core._stream_tests_text("f", "spec", "def f(): return 1\n", no_cache=True)])
+
+    assert asyncio.run(collect()) == "from under_test import f\ndef test_f():\n    assert f()"
+    assert "never read" not in seen
+    assert FakeEvents.closed
+
+
+def test_generate_run_stream_emits_lines_tests_and_summary(client_with_run, monkeypatch, tmp_path):
+    import json
+
+    monkeypatch.chdir(tmp_path)
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints", "symbol": "power"}
+    r = client_with_run.post("/bundle/generate-run/stream", json=payload)
+    assert r.status_code == 200
+    events = [json.loads(line) for line in r.text.splitlines() if line]
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "generated" and kinds[-1] == "summary"
+    assert "line" in kinds
+    assert {"event": "test", "nodeid": "tests/test_power.py::test_power[2-3-6]", "outcome": "passed"} in events
+    summary = events[-1]
+    assert summary["exit_code"] == 0 and not summary["timed_out"]
+    assert summary["counts"] == {"passed": 1}
+
+
+def test_generate_run_stream_drops_events_for_a_slow_client(client_with_run, monkeypatch, tmp_path):
+    """
+    With room for a single pending event, line/test events are dropped rather
+    than queued; the summary still arrives last with exact counts.
+    """
+    import json
+    import core
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "STREAM_MAX_PENDING_EVENTS", 1)
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints", "symbol": "power"}
+    r = client_with_run.post("/bundle/generate-run/stream", json=payload)
+    events = [json.loads(line) for line in r.text.splitlines() if line]
+    summary = events[-1]
+    assert summary["event"] == "summary" and summary["exit_code"] == 0
+    assert summary["counts"] == {"passed": 1}
+    streamed = sum(1 for e in events if e["event"] in ("line", "test"))
+    assert streamed >= 1 and summary["dropped_events"] >= 0
+
+
+def test_run_output_is_bounded_and_partial_on_timeout(client_stub, monkeypatch, tmp_path):
+    """
+    Output is kept in a fixed-size tail, and a timeout returns what ran so far
+    instead of raising (cold subprocess path).
+    """
+    import asyncio
+    import core
+
+    monkeypatch.setattr(core, "_pytest_pool", None)
+    monkeypatch.setattr(core, "RUN_OUTPUT_MAX_BYTES", 512)
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_a.py").write_text(
+        "import time\n"
+        "def test_noisy():\n    print('x' * 10000)\n    assert False\n"
+        "def test_slow():\n    time.sleep(30)\n"
+    )
+    lines = []
+    res = asyncio.run(core._exec_pytest(str(tmp_path), ["-v", "-s", "tests"], timeout=3,
+                                        on_line=lambda stream, line: lines.append(line)))
+    assert res["timed_out"] and res["exit_code"] is None
+    assert len(res["stdout"].encode()) <= 512 and res["truncated"]
+    assert any("test_noisy" in line for line in lines) and any("FAILED" in line for line in lines)
+    assert max(len(line.encode()) for line in lines) <= 512  # the 10000-char print is cut, not buffered
+
+
+def test_generate_run_unpublished_stays_in_workspace(client_with_run, monkeypatch, tmp_path):
+    """
+    publish=false runs in an isolated workspace and leaves the cwd untouched.
+    """
+    import core
+    from workspace import WorkspaceManager
+
+    cwd = tmp_path / "cwd"
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+    monkeypatch.setattr(core, "_workspaces", WorkspaceManager(str(tmp_path / "ws")))
+
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints", "publish": False}
+    r = client_with_run.post("/bundle/generate-run", json=payload)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["exit_code"] == 0
+    assert not (cwd / "under_test.py").exists() and not (cwd / "tests").exists()
+    # the workspace is removed with the request; its files come back inline
+    assert data["tests_path"] == "tests/test_power.py"
+    assert "from under_test import power" in data["files"]["tests/test_power.py"]
+    assert data["files"]["under_test.py"] == payload["code"]
+    assert list((tmp_path / "ws").iterdir()) == [] and core._workspaces.stats()["active"] == 0
+
+
+def test_incremental_only_regenerates_changed_symbols(client_stub, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    code = "def power(a,b):\n    return a ** b\n\ndef mult(a,b):\n    return a * b\n"
+    payload = {"code": code, "spec": "ints", "all_symbols": True, "incremental": True}
+
+    first = client_stub.post("/bundle/generate-and-save", json=payload).json()
+    assert first["unchanged"] == []
+    power_test = tmp_path / "tests" / "generated" / "test_power.py"
+    before = power_test.stat().st_mtime_ns
+
+    edited = code.replace("return a * b", "return b * a  # swapped")
+    second = client_stub.post("/bundle/generate-and-save", json={**payload, "code": edited}).json()
+    assert second["unchanged"] == ["power"]
+    assert power_test.stat().st_mtime_ns == before
+
+    third = client_stub.post("/bundle/generate-and-save", json={**payload, "code": edited, "spec": "floats"}).json()
+    assert third["unchanged"] == []
+
+
+def _fake_chat_client(primary_delay):
+    import asyncio
+    from types import SimpleNamespace
+
+    calls = []
+
+    class FakeChat:
+        async def complete_async(self, model, **kwargs):
+            calls.append(model)
+            if model == "primary":
+                await asyncio.sleep(primary_delay)
+            return model
+
+    return SimpleNamespace(chat=FakeChat()), calls
+
+
+def test_open_primary_breaker_goes_straight_to_fallback(client_stub, monkeypatch):
+    import asyncio
+    import core
+
+    fake, calls = _fake_chat_client(0)
+    monkeypatch.setattr(core, "client", fake)
+    monkeypatch.setattr(core, "MODEL", "primary")
+    monkeypatch.setattr(core, "FALLBACK_MODEL", "fallback")
+    for _ in range(core.BREAKER_FAILURES):
+        core._breaker("primary").record_failure()
+
+    assert asyncio.run(core._chat([])) == "fallback"
+    assert calls == ["fallback"]
+    health = client_stub.get("/health").json()
+    assert health["breakers"]["primary"]["state"] == "open"
+    assert health["hedging"]["primary_skipped"] == 1
+
+
+def test_slow_primary_is_hedged_with_fallback(client_stub, monkeypatch):
+    import asyncio
+    import core
+
+    fake, calls = _fake_chat_client(5)
+    monkeypatch.setattr(core, "client", fake)
+    monkeypatch.setattr(core, "MODEL", "primary")
+    monkeypatch.setattr(core, "FALLBACK_MODEL", "fallback")
+    monkeypatch.setattr(core, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(core, "HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(core, "HEDGE_MIN_DELAY", 0.05)
+    core._breaker("primary").record_success(0.01)
+
+    assert asyncio.run(core._chat([])) == "fallback"
+    assert calls == ["primary", "fallback"]
+    assert core._hedge_stats["fired"] == 1 and core._hedge_stats["won_by_fallback"] == 1
+    assert core._breaker("primary").state == "closed"
+
+
+def test_metrics_and_timings(client_with_run, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    payload = {"code": "def mult(a,b):\n    return a * b\n", "spec": "n/a", "timings": True}
+    r = client_with_run.post("/bundle/generate-run", json=payload)
+    assert r.status_code == 200
+    timings = r.json()["timings"]
+    assert {"workspace", "publish", "pytest"} <= set(timings["stages"])
+    assert "server-timing" in r.headers
+
+    text = client_with_run.get("/metrics").text
+    assert 'spec2test_stage_seconds_count{stage="pytest"}' in text
+    assert 'spec2test_http_request_seconds_count{path="/bundle/generate-run",status="200"}' in text
+    assert "spec2test_pytest_runs_total" in text
+
+
+def test_model_call_records_retries_and_tokens(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+    from metrics import trace_scope
+
+    attempts = []
+
+    class FakeChat:
+        async def complete_async(self, model, **kwargs):
+            attempts.append(model)
+            if len(attempts) == 1:
+                raise Exception("429 rate limit")
+            return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=34))
+
+    async def no_sleep(_):
+        pass
+
+    monkeypatch.setattr(core, "client", SimpleNamespace(chat=FakeChat()))
+    monkeypatch.setattr(core.asyncio, "sleep", no_sleep)
+    with trace_scope() as trace:
+        asyncio.run(core._call_with_retries("m-tokens", messages=[]))
+
+    [call] = trace.model_calls
+    assert call["retries"] == 1 and call["outcome"] == "ok"
+    assert call["prompt_tokens"] == 12 and call["completion_tokens"] == 34
+    assert core.MODEL_TOKENS.value(model="m-tokens", kind="completion") == 34
+    assert core.MODEL_RETRIES.value(model="m-tokens") == 1
+
+
+def test_generate_run_uses_result_cache_unless_forced(client_with_run, monkeypatch, tmp_path):
+    import core
+
+    monkeypatch.chdir(tmp_path)
+    runs = []
+    real_exec = core._exec_pytest
+
+    async def counting_exec(*args, **kwargs):
+        runs.append(args)
+        return await real_exec(*args, **kwargs)
+
+    monkeypatch.setattr(core, "_exec_pytest", counting_exec)
+    payload = {"code": "def mult(a,b):\n    return a * b\n", "spec": "n/a", "publish": False}
+
+    first = client_with_run.post("/bundle/generate-run", json=payload).json()
+    second = client_with_run.post("/bundle/generate-run", json=payload).json()
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["exit_code"] == first["exit_code"] == 0
+    assert second["outcomes"] == first["outcomes"] and set(first["outcomes"].values()) == {"passed"}
+    assert len(runs) == 1
+
+    forced = client_with_run.post("/bundle/generate-run", json={**payload, "force_run": True}).json()
+    assert forced["cached"] is False and len(runs) == 2
+
+    changed = client_with_run.post("/bundle/generate-run", json={**payload, "code": payload["code"] + "# edit\n"}).json()
+    assert changed["cached"] is False and len(runs) == 3
+
+
+def test_parse_outcomes_reads_verbose_and_summary_lines():
+    import core
+
+    out = (
+        "tests/test_a.py::test_x PASSED      [ 50%]\n"
+        "tests/test_a.py::test_y[1-2] FAILED [100%]\n"
+        "=== short test summary info ===\n"
+        "ERROR tests/test_b.py::test_z - RuntimeError\n"
+    )
+    assert core.parse_outcomes(out) == {
+        "tests/test_a.py::test_x": "passed",
+        "tests/test_a.py::test_y[1-2]": "failed",
+        "tests/test_b.py::test_z": "error",
+    }
+
+
+def test_invalid_model_output_gets_one_targeted_repair_prompt(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+
+    replies = [
+        "<<<PYTEST_START>>>\nfrom under_test import add\nimport numpy\n<<<PYTEST_END>>>",
+        "<<<PYTEST_START>>>\nfrom under_test import add\n\ndef test_add():\n    assert add(1, 2) == 3\n<<<PYTEST_END>>>",
+    ]
+    prompts = []
+
+    async def fake_chat(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies[len(prompts) - 1]))])
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "GEN_CACHE_ENABLED", False)
+    monkeypatch.setattr(core, "_chat", fake_chat)
+    code = "def add(a, b):\n    return a + b\n"
+    text = asyncio.run(core._gen_tests("add", "ints", code))[0]
+
+    assert "def test_add" in text and len(prompts) == 2
+    assert "'numpy' is not allowed" in prompts[1] and "no test functions" in prompts[1]
+    assert "Human spec" not in prompts[1]
+    assert core.VALIDATIONS.value(result="reprompted") >= 1
+
+    prompts.clear()
+    replies[1] = replies[0]
+    with pytest.raises(core.GenerationError) as err:
+        asyncio.run(core._gen_tests("add", "ints", code))
+    assert err.value.status_code == 502 and len(prompts) == 2
+
+
+def test_size_sets_completion_budget_and_prompt_carries_only_target_context(client_stub, monkeypatch):
+    from types import SimpleNamespace
+    import core
+
+    calls = []
+
+    async def fake_chat(messages, max_tokens=1200):
+        calls.append((messages[-1]["content"], max_tokens))
+        body = "from under_test import add\n\ndef test_add():\n    assert add(1, 2) == 3\n"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+            content=f"<<<PYTEST_START>>>\n{body}<<<PYTEST_END>>>"))])
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "_chat", fake_chat)
+    code = "def add(a, b):\n    return a + b\n\n" + "".join(f"def filler_{i}(x):\n    return x\n\n" for i in range(200))
+
+    for size in ("mini", "max"):
+        r = client_stub.post("/tests/generate.txt", json={
+            "code": code, "spec": "ints", "symbol": "add", "size": size,
+            "style_hints": ["one assert per test"], "no_cache": True,
+        })
+        assert r.status_code == 200, r.text
+
+    (mini_prompt, mini_tokens), (max_prompt, max_tokens) = calls
+    assert (mini_tokens, max_tokens) == (600, 2400)
+    assert "def add(a, b):" in mini_prompt and "filler_" not in mini_prompt
+    assert "- one assert per test" in mini_prompt and "Size: mini" in mini_prompt
+    assert len(mini_prompt) < len(code) // 10
+
+
+def test_job_api_runs_generate_run_in_the_background(client_with_run, monkeypatch, tmp_path):
+    import time
+    import core, main
+    from jobs import JobQueue
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "_jobs", JobQueue(str(tmp_path / "jobs.sqlite3")))
+    payload = {"code": "def mult(a,b):\n    return a * b\n", "spec": "n/a", "publish": False}
+
+    with TestClient(main.app) as c:
+        r = c.post("/jobs", json={"request": payload, "priority": "interactive"})
+        assert r.status_code == 202
+        job = r.json()
+        assert job["status"] in ("queued", "running") and job["priority"] == "interactive"
+
+        for _ in range(200):
+            job = c.get(f"/jobs/{job['id']}").json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.05)
+        assert job["status"] == "succeeded", job
+        assert job["result"]["exit_code"] == 0 and set(job["result"]["outcomes"].values()) == {"passed"}
+
+        assert c.delete(f"/jobs/{job['id']}").status_code == 409
+        assert c.get("/jobs/nope").status_code == 404
+        assert c.get("/health").json()["jobs"]["succeeded"] == 1
+
+
+def test_job_api_rejects_runs_when_disabled_and_cancels_queued(client_stub, monkeypatch, tmp_path):
+    import core
+    from jobs import JobQueue
+
+    monkeypatch.setattr(core, "_jobs", JobQueue(None))
+    payload = {"code": "def mult(a,b):\n    return a * b\n", "spec": "n/a"}
+    assert client_stub.post("/jobs", json={"request": payload}).status_code == 403
+
+    # no lifespan here, so no workers: the job stays queued until cancelled
+    job = client_stub.post("/jobs", json={"kind": "generate-and-save", "request": payload,
+                                          "priority": "batch"}).json()
+    assert job["status"] == "queued" and job["position"] == 0
+    cancelled = client_stub.delete(f"/jobs/{job['id']}").json()
+    assert cancelled["status"] == "cancelled"
+
+
+def test_identical_concurrent_generations_share_one_model_call(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+
+    calls = []
+
+    async def slow_chat(messages, max_tokens=1200):
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        body = "from under_test import add\n\ndef test_add():\n    assert add(1, 2) == 3\n"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+            content=f"<<<PYTEST_START>>>\n{body}<<<PYTEST_END>>>"))])
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "_chat", slow_chat)
+    monkeypatch.setattr(core, "GEN_CACHE_ENABLED", False)
+    code = "def add(a, b):\n    return a + b\n"
+    shared_before = core.GEN_COALESCED.value(result="shared")
+
+    async def fan_out():
+        same = [core._gen_tests_text("add", "ints", code) for _ in range(4)]
+        other = core._gen_tests_text("add", "floats", code)
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(fan_out())
+    assert len(set(results)) == 1 and len(calls) == 2
+    assert core.GEN_COALESCED.value(result="shared") - shared_before == 3
+    assert core._inflight.stats()["in_flight"] == 0
+
+
+def test_bundle_run_reports_limit_violations_as_results(client_with_run, monkeypatch, tmp_path):
+    import core
+    from sandbox import Limits
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "RUN_LIMITS", Limits(cpu_seconds=0, memory_mb=256))
+    (tmp_path / "under_test.py").write_text("def hog():\n    return bytearray(512 * 1024 * 1024)\n")
+    gen = tmp_path / "tests" / "generated"
+    gen.mkdir(parents=True)
+    (gen / "test_hog.py").write_text("from under_test import hog\n\ndef test_hog():\n    assert hog()\n")
+
+    for _ in range(2):
+        r = client_with_run.post("/bundle/run", json={})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["limit"] == "memory" and not body["timed_out"] and body["exit_code"] == 1
+        assert body["cached"] is False  # limit hits are never cached
+    assert client_with_run.get("/health").json()["runner"]["admission"]["active"] == 0
+
+
+def test_generate_run_reports_mutation_score(client_with_run, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints", "mutation": True}
+    data = client_with_run.post("/bundle/generate-run", json=payload).json()
+    assert data["exit_code"] == 0
+    m = data["mutation"]
+    assert m["symbols"] == ["power"] and m["mutants"] == 2
+    assert m["killed"] == 2 and m["score"] == 1.0 and m["survivors"] == []
+    assert "mutation" not in client_with_run.post("/bundle/generate-run", json={**payload, "mutation": False}).json()
+
+
+def test_simple_targets_try_the_cheap_model_and_escalate_on_bad_output(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+
+    good = "<<<PYTEST_START>>>\nfrom under_test import power\n\ndef test_power():\n    assert power(2, 3) == 6\n<<<PYTEST_END>>>"
+    replies = {"small": ["no markers at all", good], "large": [good]}
+    calls = []
+
+    async def fake_call(model, stream=False, **kwargs):
+        calls.append(model)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies[model].pop(0)))])
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "_call_with_retries", fake_call)
+    monkeypatch.setattr(core, "MODEL", "large")
+    monkeypatch.setattr(core, "_router", core.Router("small", max_score=20))
+    monkeypatch.setattr(core, "GEN_CACHE_ENABLED", False)
+    code = "def power(a, b):\n    return a * b\n"
+
+    tests_py, model = asyncio.run(core._gen_tests("power", "ints", code))
+    assert "def test_power" in tests_py and model == "large"
+    assert calls == ["small", "large"]  # the cheap answer had no markers
+    tests_py, model = asyncio.run(core._gen_tests("power", "ints", code))
+    assert "def test_power" in tests_py and model == "small"
+    assert calls == ["small", "large", "small"]
+
+    routing = client_stub.get("/health").json()["routing"]
+    assert routing["decisions"] == {"cheap": 2, "default": 0}
+    assert routing["outcomes"] == {"cheap:escalated_extraction": 1, "default:accepted": 1, "cheap:accepted": 1}
+    assert routing["cheap_accept_rate"] == 0.5
+    assert core.ROUTE_OUTCOMES.value(tier="cheap", result="escalated_extraction") >= 1
+
+
+def test_published_tests_are_indexed_and_run_by_artifact(client_with_run, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints"}
+    data = client_with_run.post("/bundle/generate-run", json=payload).json()
+    assert data["exit_code"] == 0 and len(data["artifacts"]) == 1
+    first = data["artifacts"][0]
+
+    listed = client_with_run.get("/artifacts", params={"symbol": "power"}).json()["artifacts"]
+    assert [a["id"] for a in listed] == [first]
+    assert listed[0]["model"] == "stub" and listed[0]["last_run"]["exit_code"] == 0
+    assert all(nodeid.startswith("tests/test_power.py::") for nodeid in listed[0]["last_run"]["outcomes"])
+    latest = client_with_run.get("/artifacts/latest", params={"module_path": "under_test.py"}).json()
+    assert latest["id"] == first and "def test_" in latest["content"]
+
+    # the published file is edited by hand; /bundle/run still runs the indexed content
+    (tmp_path / "tests" / "generated" / "test_power.py").write_text("def test_broken():\n    assert False\n")
+    body = client_with_run.post("/bundle/run", json={"force": True}).json()
+    assert body["exit_code"] == 0 and body["artifact"] == first
+    assert client_with_run.get("/artifacts/999").status_code == 404
+    assert client_with_run.post("/bundle/run", json={"artifact_id": 999}).status_code == 404
+
+
+def test_failing_or_tripped_cheap_model_escalates(client_stub, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    import core
+
+    good = "<<<PYTEST_START>>>\nfrom under_test import power\n\ndef test_power():\n    assert power(2, 3) == 6\n<<<PYTEST_END>>>"
+    calls = []
+
+    async def fake_call(model, stream=False, **kwargs):
+        calls.append(model)
+        if model == "small":
+            raise RuntimeError("Status 400: invalid model")  # not a GenerationError
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=good))])
+
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "_call_with_retries", fake_call)
+    monkeypatch.setattr(core, "MODEL", "large")
+    monkeypatch.setattr(core, "_router", core.Router("small", max_score=20))
+    monkeypatch.setattr(core, "GEN_CACHE_ENABLED", False)
+    code = "def power(a, b):\n    return a * b\n"
+
+    assert "def test_power" in asyncio.run(core._gen_tests("power", "ints", code))[0]
+    assert calls == ["small", "large"]
+    core._breaker("small").state = "open"
+    core._breaker("small").opened_at = float("inf")
+    assert "def test_power" in asyncio.run(core._gen_tests("power", "ints", code))[0]
+    assert calls == ["small", "large", "large"]
+    assert core._router.stats()["outcomes"]["cheap:escalated_breaker"] == 1
+
+    # cheap-tier output is cached apart from what the default tier would produce
+    assert core._gen_cache_key("power", "ints", code) != core._gen_cache_key("power", "ints", code, tier="default")
+
+
+def test_run_never_borrows_another_modules_artifact(client_with_run, monkeypatch, tmp_path):
+    import asyncio
+    import core
+
+    monkeypatch.chdir(tmp_path)
+    payload = {"code": "def power(a,b):\n    return a * b\n", "spec": "ints", "module_path": "a.py"}
+    first = client_with_run.post("/bundle/generate-and-save", json=payload).json()["artifacts"][0]
+    (tmp_path / "b.py").write_text("def other():\n    return 1\n")
+
+    with pytest.raises(core.GenerationError) as e:
+        asyncio.run(core.run_latest_bundle(code_path="b.py"))
+    assert e.value.status_code == 404
+    assert core._artifacts.get(first)["last_run"] is None
+
+
+def test_artifacts_record_the_model_that_wrote_the_tests(client_stub, monkeypatch, tmp_path):
+    from types import SimpleNamespace
+    import core
+
+    good = "<<<PYTEST_START>>>\nfrom under_test import power\n\ndef test_power():\n    assert power(2, 3) == 6\n<<<PYTEST_END>>>"
+
+    async def fake_call(model, stream=False, **kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=good))])
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("STUB_GEN")
+    monkeypatch.setattr(core, "_call_with_retries", fake_call)
+    monkeypatch.setattr(core, "MODEL", "large")
+    monkeypatch.setattr(core, "_router", core.Router("small", max_score=20))
+    payload = {"code": "def power(a, b):\n    return a * b\n", "spec": "ints", "module_path": "m.py"}
+    for _ in range(2):  # the second answer comes from the generation cache
+        assert client_stub.post("/bundle/generate-and-save", json=payload).status_code == 200
+    assert [a["model"] for a in client_stub.get("/artifacts").json()["artifacts"]] == ["small", "small"]
+    assert client_stub.get("/artifacts", params={"model": "large"}).json()["artifacts"] == []
+
+
+def test_concurrent_unpublished_requests_do_not_share_files(client_stub, monkeypatch, tmp_path):
+    """With publish=false each request keeps its module and tests in its own workspace."""
+    import asyncio
+    import main
+
+    monkeypatch.chdir(tmp_path)
+
+    async def both():
+        reqs = [main.BundleRequest(code=f"def f{i}(a, b):\n    return a * b\n", spec="ints", publish=False)
+                for i in range(2)]
+        return await asyncio.gather(*(main.generate_and_save_bundle(r) for r in reqs))
+
+    first, second = asyncio.run(both())
+    assert "def f0" in first.files["under_test.py"] and "def f1" in second.files["under_test.py"]
+    assert "import f0" in first.files["tests/test_f0.py"] and "import f1" in second.files["tests/test_f1.py"]
+    assert not (tmp_path / "under_test.py").exists() and not (tmp_path / "tests").exists()
+
+
+def test_generate_batch_rejects_items_publishing_to_the_same_module(client_stub, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    item = {"code": "def power(a,b):\n    return a ** b\n", "spec": "ints", "publish": True}
+    r = client_stub.post("/bundle/generate-batch", json={"items": [item, {**item, "module_path": "./under_test.py"}]})
+    assert r.status_code == 422 and "both publish" in r.json()["detail"]
+    # unpublished items each have their own workspace
+    r = client_stub.post("/bundle/generate-batch", json={"items": [{**item, "publish": False}] * 2})
+    assert r.status_code == 200 and r.json()["succeeded"] == 2
@@ -0,0 +1,44 @@
+from artifacts import ArtifactStore
+
+
+def _put(store, symbol, text, module_path="m.py"):
+    return store.put(text, module_path=module_path, symbol=symbol, file_name=f"test_{symbol}.py",
+                     code_hash="h", spec="n/a", model="stub")
+
+
+def test_retention_keeps_last_n_per_symbol_and_collects_blobs(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts"), keep_last=2)
+    first = _put(store, "f", "one")
+    _put(store, "f", "two")
+    _put(store, "g", "one")  # shares first's blob
+    third = _put(store, "f", "three")
+
+    kept = store.query(symbol="f")
+    assert [a["id"] for a in kept] == [third["id"], third["id"] - 2]
+    assert store.get(first["id"]) is None
+    assert (tmp_path / "artifacts" / "blobs" / first["blob"][:2] / first["blob"]).is_file()  # still used by g
+    assert store.latest("m.py", "g")["blob"] == first["blob"]
+    assert store.read(store.latest("m.py")) == "three"
+
+    _put(store, "g", "four")
+    _put(store, "g", "five")
+    assert not (tmp_path / "artifacts" / "blobs" / first["blob"][:2] / first["blob"]).exists()
+    assert sorted(store.published_files("m.py")) == ["test_f.py", "test_g.py"]
+
+
+def test_query_filters_pages_and_records_runs(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts"), keep_last=0)
+    ids = [_put(store, "f", f"v{i}", module_path=f"m{i % 2}.py")["id"] for i in range(5)]
+
+    assert [a["id"] for a in store.query(module_path="m0.py")] == [ids[4], ids[2], ids[0]]
+    page = store.query(limit=2)
+    assert [a["id"] for a in page] == [ids[4], ids[3]]
+    assert [a["id"] for a in store.query(before=page[-1]["id"], limit=2)] == [ids[2], ids[1]]
+    assert store.query(model="other") == []
+
+    assert store.get(ids[0])["last_run"] is None
+    store.record_run(ids[0], 1, {"tests/test_f.py::test_x": "failed"})
+    run = store.get(ids[0])["last_run"]
+    assert run["exit_code"] == 1 and run["outcomes"] == {"tests/test_f.py::test_x": "failed"}
+    assert store.stats()["artifacts"] == 5
+    store.close()
@@ -0,0 +1,47 @@
+import asyncio
+import importlib
+
+import pytest
+
+from bench import baseline, configure
+from bench.fake_upstream import UpstreamProfile
+from bench.load import percentile, run_load
+
+
+@pytest.fixture
+def real_main(monkeypatch):
+    """The app with the real model path (no STUB_GEN); the fake upstream replaces the SDK client."""
+    monkeypatch.delenv("STUB_GEN", raising=False)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    import core, main
+    importlib.reload(core)
+    importlib.reload(main)
+    configure(retry_base_delay=0.001, retry_max_delay=0.005)
+    return main
+
+
+def test_load_run_exercises_retries_and_parsing(real_main):
+    profile = UpstreamProfile(latency="fixed:0", error_429=0.3, seed=7)
+    out = asyncio.run(run_load(real_main.app, profile, ["generate.txt", "generate.stream"], requests=12, concurrency=4))
+
+    for stats in out["endpoints"].values():
+        assert stats["requests"] == 12 and stats["ok"] == 12
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert sum(out["upstream"]["errors"].values()) > 0
+    assert sum(out["upstream"]["calls"].values()) > 24
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 0.5) == 50.0
+    assert percentile(samples, 0.99) == 99.0
+    assert percentile([], 0.95) == 0.0
+
+
+def test_baseline_flags_only_regressions_beyond_tolerance():
+    base = {"micro": {"extract_between_us": 10.0},
+            "load": {"generate.txt": {"p95_ms": 100.0, "throughput_rps": 50.0}}}
+    results = {"micro": {"extract_between_us": 12.0},
+               "load": {"endpoints": {"generate.txt": {"p50_ms": 1, "p95_ms": 200.0, "p99_ms": 1,
+                                                       "throughput_rps": 60.0}}}}
+    assert baseline.compare(results, base, tolerance=0.3) == ["load.generate.txt.p95_ms: 200.0 vs baseline 100.0"]
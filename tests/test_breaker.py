@@ -0,0 +1,35 @@
+from breaker import CircuitBreaker
+
+
+def test_opens_after_threshold_and_probes_after_cooldown(monkeypatch):
+    import breaker as mod
+
+    now = [100.0]
+    monkeypatch.setattr(mod.time, "monotonic", lambda: now[0])
+    b = CircuitBreaker("m", failure_threshold=2, cooldown=10)
+    b.record_failure()
+    assert b.allow()
+    b.record_failure()
+    assert b.state == "open" and not b.allow()
+
+    now[0] += 11
+    assert b.allow()          # the single half-open probe
+    assert not b.allow()      # everyone else keeps skipping
+    b.record_failure()
+    assert b.state == "open"
+
+    now[0] += 11
+    assert b.allow()
+    b.record_success(0.5)
+    assert b.state == "closed" and b.allow()
+    assert b.stats()["times_opened"] == 2
+
+
+def test_latency_percentiles():
+    b = CircuitBreaker("m")
+    assert b.percentile(0.95) is None
+    for i in range(1, 101):
+        b.record_success(i / 100)
+    assert b.percentile(0.5) == 0.5
+    assert b.percentile(0.95) == 0.95
+    assert b.percentile(0.95, min_samples=200) is None
@@ -0,0 +1,158 @@
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_core_and_cli_import_without_web_or_sdk_modules(monkeypatch):
+    monkeypatch.delenv("MISTRAL_API_KEY", raising=False)
+    monkeypatch.delenv("STUB_GEN", raising=False)
+    code = (
+        "import sys, cli, core\n"
+        "heavy = [m for m in ('fastapi', 'pydantic', 'mistralai', 'httpx') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_connect_falls_back_when_no_daemon(tmp_path, capsys):
+    from daemon_client import connect
+
+    assert connect(None) is None
+    assert connect(str(tmp_path / "missing.sock")) is None
+    assert "running in-process" in capsys.readouterr().err
+
+
+@pytest.fixture
+def daemon(monkeypatch, tmp_path):
+    """The app served over a Unix socket from a background thread (stub generation)."""
+    import uvicorn
+
+    monkeypatch.setenv("STUB_GEN", "1")
+    monkeypatch.setenv("ENABLE_RUN", "1")
+    monkeypatch.chdir(tmp_path)
+    import core, main
+    importlib.reload(core)
+    importlib.reload(main)
+
+    sock = str(tmp_path / "s2t.sock")
+    server = uvicorn.Server(uvicorn.Config(main.app, uds=sock, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.02)
+    yield sock
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def test_connect_refuses_a_daemon_serving_another_directory(daemon, tmp_path, monkeypatch, capsys):
+    import daemon_client
+
+    health = daemon_client.connect(daemon).request("GET", "/health")
+    assert "cwd" not in health and health["cwd_hash"] == daemon_client.directory_hash(str(tmp_path))
+
+    # the server shares our process (and cwd), so stand in for one started elsewhere
+    monkeypatch.setattr(daemon_client.DaemonClient, "request",
+                        lambda self, method, url, payload=None: {**health, "cwd_hash": daemon_client.directory_hash("/")})
+    assert daemon_client.connect(daemon) is None
+    assert "another directory" in capsys.readouterr().err
+
+
+def test_daemon_round_trip(daemon, tmp_path):
+    from daemon_client import DaemonError, connect
+
+    client = connect(daemon)
+    assert client is not None
+
+    code = "def mult(a, b):\n    return a * b\n"
+    (tmp_path / "under_test.py").write_text(code)
+    result = client.request("POST", "/bundle/generate-and-save", {"code": code, "spec": "n/a", "timings": True})
+    assert (tmp_path / result["tests_path"]).exists()
+    assert "publish" in result["timings"]["stages"]
+
+    streamed = "".join(client.stream("/tests/generate.stream", {"code": code, "spec": "n/a"}))
+    assert "from under_test import mult" in streamed
+
+    ran = client.request("POST", "/bundle/run", {})
+    assert ran["exit_code"] == 0
+
+    with pytest.raises(DaemonError) as err:
+        client.request("POST", "/bundle/generate-and-save", {"code": "x = 1\n", "spec": "n/a"})
+    assert err.value.status == 400
+
+
+def test_watch_regenerates_repeatedly_with_one_sdk_client(monkeypatch, tmp_path):
+    """
+    A real Mistral client (pooled httpx.AsyncClient) against a local upstream:
+    its connections belong to the loop that opened them, so every regeneration
+    must run on the same loop or the primary model fails with "Event loop is closed".
+    """
+    import argparse
+    import asyncio
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from bench.fake_upstream import UpstreamProfile, _symbol_from_messages, fake_completion_text
+
+    calls = []
+
+    class Upstream(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the pool reuses connections
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            calls.append(body["model"])
+            text = fake_completion_text(_symbol_from_messages(body["messages"]), UpstreamProfile(cases=2, chatter=0))
+            out = json.dumps({
+                "id": "c", "object": "chat.completion", "model": body["model"], "created": 0,
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.delenv("STUB_GEN", raising=False)
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("GEN_CACHE", "0")
+    monkeypatch.setenv("HEDGE_ENABLED", "0")
+    monkeypatch.chdir(tmp_path)
+    import cli, core, main
+    importlib.reload(core)
+    importlib.reload(main)
+    from mistralai import Mistral
+
+    core.client = Mistral(api_key="test-key", server_url=f"http://127.0.0.1:{server.server_port}",
+                          async_client=core._new_http_client())
+    target = tmp_path / "under_test.py"
+    target.write_text("def mult(a, b):\n    return a * b\n")
+
+    def stop():
+        # polled once per watch tick: the first tick saves an edit, the second regeneration ends the session
+        if target.read_text().endswith("a * b\n"):
+            target.write_text("def mult(a, b):\n    return b * a\n")
+        return len(calls) >= 2
+
+    args = argparse.Namespace(code_path="under_test.py", spec="n/a", profile=False, debounce=0.05, interval=0.01)
+    try:
+        asyncio.run(asyncio.wait_for(cli.watch_command(args, None, stop=stop), timeout=20))
+    finally:
+        server.shutdown()
+    assert len(calls) == 2 and calls[0] == calls[1]  # one call each, no retry or fallback
+    assert all(b.stats()["failures"] == 0 for b in core._breakers.values())
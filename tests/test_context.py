@@ -0,0 +1,69 @@
+from context import build_context, estimate_tokens
+
+CODE = '''import math
+import json
+
+RATE = 2
+
+def _scale(x):
+    """Scale by RATE."""
+    if not isinstance(x, (int, float)):
+        raise TypeError("x must be a number")
+    return x * RATE
+
+def unrelated(y):
+    return json.dumps(y)
+
+def area(r: float) -> float:
+    """Circle area, scaled."""
+    return _scale(math.pi * r * r)
+
+class Acc:
+    """Accumulator."""
+    def __init__(self, start=0):
+        self.total = start
+
+    def _check(self, v):
+        if v < 0:
+            raise ValueError(v)
+
+    def add(self, v):
+        self._check(v)
+        self.total += v
+        return self.total
+
+    def reset(self):
+        self.total = 0
+'''
+
+
+def test_only_the_target_and_its_direct_references_are_kept():
+    ctx = build_context(CODE, "area", 1000)
+    assert ctx.signature == "def area(r: float) -> float:" and ctx.docstring == "Circle area, scaled."
+    assert ctx.helpers == ["_scale"] and not ctx.truncated
+    assert "import math" in ctx.text and "def _scale" in ctx.text and ctx.text.endswith("r * r)")
+    assert "unrelated" not in ctx.text and "import json" not in ctx.text and "class Acc" not in ctx.text
+
+
+def test_method_context_keeps_class_header_constructor_and_called_methods():
+    ctx = build_context(CODE, "Acc.add", 1000)
+    assert ctx.helpers == ["Acc._check"]
+    assert ctx.text.startswith('class Acc:\n    """Accumulator."""\n    def __init__')
+    assert "def _check" in ctx.text and "def reset" not in ctx.text and "def area" not in ctx.text
+
+
+def test_budget_degrades_helpers_then_target_to_signatures():
+    full = build_context(CODE, "area", 1000)
+    tight = build_context(CODE, "area", full.tokens - 10)
+    assert tight.truncated and tight.tokens <= full.tokens - 10
+    assert '"""Scale by RATE."""\n    ...' in tight.text and "return _scale" in tight.text
+
+    tiny = build_context(CODE, "area", 5)
+    assert tiny.truncated and tiny.helpers == []
+    assert "def area(r: float) -> float:" in tiny.text and "return _scale" not in tiny.text
+
+
+def test_unknown_symbol_or_bad_code_falls_back_to_a_cut():
+    ctx = build_context("def (", "f", 1)
+    assert ctx.text == "def" and ctx.truncated
+    assert estimate_tokens("abcde") == 2
@@ -0,0 +1,33 @@
+from gen_cache import TwoTierCache, normalized_code_hash
+
+
+def test_normalized_hash_ignores_whitespace_and_comments():
+    a = "def f(x):\n    return x + 1\n"
+    b = "# note\ndef f( x ):\n\n    return x+1  # inc\n"
+    assert normalized_code_hash(a) == normalized_code_hash(b)
+    assert normalized_code_hash(a) != normalized_code_hash("def f(x):\n    return x + 2\n")
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    TwoTierCache(path).set("k", "v")
+    fresh = TwoTierCache(path)
+    assert fresh.get("k") == "v"
+    assert fresh.stats()["hits_disk"] == 1
+
+
+def test_lru_and_ttl_eviction(tmp_path, monkeypatch):
+    cache = TwoTierCache(None, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    ttl_cache = TwoTierCache(str(tmp_path / "ttl.sqlite3"), ttl=10)
+    ttl_cache.set("k", "v")
+    import gen_cache
+    real_time = gen_cache.time.time
+    monkeypatch.setattr(gen_cache.time, "time", lambda: real_time() + 60)
+    assert ttl_cache.get("k") is None
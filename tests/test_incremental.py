@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+from incremental import Manifest, symbol_hashes, watch_changes
+
+
+def test_symbol_hashes_track_each_definition():
+    base = symbol_hashes("def f(x):\n    return x\n\nclass C:\n    def m(self):\n        return 1\n")
+    reformatted = symbol_hashes("def f( x ):\n    # same\n    return x\n\nclass C:\n    def m(self):\n        return 1\n")
+    changed = symbol_hashes("def f(x):\n    return x\n\nclass C:\n    def m(self):\n        return 2\n")
+    assert base == reformatted
+    assert changed["f"] == base["f"]
+    assert changed["C.m"] != base["C.m"] and changed["C"] != base["C"]
+
+
+def test_watch_debounces_a_burst_of_saves(tmp_path):
+    target = tmp_path / "mod.py"
+    target.write_text("a = 0\n")
+    events = []
+    done = threading.Event()
+
+    def saver():
+        time.sleep(0.1)
+        for i in range(5):
+            target.write_text(f"a = {i + 1}\n")
+            time.sleep(0.03)
+        time.sleep(0.6)
+        done.set()
+
+    async def watch():
+        async for _ in watch_changes(str(target), debounce=0.2, interval=0.02, stop=done.is_set):
+            events.append(target.read_text())
+
+    threading.Thread(target=saver).start()
+    asyncio.run(watch())
+    assert events == ["a = 5\n"]
+
+
+def test_concurrent_manifest_writers_keep_each_others_entries(tmp_path):
+    # every writer loads before any of them saves, like concurrent publishing requests
+    manifests = [Manifest(tmp_path) for _ in range(8)]
+    for i, manifest in enumerate(manifests):
+        manifest.record(f"mod_{i}.py", "f", f"hash{i}", "spec", f"test_f_{i}.py")
+    threads = [threading.Thread(target=m.save) for m in manifests]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(Manifest(tmp_path).data["symbols"]) == 8
+    assert Manifest(tmp_path).data["symbols"]["mod_3.py::f"]["file"] == "test_f_3.py"
+
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import time
+
+from jobs import PRIORITIES, JobQueue, JobWorkers
+
+
+def test_claim_order_follows_priority_then_submission(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    backfill = q.submit("generate-run", {"n": 1}, PRIORITIES["batch"])
+    first = q.submit("generate-run", {"n": 2})
+    urgent = q.submit("generate-run", {"n": 3}, PRIORITIES["interactive"])
+    second = q.submit("generate-run", {"n": 4})
+
+    assert q.get(backfill)["position"] == 3 and q.get(urgent)["position"] == 0
+    order = [q.claim()["id"] for _ in range(4)]
+    assert order == [urgent, first, second, backfill]
+    assert q.claim() is None
+    assert q.stats()["running"] == 4
+
+
+def test_pending_and_interrupted_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    q = JobQueue(path, lease=0.05)
+    running = q.submit("generate-run", {"n": 1})
+    queued = q.submit("generate-run", {"n": 2})
+    done = q.submit("generate-run", {"n": 3})
+    q.claim()
+    q.cancel(done)
+    q.close()
+
+    reopened = JobQueue(path)
+    assert reopened.get(running)["status"] == "running"
+    time.sleep(0.1)  # the crashed owner never renews its lease
+    assert reopened.requeue() == 1
+    assert [reopened.claim()["id"], reopened.claim()["id"]] == [running, queued]
+    assert reopened.get(running)["attempts"] == 2
+    assert reopened.get(done)["status"] == "cancelled"
+
+
+def test_processes_sharing_a_queue_never_run_a_job_twice(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    a, b = JobQueue(path), JobQueue(path)
+    ids = [a.submit("generate-run", {"n": n}) for n in range(4)]
+    claimed = [q.claim()["id"] for q in (a, b, a, b)]
+    assert sorted(claimed) == sorted(ids) and a.claim() is None and b.claim() is None
+
+    # a sibling (re)starting leaves live leases alone and cannot finish or requeue another owner's job
+    assert b.requeue() == 0 and b.requeue(claimed[0]) == 0
+    b.succeed(claimed[0], {"by": "b"})
+    assert a.get(claimed[0])["status"] == "running" and a.get(claimed[0])["owner"] == a.owner
+    a.succeed(claimed[0], {"by": "a"})
+    assert b.get(claimed[0])["result"] == {"by": "a"}
+
+
+def test_workers_record_results_errors_and_cancellation():
+    q = JobQueue(None)
+    release = {}
+
+    class Failure(Exception):
+        status_code = 422
+        detail = "bad spec"
+
+    async def runner(job):
+        if job["request"]["mode"] == "fail":
+            raise Failure()
+        if job["request"]["mode"] == "block":
+            release[job["id"]] = asyncio.Event()
+            await release[job["id"]].wait()
+        return {"echo": job["request"]["mode"]}
+
+    async def main():
+        workers = JobWorkers(q, runner, concurrency=2, poll_interval=0.01)
+        workers.start()
+        ok = q.submit("generate-run", {"mode": "ok"})
+        bad = q.submit("generate-run", {"mode": "fail"})
+        blocked = q.submit("generate-run", {"mode": "block"})
+        workers.notify()
+        for _ in range(200):
+            if blocked in release and q.get(bad)["status"] == "failed":
+                break
+            await asyncio.sleep(0.01)
+        assert await workers.cancel(blocked) == "running"
+        await asyncio.sleep(0.01)
+        assert (await workers.stats())["running"] == 0
+        await workers.stop()
+        return ok, bad, blocked
+
+    ok, bad, blocked = asyncio.run(main())
+    assert q.get(ok)["status"] == "succeeded" and q.get(ok)["result"] == {"echo": "ok"}
+    assert (q.get(bad)["status"], q.get(bad)["status_code"], q.get(bad)["error"]) == ("failed", 422, "bad spec")
+    assert q.get(blocked)["status"] == "cancelled" and q.get(blocked)["result"] is None
+
+
+def test_a_locked_queue_file_does_not_stall_the_event_loop(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    q = JobQueue(path, lease=0.03)
+    q.stats()  # create the table before another process locks the file
+    blocker = sqlite3.connect(path)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    async def runner(job):
+        return {}
+
+    async def main():
+        workers = JobWorkers(q, runner, poll_interval=0.01)
+        workers.start()
+        ticks, started = 0, time.monotonic()
+        while time.monotonic() - started < 0.5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        blocker.rollback()
+        await workers.stop()
+        return ticks
+
+    # claims and heartbeats wait on sqlite's busy timeout in threads, not on the loop
+    assert asyncio.run(main()) > 20
+
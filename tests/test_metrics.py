@@ -0,0 +1,53 @@
+import asyncio
+
+from metrics import Registry, stage, trace_scope, current_trace
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    reg = Registry()
+    c = reg.counter("jobs_total", "Jobs.", ("kind",))
+    h = reg.histogram("job_seconds", "Job time.", ("kind",), buckets=(0.1, 1))
+    c.inc(kind='a"b')
+    c.inc(2, kind="x")
+    h.observe(0.5, kind="x")
+
+    text = reg.render()
+    assert 'jobs_total{kind="a\\"b"} 1' in text
+    assert 'jobs_total{kind="x"} 2' in text
+    assert 'job_seconds_bucket{kind="x",le="0.1"} 0' in text
+    assert 'job_seconds_bucket{kind="x",le="1"} 1' in text
+    assert 'job_seconds_bucket{kind="x",le="+Inf"} 1' in text
+    assert 'job_seconds_count{kind="x"} 1' in text
+
+
+def test_stages_reach_the_trace_across_tasks_and_threads():
+    def blocking():
+        with stage("thread"):
+            pass
+
+    async def work():
+        with stage("task"):
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(work(), work(), asyncio.to_thread(blocking))
+
+    with trace_scope() as trace:
+        with trace_scope() as same:
+            assert same is trace
+        asyncio.run(main())
+    assert current_trace() is None
+    assert set(trace.as_dict()["stages"]) == {"task", "thread"}
+
+
+def test_nested_trace_rolls_up_into_parent():
+    with trace_scope() as outer:
+        with trace_scope(nested=True) as inner:
+            inner.add_tokens(10, 5)
+            inner.add_model_call(model="m")
+            with stage("parse"):
+                pass
+        assert current_trace() is outer
+    assert inner.as_dict()["tokens"] == outer.as_dict()["tokens"] == {"prompt": 10, "completion": 5}
+    assert outer.model_calls == [{"model": "m"}]
+    assert "parse" in outer.stages
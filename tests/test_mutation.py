@@ -0,0 +1,96 @@
+import asyncio
+import importlib
+import types
+
+import pytest
+
+from mutation import SWITCH, Mutant, build_schemata, imported_targets, sample, summarize
+from pytest_pool import PytestPool
+
+CODE = '''"""Helpers."""
+from __future__ import annotations
+
+def clamp(x, lo=0, hi=10):
+    if x < lo:
+        return lo
+    if x > hi:
+        return hi
+    return x
+
+def spin(n):
+    i = 0
+    while i < n:
+        i += 1
+    return i
+
+def untouched(a, b):
+    return a + b
+'''
+
+
+def _load(source: str) -> types.ModuleType:
+    module = types.ModuleType("under_test")
+    exec(compile(source, "under_test.py", "exec"), module.__dict__)
+    return module
+
+
+def test_schemata_switches_mutants_at_runtime():
+    source, mutants = build_schemata(CODE, ["clamp", "spin"])
+    assert all(m.symbol in ("clamp", "spin") for m in mutants)
+    assert [(m.line, m.operator, m.original, m.mutated) for m in mutants[:2]] == [
+        (5, "boundary", "x < lo", "x <= lo"), (6, "return", "lo", "None")]
+
+    module = _load(source)
+    assert module.clamp(20) == 10 and module.untouched(1, 2) == 3
+    setattr(module, SWITCH, next(m.id for m in mutants if m.mutated == "x >= hi"))
+    assert module.clamp(10) == 10
+    setattr(module, SWITCH, next(m.id for m in mutants if m.original == "hi" and m.mutated == "None"))
+    assert module.clamp(20) is None and module.clamp(5) == 5
+
+
+def test_imported_targets_and_sampling():
+    tests = "import pytest\nfrom under_test import clamp, Calc\nfrom os import path\n"
+    assert imported_targets(tests) == ["clamp", "Calc"]
+    mutants = [Mutant(i, "f", i, "arithmetic", "a", "b") for i in range(1, 11)]
+    assert [m.id for m in sample(mutants, 5)] == [1, 3, 5, 7, 9]
+
+
+def test_summarize_charges_a_killed_shard_for_the_mutant_it_was_on():
+    mutants = [Mutant(i, "f", i, "arithmetic", "a + b", "a - b") for i in range(1, 6)]
+    finished = '{"type": "baseline", "tests": 2, "passing": 2}\n{"type": "mutant", "id": 1, "status": "killed"}\n'
+    killed = '{"type": "baseline", "tests": 2, "passing": 2}\n{"type": "mutant", "id": 2, "status": "survived"}\n'
+    result = summarize(mutants, [
+        ([1, 4], finished + '{"type": "mutant", "id": 4, "status": "no_coverage"}\n', {"exit_code": 0}),
+        ([2, 3, 5], killed, {"exit_code": None, "timed_out": True}),
+    ])
+    assert (result["killed"], result["timeout"], result["survived"], result["no_coverage"], result["not_run"]) == \
+        (1, 1, 1, 1, 1)
+    assert result["score"] == 0.5  # (killed + timeout) / mutants that were tried
+    assert [s["id"] for s in result["survivors"]] == [2, 4]
+
+
+@pytest.mark.skipif(not PytestPool.supported(), reason="needs os.fork")
+def test_run_latest_bundle_scores_mutants(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_PATH", "")
+    monkeypatch.chdir(tmp_path)
+    import core
+    importlib.reload(core)
+
+    (tmp_path / "under_test.py").write_text(CODE)
+    gen = tmp_path / "tests" / "generated"
+    gen.mkdir(parents=True)
+    (gen / "test_clamp.py").write_text(
+        "from under_test import clamp, spin\n\n"
+        "def test_low():\n    assert clamp(-5) == 0\n\n"
+        "def test_mid():\n    assert clamp(5) == 5\n\n"
+        "def test_spin():\n    assert spin(3) == 3\n"
+    )
+    res = asyncio.run(core.run_latest_bundle(mutation=True))
+    assert res["exit_code"] == 0
+    m = res["mutation"]
+    assert m["symbols"] == ["clamp", "spin"] and m["baseline"] == {"tests": 3, "passing": 3}
+    # `i += 1` -> `i -= 1` never ends and is stopped by the per-mutant timer
+    assert (m["mutants"], m["killed"], m["timeout"], m["survived"], m["no_coverage"]) == (8, 4, 1, 2, 1)
+    assert m["score"] == 0.625
+    assert {(s["original"], s["mutated"]) for s in m["survivors"]} == {("x < lo", "x <= lo"), ("x > hi", "x >= hi"),
+                                                                        ("hi", "None")}
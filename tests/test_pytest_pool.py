@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from pytest_pool import LineSplitter, PytestPool, PoolTimeout
+
+pytestmark = pytest.mark.skipif(not PytestPool.supported(), reason="needs os.fork")
+
+
+def _write_bundle(root, body):
+    (root / "tests").mkdir()
+    (root / "under_test.py").write_text("STATE = []\n")
+    (root / "tests" / "test_x.py").write_text(body)
+    return str(root)
+
+
+@pytest.fixture
+def pool():
+    p = PytestPool(size=1, max_jobs=2)
+    yield p
+    p.shutdown()
+
+
+def test_pool_runs_jobs_in_isolated_children(pool, tmp_path):
+    body = (
+        "import under_test\n"
+        "def test_fresh_module():\n"
+        "    under_test.STATE.append(1)\n"
+        "    assert under_test.STATE == [1]\n"
+    )
+    cwd = _write_bundle(tmp_path, body)
+    first = pool.run(cwd, ["-q", "tests"], timeout=30)
+    second = pool.run(cwd, ["-q", "tests"], timeout=30)
+    assert first["exit_code"] == 0 and second["exit_code"] == 0
+    assert "1 passed" in second["stdout"]
+
+    stats = pool.stats()
+    assert stats["jobs_run"] == 2
+    assert stats["recycled"] == 1  # max_jobs=2 retires the worker
+    assert stats["last_startup_s"] is not None
+
+
+def test_pool_reports_failures_and_timeouts(pool, tmp_path):
+    cwd = _write_bundle(tmp_path, "import time\ndef test_slow():\n    time.sleep(30)\n")
+    with pytest.raises(PoolTimeout):
+        pool.run(cwd, ["-q", "tests"], timeout=1)
+
+    (tmp_path / "tests" / "test_x.py").write_text("def test_bad():\n    assert False\n")
+    res = pool.run(cwd, ["-q", "tests"], timeout=30)
+    assert res["exit_code"] == 1
+    assert "1 failed" in res["stdout"]
+
+
+def test_line_splitter_caps_an_unterminated_line():
+    splitter = LineSplitter(max_line=8)
+    assert splitter.feed(b"ab") == []
+    assert splitter.feed(b"cd\nef") == ["abcd"]
+    for _ in range(1000):
+        assert splitter.feed(b"x" * 100) == []
+    assert len(splitter._partial) == 8 and splitter.truncated
+    assert splitter.feed(b"y\nz") == ["efxxxxxx"]
+    assert splitter.flush() == ["z"]
+
+
+
+def test_timeout_holds_after_the_test_closes_its_output(pool, tmp_path):
+    body = (
+        "import os, time\n"
+        "def test_detached():\n"
+        "    os.close(1)\n"
+        "    os.close(2)\n"
+        "    time.sleep(30)\n"
+    )
+    cwd = _write_bundle(tmp_path, body)
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout) as err:
+        pool.run(cwd, ["-q", "-s", "-p", "no:faulthandler", "tests"], timeout=1)
+    assert err.value.args[0]["timed_out"] and time.monotonic() - started < 10
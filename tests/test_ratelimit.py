@@ -0,0 +1,32 @@
+import asyncio
+
+from ratelimit import RateLimiter
+
+
+def test_bucket_throttles_after_burst(monkeypatch):
+    waits = []
+
+    async def fake_sleep(delay):
+        waits.append(delay)
+        limiter._req.level = 1.0  # pretend the wait refilled the bucket
+
+    limiter = RateLimiter(rps=2, tpm=0)
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    async def burst():
+        for _ in range(3):
+            await limiter.acquire()
+
+    asyncio.run(burst())
+    assert len(waits) == 1 and waits[0] > 0
+
+
+def test_rate_limited_slows_down_and_recovers():
+    limiter = RateLimiter(rps=10, tpm=1000)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.factor == 0.25
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.factor == 1.0
+    assert limiter.stats()["rate_limited"] == 2
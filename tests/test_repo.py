@@ -0,0 +1,105 @@
+import asyncio
+import importlib
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+
+@pytest.fixture
+def pkg(tmp_path):
+    """A small package with a subpackage, relative imports, a broken module and its own tests."""
+    root = tmp_path / "src" / "calc"
+    (root / "sub").mkdir(parents=True)
+    (root / "tests").mkdir()
+    (root / "__init__.py").write_text("")
+    (root / "sub" / "__init__.py").write_text("")
+    (root / "sub" / "helpers.py").write_text("def scale(a, b):\n    return a * b\n")
+    (root / "ops.py").write_text("from .sub.helpers import scale\n\ndef mul(a, b):\n    return scale(a, b)\n\n"
+                                 "def _hidden():\n    pass\n")
+    (root / "bad.py").write_text("def broken(:\n")
+    (root / "tests" / "test_ops.py").write_text("")
+    return root
+
+
+@pytest.fixture
+def core(monkeypatch, tmp_path):
+    monkeypatch.setenv("STUB_GEN", "1")
+    monkeypatch.setenv("GEN_CACHE", "0")
+    monkeypatch.setenv("JOBS_PATH", "")
+    monkeypatch.chdir(tmp_path)
+    import core
+    importlib.reload(core)
+    return core
+
+
+def test_discover_yields_importable_modules(pkg):
+    from repo import discover
+
+    assert [m for _, m in discover(str(pkg))] == ["calc", "calc.bad", "calc.ops", "calc.sub", "calc.sub.helpers"]
+    assert [m for _, m in discover(str(pkg / "sub"))] == ["sub", "sub.helpers"]
+
+
+def test_run_repo_writes_tests_against_the_real_module_and_reports(core, pkg, tmp_path):
+    from repo import run_repo
+
+    out = tmp_path / "out"
+    summary = asyncio.run(run_repo(str(pkg), out_dir=str(out), run=True, procs=1, window=2))
+
+    assert summary["modules"] == 5 and summary["generated"] == 2
+    assert summary["passed"] == 2 and summary["failed"] == 0
+    assert summary["modules_failed"] == 1  # calc.bad does not parse
+    assert json.loads((out / "summary.json").read_text())["passed"] == 2
+
+    test_mul = (out / "calc" / "ops" / "test_mul.py").read_text()
+    assert "from calc.ops import mul" in test_mul and "under_test" not in test_mul
+
+    records = {r["module"]: r for r in map(json.loads, (out / "report.jsonl").read_text().splitlines())}
+    assert records["calc.ops"]["run"]["passed"] == 1
+    assert [s["symbol"] for s in records["calc.ops"]["symbols"]] == ["mul"]
+    assert records["calc.bad"]["error"].startswith("SyntaxError")
+
+    suites = {s.get("name"): s for s in ET.parse(out / "junit.xml").getroot()}
+    assert set(suites) == set(records)
+    assert suites["calc.sub.helpers"].get("tests") == "1"
+    assert suites["calc.bad"].find("testcase/error") is not None
+
+
+def test_run_repo_reports_runner_errors_per_module(core, pkg, tmp_path, monkeypatch):
+    from repo import run_repo
+
+    async def busy(*args, **kwargs):
+        raise core.GenerationError(503, "All test runners are busy; try again later.")
+
+    monkeypatch.setattr(core, "_exec_pytest", busy)
+    out = tmp_path / "out"
+    summary = asyncio.run(run_repo(str(pkg), out_dir=str(out), run=True, procs=1, window=2))
+
+    assert summary["modules"] == 5 and summary["modules_failed"] == 3
+    records = {r["module"]: r for r in map(json.loads, (out / "report.jsonl").read_text().splitlines())}
+    assert records["calc.ops"]["error"] == "GenerationError: All test runners are busy; try again later."
+    assert ET.parse(out / "junit.xml").getroot().find("testsuite[@name='calc.ops']/testcase/error") is not None
+
+
+def test_run_repo_reports_sdk_errors_per_symbol(core, pkg, tmp_path, monkeypatch):
+    from repo import run_repo
+
+    real = core._gen_tests_text
+
+    async def flaky(symbol, *args, **kwargs):
+        if symbol == "mul":
+            raise ConnectionError("upstream reset")
+        return await real(symbol, *args, **kwargs)
+
+    monkeypatch.setattr(core, "_gen_tests_text", flaky)
+    (pkg / "ops.py").write_text("def mul(a, b):\n    return a * b\n\ndef add(a, b):\n    return a + b\n")
+    out = tmp_path / "out"
+    summary = asyncio.run(run_repo(str(pkg), out_dir=str(out), procs=1, window=2))
+
+    records = {r["module"]: r for r in map(json.loads, (out / "report.jsonl").read_text().splitlines())}
+    symbols = {s["symbol"]: s for s in records["calc.ops"]["symbols"]}
+    assert records["calc.ops"]["error"] is None
+    assert symbols["mul"]["error"] == "ConnectionError: upstream reset" and symbols["add"]["error"] is None
+    assert (out / "calc" / "ops" / "test_add.py").exists()
+    assert summary["generation_errors"] == 1
+
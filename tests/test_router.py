@@ -0,0 +1,49 @@
+from router import Router, complexity
+
+SIMPLE = "def power(a, b):\n    return a * b\n"
+BRANCHY = (
+    "class Ledger:\n"
+    "    def __init__(self, rows):\n        self.rows = rows\n"
+    "    def total(self, kind, since=None, until=None):\n"
+    "        out = 0\n"
+    "        for row in self.rows:\n"
+    "            if row.kind != kind or (since and row.at < since) or (until and row.at > until):\n"
+    "                continue\n"
+    "            try:\n                out += row.amount\n"
+    "            except TypeError:\n                raise ValueError(row)\n"
+    "        return out\n"
+    "    def kinds(self):\n        return sorted({r.kind for r in self.rows if r.amount})\n"
+)
+
+
+def test_complexity_features():
+    simple = complexity(SIMPLE, "power")
+    assert (simple["params"], simple["branches"], simple["methods"]) == (2, 0, 0)
+    assert simple["score"] < 5
+
+    ledger = complexity(BRANCHY, "Ledger")
+    assert ledger["methods"] == 3 and ledger["branches"] >= 6 and ledger["params"] == 3
+    method = complexity(BRANCHY, "Ledger.total")
+    assert method["params"] == 3 and method["methods"] == 0
+    assert simple["score"] < method["score"] < ledger["score"]
+
+    assert complexity(SIMPLE, "missing") is None and complexity("def broken(:", "broken") is None
+
+
+def test_router_thresholds_scale_with_size_and_count_outcomes():
+    method_score = complexity(BRANCHY, "Ledger.total")["score"]
+    router = Router("small", max_score=method_score)
+    assert router.decide(SIMPLE, "power")["tier"] == "cheap"
+    assert router.decide(BRANCHY, "Ledger.total", size="std")["tier"] == "cheap"
+    assert router.decide(BRANCHY, "Ledger.total", size="max") == {
+        "tier": "default", "reason": "complex", "complexity": complexity(BRANCHY, "Ledger.total")}
+    assert router.decide("x = 1", "nothing")["reason"] == "unknown_target"
+    assert Router("small", enabled=False).decide(SIMPLE, "power")["reason"] == "disabled"
+
+    router.record("cheap", "accepted", 0.5)
+    router.record("cheap", "escalated_validation", 0.25)
+    router.record("default", "accepted", 2.0)
+    stats = router.stats()
+    assert stats["decisions"] == {"cheap": 2, "default": 2}
+    assert stats["cheap_accept_rate"] == 0.5
+    assert stats["avg_seconds"] == {"cheap": 0.375, "default": 2.0}
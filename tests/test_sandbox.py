@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from pytest_pool import PytestPool
+from sandbox import AdmissionController, AdmissionTimeout, Limits, classify, scrubbed_env
+
+pytestmark = pytest.mark.skipif(not PytestPool.supported(), reason="needs os.fork and rlimits")
+
+
+def _bundle(root, body):
+    (root / "tests").mkdir()
+    (root / "under_test.py").write_text("")
+    (root / "tests" / "test_x.py").write_text(body)
+    return str(root)
+
+
+@pytest.fixture
+def pool():
+    p = PytestPool(size=1)
+    yield p
+    p.shutdown()
+
+
+def test_runs_see_only_the_scrubbed_environment(pool, tmp_path, monkeypatch):
+    monkeypatch.setenv("MISTRAL_API_KEY", "sk-secret")
+    body = (
+        "import os\n"
+        "def test_env():\n"
+        "    assert 'MISTRAL_API_KEY' not in os.environ\n"
+        "    assert os.environ['HOME'] == os.getcwd()\n"
+    )
+    cwd = _bundle(tmp_path, body)
+    env = scrubbed_env(cwd, {"PYTHONPATH": cwd})
+    assert "MISTRAL_API_KEY" not in env
+    res = classify(pool.run(cwd, ["-q", "tests"], timeout=30, env=env))
+    assert res["exit_code"] == 0, res["stdout"]
+    assert res["limit"] is None and res["signal"] is None
+
+
+@pytest.mark.parametrize("body,limits,expected", [
+    ("def test_cpu():\n    while True:\n        pass\n", {"cpu_seconds": 1}, "cpu"),
+    ("def test_mem():\n    block = bytearray(512 * 1024 * 1024)\n", {"memory_mb": 256}, "memory"),
+    ("def test_files():\n    handles = [open(__file__) for _ in range(100)]\n", {"open_files": 32}, "open_files"),
+    ("def test_write(tmp_path):\n    (tmp_path / 'big').write_bytes(b'x' * 3 * 1024 * 1024)\n",
+     {"file_size_mb": 1}, "file_size"),
+])
+def test_limit_violations_come_back_classified(pool, tmp_path, body, limits, expected):
+    cwd = _bundle(tmp_path, body)
+    full = {**Limits(0, 0, 0, 0, 0).as_dict(), **limits}
+    res = classify(pool.run(cwd, ["-q", "-p", "no:cacheprovider", "tests"], timeout=30, limits=full), full)
+    assert not res["timed_out"] and res["limit"] == expected, (res["exit_code"], res["stdout"][-800:])
+
+
+def test_wall_clock_timeout_is_a_limit_too():
+    assert classify({"exit_code": None, "timed_out": True})["limit"] == "wall_time"
+    assert classify({"exit_code": 1, "timed_out": False, "stdout": "1 failed", "stderr": ""})["limit"] is None
+
+
+def test_only_a_spent_cpu_budget_or_an_uncaught_memory_error_is_a_limit():
+    killed = {"exit_code": -9, "timed_out": False, "stdout": "", "stderr": ""}
+    assert classify({**killed, "cpu_s": 2.1}, {"cpu_seconds": 2})["limit"] == "cpu"
+    other = classify({**killed, "cpu_s": 0.3}, {"cpu_seconds": 2})
+    assert other["limit"] is None and other["signal"] == 9
+    assert classify(killed, {"cpu_seconds": 2})["limit"] is None  # no rusage, no guess
+
+    failed = {"exit_code": 1, "timed_out": False, "stderr": ""}
+    mentioned = "E       AssertionError: assert 'MemoryError' in 'boom'\n"
+    assert classify({**failed, "stdout": mentioned})["limit"] is None
+    assert classify({**failed, "stdout": "E       MemoryError\n"})["limit"] == "memory"
+
+
+def test_admission_controller_queues_beyond_its_slots():
+    ctl = AdmissionController(2)
+    peak = []
+
+    async def run(i):
+        await ctl.acquire()
+        try:
+            peak.append(ctl.stats()["active"])
+            await asyncio.sleep(0.02)
+        finally:
+            ctl.release()
+
+    async def main():
+        await asyncio.gather(*(run(i) for i in range(6)))
+        await ctl.acquire()
+        await ctl.acquire()
+        with pytest.raises(AdmissionTimeout):
+            await ctl.acquire(timeout=0.01)
+        ctl.release()
+        ctl.release()
+
+    asyncio.run(main())
+    stats = ctl.stats()
+    assert max(peak) == 2
+    assert (stats["active"], stats["waiting"], stats["rejected"]) == (0, 0, 1)
+    assert stats["admitted"] == 8 and stats["queued"] >= 4
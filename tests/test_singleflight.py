@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call_and_its_errors():
+    sf = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "tests"
+
+    async def boom():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream")
+
+    async def main():
+        results = await asyncio.gather(*(sf.do("k", work) for _ in range(5)))
+        errors = await asyncio.gather(*(sf.do("e", boom) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert [r[0] for r in results] == ["tests"] * 5
+    assert sorted(r[1] for r in results) == [False] + [True] * 4
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert len(calls) == 2
+    assert sf.stats() == {"in_flight": 0, "waiting": 0, "coalesced": 6, "timeouts": 0}
+
+
+def test_waiter_timeout_and_cancel_leave_the_leader_running():
+    sf = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(sf.do("k", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await sf.do("k", slow, timeout=0.01)
+        quitter = asyncio.create_task(sf.do("k", slow))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == ("done", False)
+    assert sf.stats()["timeouts"] == 1 and sf.stats()["waiting"] == 0
+
+
+def test_waiters_take_over_when_the_leader_is_cancelled():
+    sf = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.create_task(sf.do("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(sf.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == (2, False)
+
+
+def test_waiters_on_other_event_loops():
+    sf = SingleFlight()
+    started = threading.Event()
+    results = []
+
+    async def work():
+        started.set()
+        await asyncio.sleep(0.1)
+        return "shared"
+
+    def other_loop():
+        started.wait()
+        results.append(asyncio.run(sf.do("k", work)))
+
+    t = threading.Thread(target=other_loop)
+    t.start()
+    results.append(asyncio.run(sf.do("k", work)))
+    t.join()
+    assert sorted(results) == [("shared", False), ("shared", True)]
@@ -0,0 +1,66 @@
+from validate import module_names, retarget_imports, validate_tests
+
+CODE = "import math\n\nRATE = 2\n\ndef add(a, b):\n    return a + b\n\nclass Calc:\n    def mul(self, a, b):\n        return a * b\n"
+
+
+def test_valid_module_passes_untouched():
+    text = "from under_test import add\nimport pytest\n\n@pytest.mark.parametrize('a', [1])\ndef test_add(a):\n    assert add(a, 1) == a + 1\n"
+    result = validate_tests(text, "add", CODE)
+    assert result.ok and result.repairs == [] and result.text == text
+
+
+def test_deterministic_repairs():
+    text = (
+        "```python\n"
+        "from solution import add\n\n"
+        "def test_add():\n    with pytest.raises(TypeError):\n        add(1, None)\n\n"
+        "def test_add():\n    assert add(1, 2) == 3\n"
+        "```\n"
+    )
+    result = validate_tests(text, "add", CODE)
+    assert result.ok, result.problems
+    assert "from under_test import add" in result.text and "solution" not in result.text
+    assert "import pytest" in result.text and "```" not in result.text
+    assert "def test_add_2():" in result.text
+    assert len(result.repairs) == 4
+
+
+def test_missing_target_import_is_added_after_docstring():
+    text = '"""Tests."""\nfrom __future__ import annotations\n\ndef test_mul():\n    assert Calc().mul(2, 3) == 6\n'
+    result = validate_tests(text, "Calc.mul", CODE)
+    assert result.ok
+    assert result.text.splitlines()[:3] == ['"""Tests."""', "from __future__ import annotations",
+                                            "from under_test import Calc"]
+
+
+def test_unrepairable_problems_are_reported():
+    text = (
+        "import numpy\nimport under_test\nfrom under_test import add, subtract\n\n"
+        "def helper():\n    return under_test.missing\n"
+    )
+    problems = validate_tests(text, "add", CODE).problems
+    assert any("no test functions" in p for p in problems)
+    assert any("'numpy' is not allowed" in p for p in problems)
+    assert any("no name 'subtract'" in p for p in problems)
+    assert any("no name 'missing'" in p for p in problems)
+
+    broken = validate_tests("def test_x(:\n    pass\n", "add", CODE)
+    assert not broken.ok and "syntax error" in broken.problems[0]
+
+
+def test_module_names_skips_unparsable_code():
+    assert {"add", "Calc", "RATE", "math"} <= module_names(CODE)
+    assert module_names("") is None and module_names("def (") is None
+    # without resolvable code only the target names can't be checked
+    assert validate_tests("from under_test import anything\n\ndef test_a():\n    assert anything\n", "anything").ok
+
+
+def test_retarget_imports_points_at_the_real_module():
+    text = (
+        "import pytest\nfrom under_test import add\nimport under_test, os\n\n"
+        "def test_add(monkeypatch):\n    monkeypatch.setattr('under_test.RATE', 3)\n    assert add(1, 2) == 3\n"
+    )
+    out = retarget_imports(text, "pkg.calc")
+    assert "from pkg.calc import add" in out
+    assert "import pkg.calc as under_test, os" in out
+    assert "'pkg.calc.RATE'" in out and "from under_test" not in out
@@ -0,0 +1,36 @@
+import os
+import time
+
+from workspace import WorkspaceManager, atomic_write
+
+
+def test_workspace_layout_and_close(tmp_path):
+    manager = WorkspaceManager(str(tmp_path / "ws"))
+    with manager.create() as ws:
+        ws.write_code("def f():\n    return 1\n")
+        ws.write_test("test_f.py", "from under_test import f\n")
+        assert (ws.path / "under_test.py").exists()
+        assert sorted(p.name for p in ws.tests_dir.iterdir()) == ["conftest.py", "test_f.py"]
+        assert manager.stats()["active"] == 1
+    assert not ws.path.exists()
+    assert manager.stats()["active"] == 0
+
+
+def test_gc_removes_only_expired_workspaces(tmp_path):
+    manager = WorkspaceManager(str(tmp_path / "ws"), ttl=60)
+    old, fresh = manager.create(), manager.create()
+    past = time.time() - 3600
+    os.utime(old.path, (past, past))
+    (manager.root / "not-a-workspace").mkdir()
+
+    assert manager.gc() == 1
+    assert not old.path.exists() and fresh.path.exists()
+    assert (manager.root / "not-a-workspace").exists()
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    target = tmp_path / "pkg" / "mod.py"
+    atomic_write(target, "a = 1\n")
+    atomic_write(target, "a = 2\n")
+    assert target.read_text() == "a = 2\n"
+    assert [p.name for p in target.parent.iterdir()] == ["mod.py"]
@@ -0,0 +1,302 @@
+"""
+Static pre-flight validation of generated test modules.
+
+Model output is checked with `ast` before anything executes: the module must
+parse, define at least one test, import only the standard library, pytest and
+`under_test`, and every name it takes from `under_test` must exist in the code
+under test. Problems with an obvious fix (markdown fences, a missing
+`import pytest`, the target imported from a made-up module, a missing target
+import, duplicate test names) are repaired in place; whatever is left is
+reported so the caller can ask the model for a targeted fix.
+"""
+import ast
+import re
+import sys
+import textwrap
+from typing import List, Optional, Set
+
+TARGET_MODULE = "under_test"
+ALLOWED_MODULES = frozenset({"pytest", "_pytest", TARGET_MODULE})
+
+_FENCE_RE = re.compile(r"^\s*```[\w+-]*\s*$")
+
+
+class Validation:
+    """Outcome of validate_tests: the (possibly repaired) text and what is still wrong."""
+
+    def __init__(self, text: str, repairs: List[str], problems: List[str]):
+        self.text = text
+        self.repairs = repairs
+        self.problems = problems
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def __repr__(self) -> str:
+        return f"Validation(ok={self.ok}, repairs={self.repairs!r}, problems={self.problems!r})"
+
+
+def _stdlib_modules() -> Set[str]:
+    names = getattr(sys, "stdlib_module_names", None)
+    if names is None:  # Python < 3.10
+        names = set(sys.builtin_module_names) | {
+            "abc", "collections", "contextlib", "copy", "dataclasses", "datetime", "decimal",
+            "enum", "fractions", "functools", "itertools", "json", "math", "operator", "os",
+            "pathlib", "random", "re", "statistics", "string", "sys", "tempfile", "time",
+            "typing", "unittest", "uuid", "warnings",
+        }
+    return set(names)
+
+
+STDLIB_MODULES = frozenset(_stdlib_modules())
+
+
+def module_names(code: str) -> Optional[Set[str]]:
+    """
+    Names bound at the top level of the code under test, or None when the code
+    is empty or does not parse (name checks are skipped then).
+    """
+    if not code.strip():
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    names: Set[str] = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for sub in ast.walk(target):
+                    if isinstance(sub, ast.Name):
+                        names.add(sub.id)
+    return names
+
+
+def _parse(text: str):
+    try:
+        return ast.parse(text), None
+    except SyntaxError as e:
+        return None, e
+
+
+def _bound_names(tree: ast.Module) -> Set[str]:
+    """Every name the test module binds anywhere (imports, defs, assignments, args)."""
+    bound: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+    return bound
+
+
+def _loaded_names(tree: ast.Module) -> Set[str]:
+    return {n.id for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+
+def _insert_at(tree: ast.Module) -> int:
+    """0-based line index just after a module docstring and __future__ imports."""
+    index = 0
+    for i, node in enumerate(tree.body):
+        is_doc = i == 0 and isinstance(node, ast.Expr) and isinstance(getattr(node, "value", None), ast.Constant) \
+            and isinstance(node.value.value, str)
+        is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+        if not (is_doc or is_future):
+            break
+        index = node.end_lineno
+    return index
+
+
+def _test_functions(tree: ast.Module) -> List[ast.AST]:
+    found = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            found.append(node)
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            found.extend(item for item in node.body
+                         if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test"))
+    return found
+
+
+def _repair_syntax(text: str, repairs: List[str]):
+    """Strip fences / stray indentation until the text parses, or give up."""
+    lines = text.split("\n")
+    unfenced = [ln for ln in lines if not _FENCE_RE.match(ln)]
+    if len(unfenced) != len(lines):
+        text = "\n".join(unfenced)
+        repairs.append("removed markdown fences")
+    tree, err = _parse(text)
+    if tree is None:
+        dedented = textwrap.dedent(text)
+        if dedented != text:
+            tree, _ = _parse(dedented)
+            if tree is not None:
+                text = dedented
+                repairs.append("removed common indentation")
+    return text, tree, err
+
+
+def _repair_imports(text: str, tree: ast.Module, import_name: str,
+                    names: Optional[Set[str]], repairs: List[str]) -> str:
+    """Point imports of target names at under_test and add missing imports."""
+    lines = text.split("\n")
+    for node in reversed(tree.body):
+        if not isinstance(node, ast.ImportFrom) or node.level or not node.module:
+            continue
+        top = node.module.split(".")[0]
+        if top in ALLOWED_MODULES or top in STDLIB_MODULES or names is None:
+            continue
+        if all(alias.name in names for alias in node.names):
+            # e.g. `from solution import add` for code that defines add
+            imported = ", ".join(a.name + (f" as {a.asname}" if a.asname else "") for a in node.names)
+            lines[node.lineno - 1:node.end_lineno] = [" " * node.col_offset + f"from {TARGET_MODULE} import {imported}"]
+            repairs.append(f"imported {imported} from {TARGET_MODULE} instead of {node.module}")
+
+    text = "\n".join(lines)
+    tree, _ = _parse(text)
+    if tree is None:
+        return text
+    bound, loaded = _bound_names(tree), _loaded_names(tree)
+    missing = []
+    if import_name in loaded and import_name not in bound:
+        missing.append(f"from {TARGET_MODULE} import {import_name}")
+    if "pytest" in loaded and "pytest" not in bound:
+        missing.append("import pytest")
+    if missing:
+        lines = text.split("\n")
+        at = _insert_at(tree)
+        lines[at:at] = missing
+        text = "\n".join(lines)
+        repairs.extend(f"added `{line}`" for line in missing)
+    return text
+
+
+def _repair_duplicates(text: str, tree: ast.Module, repairs: List[str]) -> str:
+    """Rename module-level tests that would silently shadow an earlier one."""
+    lines = text.split("\n")
+    seen: Set[str] = set()
+    taken = {n.name for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) or not node.name.startswith("test"):
+            continue
+        if node.name not in seen:
+            seen.add(node.name)
+            continue
+        n = 2
+        while f"{node.name}_{n}" in taken:
+            n += 1
+        new = f"{node.name}_{n}"
+        taken.add(new)
+        line = lines[node.lineno - 1]
+        lines[node.lineno - 1] = re.sub(rf"\bdef\s+{re.escape(node.name)}\b", f"def {new}", line, count=1)
+        repairs.append(f"renamed duplicate {node.name} to {new}")
+    return "\n".join(lines)
+
+
+def _check(tree: ast.Module, names: Optional[Set[str]]) -> List[str]:
+    problems = []
+    if not _test_functions(tree):
+        problems.append("no test functions (def test_...) found")
+
+    target_aliases = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            if node.level:
+                problems.append(f"line {node.lineno}: relative import is not allowed")
+                continue
+            top = (node.module or "").split(".")[0]
+            if top == TARGET_MODULE:
+                for alias in node.names:
+                    if alias.name == "*":
+                        continue
+                    if names is not None and alias.name not in names:
+                        problems.append(f"line {node.lineno}: {TARGET_MODULE} has no name {alias.name!r}")
+            elif top not in ALLOWED_MODULES and top not in STDLIB_MODULES:
+                problems.append(f"line {node.lineno}: import of {node.module!r} is not allowed "
+                                f"(only the standard library, pytest and {TARGET_MODULE})")
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                top = alias.name.split(".")[0]
+                if top == TARGET_MODULE:
+                    target_aliases.add(alias.asname or TARGET_MODULE)
+                elif top not in ALLOWED_MODULES and top not in STDLIB_MODULES:
+                    problems.append(f"line {node.lineno}: import of {alias.name!r} is not allowed "
+                                    f"(only the standard library, pytest and {TARGET_MODULE})")
+
+    if names is not None and target_aliases:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) \
+                    and node.value.id in target_aliases and node.attr not in names:
+                problems.append(f"line {node.lineno}: {TARGET_MODULE} has no name {node.attr!r}")
+    return problems
+
+
+def validate_tests(text: str, symbol: str, code: str = "") -> Validation:
+    """
+    Check a generated pytest module for `symbol` against the code under test,
+    applying deterministic repairs first. Never executes the module.
+    """
+    repairs: List[str] = []
+    text = text.lstrip("﻿").replace("\r\n", "\n")
+    text, tree, err = _repair_syntax(text, repairs)
+    if tree is None:
+        where = f"line {err.lineno}: " if err.lineno else ""
+        return Validation(text, repairs, [f"{where}syntax error: {err.msg}"])
+
+    names = module_names(code)
+    import_name = symbol.split(".")[0]
+    text = _repair_imports(text, tree, import_name, names, repairs)
+    tree, err = _parse(text)
+    if tree is None:  # a repair broke it; should not happen, but never hand out unparsable text
+        return Validation(text, repairs, [f"line {err.lineno}: syntax error: {err.msg}"])
+    text = _repair_duplicates(text, tree, repairs)
+    tree, _ = _parse(text)
+
+    problems = _check(tree, names)
+    if not text.endswith("\n"):
+        text += "\n"
+    return Validation(text, repairs, problems)
+
+
+def retarget_imports(text: str, module: str) -> str:
+    """
+    Point a validated test module at the real import path of the code under
+    test: `from under_test import f` -> `from pkg.mod import f`, `import
+    under_test` -> `import pkg.mod as under_test`, and "under_test.x" strings
+    (monkeypatch/mock targets) -> "pkg.mod.x".
+    """
+    tree = ast.parse(text)
+    lines = text.split("\n")
+    imports = [n for n in ast.walk(tree) if isinstance(n, (ast.Import, ast.ImportFrom))]
+    for node in sorted(imports, key=lambda n: n.lineno, reverse=True):
+        indent = " " * node.col_offset
+        if isinstance(node, ast.ImportFrom):
+            top = (node.module or "").split(".")[0]
+            if node.level or top != TARGET_MODULE:
+                continue
+            line = lines[node.lineno - 1]
+            lines[node.lineno - 1] = re.sub(rf"\bfrom\s+{TARGET_MODULE}\b", f"from {module}", line, count=1)
+        elif any(a.name.split(".")[0] == TARGET_MODULE for a in node.names):
+            names = []
+            for alias in node.names:
+                if alias.name == TARGET_MODULE:
+                    names.append(f"{module} as {alias.asname or TARGET_MODULE}")
+                elif alias.name.startswith(TARGET_MODULE + "."):
+                    names.append(module + alias.name[len(TARGET_MODULE):] + (f" as {alias.asname}" if alias.asname else ""))
+                else:
+                    names.append(alias.name + (f" as {alias.asname}" if alias.asname else ""))
+            lines[node.lineno - 1:node.end_lineno] = [f"{indent}import {', '.join(names)}"]
+    text = "\n".join(lines)
+    return re.sub(rf"""(["']){TARGET_MODULE}\.""", rf"\g<1>{module}.", text)
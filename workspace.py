@@ -0,0 +1,142 @@
+"""
+Per-request workspaces.
+
+Every request or job gets its own directory laid out exactly as pytest needs it
+(`under_test.py`, `tests/conftest.py`, `tests/test_*.py`), so the runner can use
+it in place and concurrent requests never share files. Workspaces live on tmpfs
+(/dev/shm) when available and are garbage-collected by age.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+CONFTEST_PY = (
+    "import sys, pathlib\nROOT = pathlib.Path(__file__).resolve().parents[1]\n"
+    "sys.path.insert(0, str(ROOT))\n"
+)
+
+_PREFIX = "ws-"
+
+
+def default_root() -> str:
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return str(base / "spec2test-workspaces")
+
+
+def atomic_write(path: Path, text: str) -> None:
+    """Write via a sibling temp file + rename so readers never see a torn file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class Workspace:
+    def __init__(self, path: Path, manager: "WorkspaceManager"):
+        self.path = path
+        self.tests_dir = path / "tests"
+        self.code_path = path / "under_test.py"
+        # test file name -> model that wrote it (recorded in the artifact index on publish)
+        self.models: Dict[str, str] = {}
+        self._manager = manager
+        self.tests_dir.mkdir(parents=True)
+        (self.tests_dir / "conftest.py").write_text(CONFTEST_PY, encoding="utf-8")
+
+    def write_code(self, code: str) -> Path:
+        self.code_path.write_text(code, encoding="utf-8")
+        return self.code_path
+
+    def write_test(self, name: str, text: str) -> Path:
+        path = self.tests_dir / name
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def add_test_file(self, src: str) -> Path:
+        dst = self.tests_dir / os.path.basename(src)
+        shutil.copyfile(src, dst)
+        return dst
+
+    def close(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._manager._closed(self)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class WorkspaceManager:
+    """
+    Creates workspaces under `root` and removes any older than `ttl` seconds,
+    either from gc_forever() (started by the app lifespan) or opportunistically
+    on create() at most every `gc_interval` seconds. Age-based GC is safe with
+    several server processes sharing one root.
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl: float = 3600, gc_interval: float = 300):
+        self.root = Path(root or default_root())
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self._lock = threading.Lock()
+        self._last_gc = time.monotonic()
+        self.created = 0
+        self.active = 0
+        self.gc_removed = 0
+
+    def create(self) -> Workspace:
+        self.maybe_gc()
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{_PREFIX}{int(time.time())}-{uuid.uuid4().hex[:12]}"
+        ws = Workspace(path, self)
+        with self._lock:
+            self.created += 1
+            self.active += 1
+        return ws
+
+    def _closed(self, ws: Workspace) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    def gc(self) -> int:
+        cutoff = time.time() - self.ttl
+        removed = 0
+        if self.root.is_dir():
+            for entry in os.scandir(self.root):
+                if not entry.name.startswith(_PREFIX):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._last_gc = time.monotonic()
+            self.gc_removed += removed
+        return removed
+
+    def maybe_gc(self) -> None:
+        if time.monotonic() - self._last_gc >= self.gc_interval:
+            self.gc()
+
+    async def gc_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.gc_interval)
+            await asyncio.to_thread(self.gc)
+
+    def stats(self) -> dict:
+        return {
+            "root": str(self.root),
+            "created": self.created,
+            "active": self.active,
+            "gc_removed": self.gc_removed,
+        }